@@ -0,0 +1,153 @@
+"""Incrementally maintained per-questionnaire answer statistics.
+
+Statistics are flat counters keyed by :func:`stat_key` (for example answered,
+graded and correct per question, plus one counter per chosen multichoice option
+or scale value). Every write applies the difference between the old and new
+answers, so reading the statistics of a questionnaire costs O(questions) no
+matter how many responses exist.
+"""
+import json
+from collections import Counter
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+
+try:
+    from backend.models import AnswerDetail, Questionnaire, QuestionnaireStats, QuestionStats
+except ImportError:  # Allow fallback execution without package context
+    import sys
+    from pathlib import Path
+
+    sys.path.append(str(Path(__file__).resolve().parent))
+    from models import AnswerDetail, Questionnaire, QuestionnaireStats, QuestionStats
+
+
+# Question types whose answer values are counted individually.
+DISTRIBUTION_TYPES = {"multichoice", "scale"}
+
+AnswerLike = Union[AnswerDetail, Mapping[str, object]]
+
+
+def stat_key(question_id: str, metric: str, value: Optional[str] = None) -> str:
+    """Encode a counter name; JSON keeps arbitrary ids and values unambiguous."""
+    parts = [question_id, metric] if value is None else [question_id, metric, value]
+    return json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+
+
+# Number of stored responses; the empty question id cannot clash with a real one.
+RESPONSES_KEY = stat_key("", "responses")
+
+
+def parse_stat_key(key: str) -> Tuple[str, str, Optional[str]]:
+    parts = json.loads(key)
+    return parts[0], parts[1], parts[2] if len(parts) > 2 else None
+
+
+def _field(detail: AnswerLike, name: str):
+    if isinstance(detail, AnswerDetail):
+        return getattr(detail, name)
+    if isinstance(detail, Mapping):
+        return detail.get(name)
+    return detail if name == "value" else None
+
+
+def answer_contributions(
+    answers: Optional[Mapping[str, AnswerLike]],
+    question_types: Mapping[str, str],
+) -> Counter:
+    """Counters contributed by one stored answers document (empty for None)."""
+    counters: Counter = Counter()
+    if answers is None:
+        return counters
+    counters[RESPONSES_KEY] += 1
+    for question_id, detail in answers.items():
+        value = _field(detail, "value")
+        has_value = isinstance(value, str) and value.strip() != ""
+        if has_value:
+            counters[stat_key(question_id, "answered")] += 1
+            if question_types.get(question_id) in DISTRIBUTION_TYPES:
+                counters[stat_key(question_id, "value", value)] += 1
+        correct = _field(detail, "correct")
+        if correct in ("yes", "no"):
+            counters[stat_key(question_id, "graded")] += 1
+            if correct == "yes":
+                counters[stat_key(question_id, "correct")] += 1
+    return counters
+
+
+def answer_delta(
+    old: Optional[Mapping[str, AnswerLike]],
+    new: Optional[Mapping[str, AnswerLike]],
+    question_types: Mapping[str, str],
+) -> Dict[str, int]:
+    """Non-zero counter changes for replacing ``old`` with ``new`` (None = absent)."""
+    delta = answer_contributions(new, question_types)
+    delta.subtract(answer_contributions(old, question_types))
+    return {key: count for key, count in delta.items() if count}
+
+
+def question_types_of(questionnaire: Optional[Questionnaire]) -> Dict[str, str]:
+    if questionnaire is None:
+        return {}
+    return {question.id: question.type for question in questionnaire.questions}
+
+
+class AnswerStatsStore:
+    """In-memory counters per questionnaire, used when Cosmos is not configured."""
+
+    def __init__(self):
+        self._counters: Dict[str, Counter] = {}
+
+    def apply(self, questionnaire_id: str, delta: Mapping[str, int]) -> None:
+        if not delta:
+            return
+        counters = self._counters.setdefault(questionnaire_id, Counter())
+        counters.update(delta)
+
+    def get(self, questionnaire_id: str) -> Dict[str, int]:
+        return dict(self._counters.get(questionnaire_id, {}))
+
+    def replace(self, questionnaire_id: str, counters: Mapping[str, int]) -> None:
+        self._counters[questionnaire_id] = Counter(counters)
+
+    def clear(self) -> None:
+        self._counters.clear()
+
+
+def build_stats(questionnaire: Questionnaire, counters: Mapping[str, int]) -> QuestionnaireStats:
+    """Shape raw counters into the response for ``questionnaire``'s current questions."""
+    per_question: Dict[str, Dict[str, object]] = {}
+    for key, count in counters.items():
+        if key == RESPONSES_KEY or count <= 0:
+            continue
+        question_id, metric, value = parse_stat_key(key)
+        entry = per_question.setdefault(question_id, {"distribution": {}})
+        if metric == "value":
+            entry["distribution"][value] = count
+        else:
+            entry[metric] = count
+
+    questions: List[QuestionStats] = []
+    for question in questionnaire.questions:
+        entry = per_question.get(question.id, {"distribution": {}})
+        graded = int(entry.get("graded", 0))
+        correct = int(entry.get("correct", 0))
+        distribution: Optional[Dict[str, int]] = None
+        if question.type == "multichoice":
+            distribution = {option: 0 for option in question.options or []}
+            distribution.update(entry["distribution"])
+        elif question.type == "scale":
+            distribution = {str(step): 0 for step in range(question.scaleMax + 1)} if question.scaleMax else {}
+            distribution.update(entry["distribution"])
+        questions.append(QuestionStats(
+            questionId=question.id,
+            type=question.type,
+            answered=int(entry.get("answered", 0)),
+            graded=graded,
+            correct=correct,
+            correctRate=round(correct / graded, 4) if graded else None,
+            distribution=distribution,
+        ))
+    return QuestionnaireStats(
+        questionnaireId=questionnaire.id,
+        responses=max(0, int(counters.get(RESPONSES_KEY, 0))),
+        questions=questions,
+    )
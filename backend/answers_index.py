@@ -0,0 +1,151 @@
+"""Indexed in-memory store for answers used when Cosmos is not configured.
+
+Every write gets a new sequence number, which stands in for Cosmos' ``_ts`` so
+newest-first listings match the Cosmos path. Entries are reachable by primary
+key, by questionnaire and by user, and listings walk a sequence-ordered index
+so a page costs O(page) rather than a copy and sort of the whole store.
+"""
+import itertools
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from backend.models import StoredAnswers
+except ImportError:  # Allow fallback execution without package context
+    import sys
+    from pathlib import Path
+
+    sys.path.append(str(Path(__file__).resolve().parent))
+    from models import StoredAnswers
+
+
+def answer_key(user_id: str, questionnaire_id: str) -> str:
+    return f"{questionnaire_id}:{user_id}"
+
+
+class _SequenceIndex:
+    """Ascending list of sequence numbers with lazy deletion.
+
+    New sequences are always the largest seen so far, so inserts are appends.
+    Removed sequences stay in the list as tombstones until they outnumber the
+    live ones, at which point the list is compacted.
+    """
+
+    def __init__(self):
+        self._order: List[int] = []
+        self._live: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def add(self, seq: int, key: str) -> None:
+        self._order.append(seq)
+        self._live[seq] = key
+
+    def discard(self, seq: int) -> None:
+        if self._live.pop(seq, None) is not None and len(self._order) > 2 * len(self._live) + 32:
+            self._order = [value for value in self._order if value in self._live]
+
+    def newest_first(self, before: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        # Hold on to the current list: compaction swaps in a new one, which would
+        # invalidate positions while a caller is still iterating.
+        order = self._order
+        index = len(order) if before is None else bisect_left(order, before)
+        while index > 0:
+            index -= 1
+            seq = order[index]
+            key = self._live.get(seq)
+            if key is not None:
+                yield seq, key
+
+
+class AnswersIndex:
+    def __init__(self):
+        self._seq = itertools.count(1)
+        self._entries: Dict[str, Tuple[int, StoredAnswers]] = {}
+        self._by_time = _SequenceIndex()
+        self._by_questionnaire: Dict[str, _SequenceIndex] = {}
+        self._by_user: Dict[str, Dict[str, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str, questionnaire_id: str) -> Optional[StoredAnswers]:
+        entry = self._entries.get(answer_key(user_id, questionnaire_id))
+        return entry[1] if entry else None
+
+    def put(self, stored: StoredAnswers) -> bool:
+        """Insert or replace an entry, making it the newest. Returns True if it is new."""
+        key = answer_key(stored.userId, stored.questionnaireId)
+        previous = self._entries.get(key)
+        if previous:
+            self._unlink(key, previous[0], previous[1])
+        seq = next(self._seq)
+        self._entries[key] = (seq, stored)
+        self._by_time.add(seq, key)
+        self._by_questionnaire.setdefault(stored.questionnaireId, _SequenceIndex()).add(seq, key)
+        self._by_user.setdefault(stored.userId, {})[key] = None
+        return previous is None
+
+    def remove(self, user_id: str, questionnaire_id: str) -> Optional[StoredAnswers]:
+        key = answer_key(user_id, questionnaire_id)
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._unlink(key, entry[0], entry[1])
+        return entry[1]
+
+    def _unlink(self, key: str, seq: int, stored: StoredAnswers) -> None:
+        self._by_time.discard(seq)
+        per_questionnaire = self._by_questionnaire.get(stored.questionnaireId)
+        if per_questionnaire is not None:
+            per_questionnaire.discard(seq)
+            if not per_questionnaire:
+                del self._by_questionnaire[stored.questionnaireId]
+        per_user = self._by_user.get(stored.userId)
+        if per_user is not None:
+            per_user.pop(key, None)
+            if not per_user:
+                del self._by_user[stored.userId]
+
+    def newest_first(
+        self,
+        before: Optional[int] = None,
+        questionnaire_id: Optional[str] = None,
+    ) -> Iterator[Tuple[int, StoredAnswers]]:
+        """Yield (seq, answers) newest-first, starting strictly below ``before``."""
+        if questionnaire_id is None:
+            index = self._by_time
+        else:
+            index = self._by_questionnaire.get(questionnaire_id)
+            if index is None:
+                return
+        for seq, key in index.newest_first(before):
+            yield seq, self._entries[key][1]
+
+    def page(
+        self,
+        limit: int,
+        before: Optional[int] = None,
+        questionnaire_id: Optional[str] = None,
+    ) -> Tuple[List[Tuple[int, StoredAnswers]], bool]:
+        """Return up to ``limit`` entries below ``before`` and whether more remain."""
+        iterator = self.newest_first(before, questionnaire_id)
+        page = list(itertools.islice(iterator, limit))
+        has_more = next(iterator, None) is not None
+        return page, has_more
+
+    def for_user(self, user_id: str) -> List[StoredAnswers]:
+        return [self._entries[key][1] for key in self._by_user.get(user_id, {})]
+
+    def count(self, questionnaire_id: Optional[str] = None) -> int:
+        if questionnaire_id is None:
+            return len(self._entries)
+        index = self._by_questionnaire.get(questionnaire_id)
+        return len(index) if index is not None else 0
+
+    def counts_by_questionnaire(self) -> Dict[str, int]:
+        return {questionnaire_id: len(index) for questionnaire_id, index in self._by_questionnaire.items()}
+
+    def clear(self) -> None:
+        self.__init__()
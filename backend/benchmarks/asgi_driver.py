@@ -0,0 +1,75 @@
+"""Minimal in-process ASGI driver for benchmarks.
+
+Calls the FastAPI app directly, without sockets or an HTTP client library, so
+timings reflect routing, handler and serialization cost only.
+"""
+import asyncio
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+async def request(
+    app,
+    method: str,
+    path: str,
+    params: Optional[Dict[str, object]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    body: bytes = b"",
+) -> Tuple[int, Dict[str, str], bytes]:
+    """Send one request through ``app`` and return (status, headers, body)."""
+    raw_headers: List[Tuple[bytes, bytes]] = [
+        (key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in (headers or {}).items()
+    ]
+    if body:
+        raw_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method.upper(),
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "query_string": urlencode(params or {}).encode("latin-1"),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    request_sent = False
+    response_complete = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if request_sent:
+            # Like a client, stay connected until the response is complete; streaming
+            # responses stop as soon as they see a disconnect.
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+        request_sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    status = 0
+    response_headers: Dict[str, str] = {}
+    chunks: List[bytes] = []
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update(
+                (key.decode("latin-1"), value.decode("latin-1")) for key, value in message.get("headers", [])
+            )
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_complete.set()
+
+    await app(scope, receive, send)
+    return status, response_headers, b"".join(chunks)
@@ -0,0 +1,211 @@
+"""Throughput and latency of the answers save/fetch path and ``/api/responses`` paging.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_api [--latency-ms 5] [--save baseline.json]
+    python -m benchmarks.bench_api --baseline baseline.json [--max-regression 0.25]
+
+Drives the FastAPI app in-process against :mod:`benchmarks.fake_cosmos`, so the
+whole Cosmos code path (resilience layer included) runs without an account.
+Scenarios:
+
+* ``save-burst``: a classroom submitting at once, ``--burst`` concurrent
+  ``POST /api/answers``;
+* ``fetch-burst``: the same number of concurrent answer reads;
+* ``paging``: following ``nextCursor`` through ``--answers`` stored answers.
+
+Each reports throughput, p50/p99 latency and the synthetic request units per
+operation; burst figures are the median of ``--rounds`` bursts. With
+``--baseline`` the run fails (exit 1) when a scenario's p99 rises or its
+throughput drops by more than ``--max-regression``. Injected latency is seeded,
+so runs on one machine are comparable; keep baselines per machine.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.asgi_driver import request
+from benchmarks.fake_cosmos import FakeContainer, LatencyModel, charge_summary, install, uninstall
+
+import cosmos_aio
+import main
+from data import QUESTIONNAIRES
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _result(latencies: List[float], wall_seconds: float) -> Dict[str, float]:
+    return {
+        "requests": len(latencies),
+        "throughput": round(len(latencies) / wall_seconds, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def _timed(app, method: str, path: str, **kwargs) -> float:
+    started = time.perf_counter()
+    status, _, body = await request(app, method, path, **kwargs)
+    elapsed = time.perf_counter() - started
+    assert status == 200, (method, path, status, body[:200])
+    return elapsed
+
+
+def _answers_body(user_id: str, questionnaire) -> bytes:
+    answers = {
+        question.id: {"value": (question.options or ["free text answer"])[0]}
+        for question in questionnaire.questions
+    }
+    return json.dumps({"userId": user_id, "questionnaireId": questionnaire.id, "answers": answers}).encode("utf-8")
+
+
+async def _burst(app, method: str, paths_and_bodies: List[tuple]) -> Dict[str, float]:
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*[
+        _timed(app, method, path, body=body, headers={"content-type": "application/json"} if body else None)
+        for path, body in paths_and_bodies
+    ])
+    return _result(list(latencies), time.perf_counter() - started)
+
+
+def _median(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    return {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in runs[0]}
+
+
+async def save_burst(app, burst: int, rounds: int) -> Dict[str, float]:
+    questionnaire = QUESTIONNAIRES[0]
+    # One earlier save creates the counter and statistics documents, as in a running
+    # classroom; the bursts then measure the steady-state write path.
+    await _timed(app, "POST", "/api/answers", body=_answers_body("warm-up", questionnaire))
+    return _median([
+        await _burst(app, "POST", [
+            ("/api/answers", _answers_body(f"student-{round_index}-{n}", questionnaire)) for n in range(burst)
+        ])
+        for round_index in range(rounds)
+    ])
+
+
+async def fetch_burst(app, burst: int, rounds: int) -> Dict[str, float]:
+    questionnaire = QUESTIONNAIRES[0]
+    return _median([
+        await _burst(app, "GET", [
+            (f"/api/questionnaires/{questionnaire.id}/answers/student-{round_index}-{n}", b"") for n in range(burst)
+        ])
+        for round_index in range(rounds)
+    ])
+
+
+def _stored_answers(count: int) -> List[dict]:
+    questionnaire = QUESTIONNAIRES[0]
+    answers = {question.id: {"value": "B", "correct": "no"} for question in questionnaire.questions}
+    return [
+        {
+            "id": f"{questionnaire.id}:paging-{n}",
+            "userId": f"paging-{n}",
+            "questionnaireId": questionnaire.id,
+            "answers": answers,
+        }
+        for n in range(count)
+    ]
+
+
+async def paging(app, page_size: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    seen = 0
+    cursor: Optional[str] = None
+    started = time.perf_counter()
+    while True:
+        params = {"pageSize": page_size, **({"cursor": cursor} if cursor else {})}
+        page_started = time.perf_counter()
+        status, _, body = await request(app, "GET", "/api/responses", params=params)
+        latencies.append(time.perf_counter() - page_started)
+        assert status == 200, (status, body[:200])
+        page = json.loads(body)
+        seen += len(page["items"])
+        cursor = page.get("nextCursor")
+        if not cursor:
+            break
+    result = _result(latencies, time.perf_counter() - started)
+    result["items"] = seen
+    return result
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    answers = FakeContainer("userId", LatencyModel(args.latency_ms, args.sigma, seed=1))
+    questionnaires = FakeContainer("id", LatencyModel(args.latency_ms, args.sigma, seed=2))
+    install(cosmos_aio, answers, questionnaires)
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        async with main.lifespan(main.app):
+            results["save-burst"] = await save_burst(main.app, args.burst, args.rounds)
+            results["fetch-burst"] = await fetch_burst(main.app, args.burst, args.rounds)
+            answers.load(_stored_answers(args.answers))
+            # The listed total comes from the counter document; recount after the bulk load.
+            await cosmos_aio.rebuild_answer_counts()
+            results["paging"] = await paging(main.app, args.page_size)
+            expected = args.answers + args.burst * args.rounds + 1
+            assert results["paging"]["items"] == expected, (results["paging"]["items"], expected)
+    finally:
+        uninstall(cosmos_aio)
+
+    print(f"{'scenario':12} {'requests':>9} {'req/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    for name, result in results.items():
+        print(f"{name:12} {result['requests']:9d} {result['throughput']:10.1f} {result['p50_ms']:10.2f} {result['p99_ms']:10.2f}")
+    print(f"\n{'operation':20} {'calls':>8} {'RU':>12}")
+    for operation, (calls, charge) in sorted(charge_summary(answers, questionnaires).items()):
+        print(f"{operation:20} {calls:8d} {charge:12.1f}")
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], max_regression: float) -> List[str]:
+    """Regressions beyond ``max_regression`` (a fraction) relative to ``baseline``."""
+    failures = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if result["p99_ms"] > previous["p99_ms"] * (1 + max_regression):
+            failures.append(f"{name}: p99 {result['p99_ms']} ms vs baseline {previous['p99_ms']} ms")
+        if result["throughput"] < previous["throughput"] * (1 - max_regression):
+            failures.append(f"{name}: {result['throughput']} req/s vs baseline {previous['throughput']} req/s")
+    return failures
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, default=500, help="Concurrent requests in the save/fetch bursts")
+    parser.add_argument("--rounds", type=int, default=5, help="Bursts per scenario; the median is reported")
+    parser.add_argument("--answers", type=int, default=100_000, help="Stored answers to page through")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Median injected Cosmos latency (0 disables)")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Log-normal spread of the injected latency")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against results saved earlier with --save")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed p99/throughput regression (fraction)")
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate the timings.
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(run(args))
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            failures = compare(results, json.load(handle), args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+        print(f"\nNo regression beyond {args.max_regression:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,94 @@
+"""Per-request CPU cost of the default vs fast response path.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_responses [--iterations 200]
+
+Uses the in-memory stores, so no Cosmos configuration is needed. Reports CPU
+time per request (``time.process_time``) and response size for each endpoint
+under four configurations: FastAPI default, FAST_RESPONSES, and FAST_RESPONSES
+with gzip or brotli compression.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.asgi_driver import request
+
+import fast_responses
+import main
+import questionnaire_store
+import storage
+from fast_responses import CompressionMiddleware
+from models import AnswerDetail, Question, QuestionnaireCreate
+
+
+async def _populate(questionnaires: int, questions: int, answers: int) -> None:
+    for q_index in range(questionnaires):
+        await questionnaire_store.create_questionnaire(QuestionnaireCreate(
+            id=f"bench-{q_index}",
+            title=f"Benchmark questionnaire {q_index}",
+            description="Synthetic questionnaire used for response benchmarks.",
+            type="test",
+            questions=[
+                Question(
+                    id=f"q{n}",
+                    text=f"Question number {n} about a reasonably long benchmark topic?",
+                    type="multichoice",
+                    options=[f"Option {letter}" for letter in "ABCD"],
+                    rightAnswer="Option A",
+                )
+                for n in range(questions)
+            ],
+        ))
+    for a_index in range(answers):
+        await storage.save_answers(
+            f"user-{a_index}",
+            f"bench-{a_index % questionnaires}",
+            {f"q{n}": AnswerDetail(value="Option B", correct="no", rightAnswer="Option A") for n in range(questions)},
+        )
+
+
+async def _measure(app, path, params, headers, iterations):
+    status, response_headers, body = await request(app, "GET", path, params=params, headers=headers)
+    assert status == 200, (path, status)
+    started = time.process_time()
+    for _ in range(iterations):
+        await request(app, "GET", path, params=params, headers=headers)
+    cpu_us = (time.process_time() - started) / iterations * 1e6
+    return cpu_us, len(body), response_headers.get("content-encoding", "identity")
+
+
+async def run(iterations: int) -> None:
+    async with main.lifespan(main.app):
+        await _populate(questionnaires=50, questions=20, answers=500)
+        endpoints = [
+            ("/api/questionnaires", None),
+            ("/api/questionnaires/bench-0", None),
+            ("/api/responses", {"pageSize": 100}),
+        ]
+        configurations = [
+            ("default", False, main.app, {}),
+            ("fast", True, main.app, {}),
+            ("fast+gzip", True, CompressionMiddleware(main.app, minimum_size=1024), {"accept-encoding": "gzip"}),
+            ("fast+br", True, CompressionMiddleware(main.app, minimum_size=1024), {"accept-encoding": "br, gzip"}),
+        ]
+        print(f"{'endpoint':34} {'mode':10} {'cpu/req (us)':>13} {'bytes':>9} encoding")
+        for path, params in endpoints:
+            baseline = None
+            for name, fast, app, headers in configurations:
+                fast_responses.FAST_RESPONSES_ENABLED = fast
+                cpu_us, size, encoding = await _measure(app, path, params, headers, iterations)
+                baseline = baseline or cpu_us
+                print(f"{path:34} {name:10} {cpu_us:13.1f} {size:9d} {encoding} ({baseline / cpu_us:.2f}x)")
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main_cli()
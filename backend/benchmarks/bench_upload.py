@@ -0,0 +1,210 @@
+"""Throughput and latency of concurrent topic uploads against a fake Responses API.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_upload [--concurrency 1,8,32] [--uploads 64] [--latency-ms 800]
+    python -m benchmarks.bench_upload --malformed-rate 0.1 --endpoint stream
+    python -m benchmarks.bench_upload --llm-url http://127.0.0.1:8090/openai/v1/
+
+Starts :mod:`benchmarks.fake_responses` on a free local port (or uses
+``--llm-url``), points :class:`content_generator.ContentGenerator` at it and
+drives ``POST /api/upload`` and/or ``POST /api/upload/stream`` in-process, with
+Cosmos replaced by :mod:`benchmarks.fake_cosmos`. The generator's real OpenAI
+client, worker threads and HTTP connections are exercised; only the model is
+fake. Every upload uses a new topic name, so the generation cache never hits.
+
+For each ``--concurrency`` level, ``--uploads`` uploads run with at most that
+many in flight. Reported: uploads per second, p50/p99 upload latency, p50 time
+to the first streamed card, and failed branches (malformed output shows up
+here). Each upload holds two worker threads while generating, so throughput
+stops scaling near half of anyio's thread limit (40 by default).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, get_args
+
+from benchmarks.asgi_driver import request
+from benchmarks.fake_cosmos import FakeContainer, LatencyModel, install, uninstall
+from benchmarks.fake_responses import FakeResponses, add_arguments, create_app, fake_from_args
+
+# Read when the generator is created; a benchmark run must not fill the real cache.
+os.environ.setdefault("GENERATION_CACHE_MAX_BYTES", "0")
+
+import content_generator
+import cosmos_aio
+import main
+from models import ReasoningEffort
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_fake_server(fake: FakeResponses):
+    """Serve ``fake`` with uvicorn in a daemon thread; returns (base URL, server)."""
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(fake), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="fake-responses", daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Fake Responses server did not start")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/openai/v1/", server
+
+
+def _upload_body(topic: str, reasoning_effort: str) -> bytes:
+    return json.dumps({
+        "topicName": topic,
+        "topicText": f"{topic}: " + "Zdrojový text k tématu pro generování otázek. " * 40,
+        "reasoningEffort": reasoning_effort,
+    }).encode("utf-8")
+
+
+async def _upload_sync(app, body: bytes) -> Dict[str, object]:
+    status, _, response = await request(
+        app, "POST", "/api/upload", body=body, headers={"content-type": "application/json"}
+    )
+    if status == 200:
+        data = json.loads(response)
+        failed = sum(1 for key in ("flashcardId", "testId") if not data.get(key))
+    else:
+        failed = 2
+    return {"failed": failed, "first_card": None}
+
+
+async def _upload_stream(app, body: bytes) -> Dict[str, object]:
+    # The driver returns the whole body; the first card time comes from the done event.
+    status, _, response = await request(
+        app, "POST", "/api/upload/stream", body=body, headers={"content-type": "application/json"}
+    )
+    if status != 200:
+        return {"failed": 2, "first_card": None}
+    done = {}
+    for block in response.decode("utf-8").split("\n\n"):
+        if block.startswith("event: done\n"):
+            done = json.loads(block.split("data: ", 1)[1])
+    timings = done.get("timings") or {}
+    first_cards = [timings[key] for key in ("flashcardFirstCardMs", "testFirstCardMs") if key in timings]
+    return {
+        "failed": sum(1 for key in ("flashcardId", "testId") if not done.get(key)),
+        "first_card": min(first_cards) / 1000 if first_cards else None,
+    }
+
+
+async def run_level(app, endpoint: str, concurrency: int, uploads: int, reasoning_effort: str, label: str) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    first_cards: List[float] = []
+    failed_branches = 0
+
+    async def one(index: int) -> None:
+        nonlocal failed_branches
+        body = _upload_body(f"Téma {label}-{concurrency}-{index}", reasoning_effort)
+        async with semaphore:
+            started = time.perf_counter()
+            if endpoint == "stream":
+                outcome = await _upload_stream(app, body)
+            else:
+                outcome = await _upload_sync(app, body)
+            latencies.append(time.perf_counter() - started)
+        failed_branches += outcome["failed"]
+        if outcome["first_card"] is not None:
+            first_cards.append(outcome["first_card"])
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(index) for index in range(uploads)])
+    wall_seconds = time.perf_counter() - started
+    return {
+        "uploads": uploads,
+        "throughput": round(uploads / wall_seconds, 2),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "first_card_p50_ms": round(_percentile(first_cards, 0.50) * 1000, 1) if first_cards else None,
+        "failed_branches": failed_branches,
+    }
+
+
+async def run(args: argparse.Namespace, base_url: str) -> Dict[str, Dict[str, float]]:
+    content_generator.AZURE_OPENAI_BASE_URL = base_url
+    content_generator.AZURE_OPENAI_API_KEY = content_generator.AZURE_OPENAI_API_KEY or "local"
+    answers = FakeContainer("userId", LatencyModel(args.cosmos_latency_ms, 0.5, seed=1))
+    questionnaires = FakeContainer("id", LatencyModel(args.cosmos_latency_ms, 0.5, seed=2))
+    install(cosmos_aio, answers, questionnaires)
+    endpoints = ["sync", "stream"] if args.endpoint == "both" else [args.endpoint]
+    label = f"{int(time.time())}"
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        async with main.lifespan(main.app):
+            if not content_generator.get_content_generator().is_available():
+                raise RuntimeError("Content generator could not be configured")
+            for endpoint in endpoints:
+                for concurrency in args.concurrency:
+                    results[f"{endpoint}@{concurrency}"] = await run_level(
+                        main.app, endpoint, concurrency, args.uploads, args.reasoning_effort, f"{label}-{endpoint}"
+                    )
+    finally:
+        uninstall(cosmos_aio)
+
+    print(f"{'scenario':12} {'uploads':>8} {'uploads/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'1st card':>10} {'failed':>7}")
+    for name, result in results.items():
+        first_card = f"{result['first_card_p50_ms']:10.1f}" if result["first_card_p50_ms"] is not None else f"{'-':>10}"
+        print(
+            f"{name:12} {result['uploads']:8d} {result['throughput']:10.2f} {result['p50_ms']:10.1f} "
+            f"{result['p99_ms']:10.1f} {first_card} {result['failed_branches']:7d}"
+        )
+    return results
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--concurrency", type=lambda value: [int(part) for part in value.split(",")], default=[1, 8, 32],
+        help="Comma-separated numbers of uploads in flight",
+    )
+    parser.add_argument("--uploads", type=int, default=64, help="Uploads per concurrency level")
+    parser.add_argument("--endpoint", choices=("sync", "stream", "both"), default="both")
+    parser.add_argument("--reasoning-effort", default="none", choices=get_args(ReasoningEffort))
+    parser.add_argument("--cosmos-latency-ms", type=float, default=5.0, help="Median injected Cosmos latency")
+    parser.add_argument("--llm-url", help="Use this Responses API base URL instead of starting the fake")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate the timings.
+    logging.basicConfig(level=logging.WARNING)
+    fake: Optional[FakeResponses] = None
+    server = None
+    base_url = args.llm_url
+    if not base_url:
+        fake = fake_from_args(args)
+        base_url, server = _start_fake_server(fake)
+    try:
+        results = asyncio.run(run(args, base_url))
+    finally:
+        if server is not None:
+            server.should_exit = True
+    if fake is not None:
+        print(f"\nFake Responses API: {fake.served} responses, {fake.malformed} malformed")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
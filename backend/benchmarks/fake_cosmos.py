@@ -0,0 +1,353 @@
+"""In-process stand-in for an ``azure.cosmos.aio`` container, for benchmarks.
+
+:class:`FakeContainer` implements the container surface ``cosmos_aio`` uses
+(point reads and writes, partial updates, transactional batches and the
+handful of queries it issues, with ``by_page`` continuation tokens) over plain
+dicts. Every call sleeps for a latency drawn from a :class:`LatencyModel` and
+reports a synthetic request charge through ``response_hook`` or
+``client_connection.last_response_headers``, like the SDK, so the resilience
+layer and ``/metrics`` see realistic traffic. :func:`install` binds a pair of
+fakes into ``cosmos_aio`` in place of a real account.
+"""
+import asyncio
+import itertools
+import random
+import re
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+
+# Documents whose partition key starts with this prefix (the answers container's
+# "__stats__" bookkeeping partitions) are kept apart, so listing queries that
+# exclude them do not have to filter 100k documents per page.
+_RESERVED_PREFIX = "__"
+_OFFSET_LIMIT = re.compile(r"OFFSET (\d+) LIMIT (\d+)")
+
+
+@dataclass
+class LatencyModel:
+    """Log-normally distributed latency around ``median_ms`` (``sigma`` sets the tail)."""
+
+    median_ms: float = 0.0
+    sigma: float = 0.5
+    seed: Optional[int] = 0
+    _random: random.Random = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+
+    def sample(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return self.median_ms * self._random.lognormvariate(0.0, self.sigma) / 1000
+
+
+def _size_kb(document: Any) -> float:
+    return len(orjson.dumps(document)) / 1024
+
+
+def _wire_copy(value: Any) -> Any:
+    # What the SDK hands back is freshly parsed JSON; a round trip is also far cheaper than deepcopy.
+    return orjson.loads(orjson.dumps(value))
+
+
+def read_charge(document: dict) -> float:
+    return round(1.0 + max(0.0, _size_kb(document) - 1.0), 2)
+
+
+def write_charge(document: Optional[dict]) -> float:
+    return round(5.5 + 5.0 * max(0.0, _size_kb(document or {}) - 1.0), 2)
+
+
+def query_charge(items: List[Any]) -> float:
+    return round(2.5 + 0.1 * len(items) + 0.2 * _size_kb(items), 2)
+
+
+def _patched(current: dict, patch_operations: List[dict]) -> dict:
+    document = _wire_copy(current)
+    for operation in patch_operations:
+        *parents, leaf = [
+            part.replace("~1", "/").replace("~0", "~") for part in operation["path"].strip("/").split("/")
+        ]
+        target = document
+        for part in parents:
+            target = target.setdefault(part, {})
+        if operation["op"] == "incr":
+            target[leaf] = target.get(leaf, 0) + operation["value"]
+        elif operation["op"] in ("set", "add", "replace"):
+            target[leaf] = operation["value"]
+        elif operation["op"] == "remove":
+            target.pop(leaf, None)
+    return document
+
+
+class _Page:
+    def __init__(self, items: List[Any]):
+        self._items = items
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for item in self._items:
+            yield item
+
+
+class _Pages:
+    def __init__(self, query: "_Query", continuation_token: Optional[str]):
+        if continuation_token and query.cross_partition_order_by:
+            # The SDK cannot resume these either: it hands the one token to every partition.
+            raise ValueError("Continuation tokens are not supported for cross-partition ORDER BY queries")
+        self._query = query
+        self._offset = int(continuation_token or 0)
+        self._done = False
+        self.continuation_token: Optional[str] = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> _Page:
+        if self._done:
+            raise StopAsyncIteration
+        items = await self._query.container._fetch(self._query.select, self._offset, self._query.page_size)
+        self._offset += len(items)
+        self._done = len(items) < self._query.page_size
+        self.continuation_token = None if self._done else str(self._offset)
+        if not items and self._offset:
+            raise StopAsyncIteration
+        return _Page(items)
+
+
+class _Query:
+    def __init__(self, container: "FakeContainer", select, page_size: int, cross_partition_order_by: bool = False):
+        self.container = container
+        self.select = select
+        self.page_size = page_size
+        self.cross_partition_order_by = cross_partition_order_by
+
+    def by_page(self, continuation_token: Optional[str] = None) -> _Pages:
+        return _Pages(self, continuation_token)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        async for page in self.by_page():
+            async for item in page:
+                yield item
+
+
+class FakeContainer:
+    """Dict-backed container partitioned by the top-level ``partition_field``."""
+
+    def __init__(self, partition_field: str, latency: Optional[LatencyModel] = None):
+        self.partition_field = partition_field
+        self.latency = latency or LatencyModel()
+        self.client_connection = SimpleNamespace(last_response_headers={})
+        # Insertion order is write order, i.e. ascending _ts: rewrites move to the end.
+        self._documents: Dict[str, dict] = {}
+        self._reserved: Dict[str, dict] = {}
+        self._clock = itertools.count(1)
+        self.operations: Dict[str, int] = {}
+        self.request_charge: Dict[str, float] = {}
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def _store_for(self, partition_key: Any) -> Dict[str, dict]:
+        return self._reserved if str(partition_key).startswith(_RESERVED_PREFIX) else self._documents
+
+    def _find(self, item: str, partition_key: Any) -> Optional[dict]:
+        return self._store_for(partition_key).get(item)
+
+    def _put(self, body: dict) -> dict:
+        document = _wire_copy(body)
+        timestamp = next(self._clock)
+        document["_ts"] = timestamp
+        document["_etag"] = f'"{timestamp:x}"'
+        store = self._store_for(document.get(self.partition_field))
+        store.pop(document["id"], None)
+        store[document["id"]] = document
+        return _wire_copy(document)
+
+    async def _call(self, operation: str, charge: float, response_hook=None, body: Any = None) -> None:
+        self.operations[operation] = self.operations.get(operation, 0) + 1
+        self.request_charge[operation] = self.request_charge.get(operation, 0.0) + charge
+        delay = self.latency.sample()
+        if delay:
+            await asyncio.sleep(delay)
+        headers = {"x-ms-request-charge": str(charge)}
+        self.client_connection.last_response_headers = headers
+        if response_hook is not None:
+            response_hook(headers, body)
+
+    def _check_etag(self, current: Optional[dict], etag: Optional[str], match_condition) -> None:
+        if match_condition == MatchConditions.IfNotModified and current is not None and current["_etag"] != etag:
+            raise exceptions.CosmosAccessConditionFailedError(status_code=412, message="Precondition failed")
+
+    def load(self, documents: Iterable[dict]) -> int:
+        """Insert documents directly, without latency or charges (benchmark setup)."""
+        count = 0
+        for document in documents:
+            self._put(document)
+            count += 1
+        return count
+
+    def __len__(self) -> int:
+        return len(self._documents) + len(self._reserved)
+
+    # -- point operations --------------------------------------------------
+
+    async def read_item(self, item: str, partition_key: Any, response_hook=None, **kwargs) -> dict:
+        document = self._find(item, partition_key)
+        await self._call("read_item", read_charge(document) if document else 1.0, response_hook, document)
+        if document is None:
+            raise exceptions.CosmosResourceNotFoundError(status_code=404, message="Entity with the specified id does not exist")
+        return _wire_copy(document)
+
+    async def create_item(self, body: dict, response_hook=None, **kwargs) -> dict:
+        await self._call("create_item", write_charge(body), response_hook, body)
+        if self._find(body["id"], body.get(self.partition_field)) is not None:
+            raise exceptions.CosmosResourceExistsError(status_code=409, message="Entity with the specified id already exists")
+        return self._put(body)
+
+    async def upsert_item(self, body: dict, response_hook=None, **kwargs) -> dict:
+        await self._call("upsert_item", write_charge(body), response_hook, body)
+        return self._put(body)
+
+    async def replace_item(self, item: str, body: dict, etag=None, match_condition=None, response_hook=None, **kwargs) -> dict:
+        await self._call("replace_item", write_charge(body), response_hook, body)
+        current = self._find(item, body.get(self.partition_field))
+        if current is None:
+            raise exceptions.CosmosResourceNotFoundError(status_code=404, message="Entity with the specified id does not exist")
+        self._check_etag(current, etag, match_condition)
+        return self._put(body)
+
+    async def patch_item(
+        self, item: str, partition_key: Any, patch_operations: List[dict],
+        etag=None, match_condition=None, response_hook=None, **kwargs,
+    ) -> dict:
+        await self._call("patch_item", write_charge(self._find(item, partition_key)), response_hook, None)
+        # Looked up after the latency, so concurrent patches apply in turn like the service's.
+        current = self._find(item, partition_key)
+        if current is None:
+            raise exceptions.CosmosResourceNotFoundError(status_code=404, message="Entity with the specified id does not exist")
+        self._check_etag(current, etag, match_condition)
+        return self._put(_patched(current, patch_operations))
+
+    async def delete_item(self, item: str, partition_key: Any, etag=None, match_condition=None, response_hook=None, **kwargs) -> None:
+        await self._call("delete_item", write_charge(self._find(item, partition_key)), response_hook, None)
+        current = self._find(item, partition_key)
+        if current is None:
+            raise exceptions.CosmosResourceNotFoundError(status_code=404, message="Entity with the specified id does not exist")
+        self._check_etag(current, etag, match_condition)
+        del self._store_for(partition_key)[item]
+
+    async def execute_item_batch(self, batch_operations: List[tuple], partition_key: Any, response_hook=None, **kwargs) -> List[dict]:
+        bodies = [args[0] if operation == "upsert" else self._find(args[0], partition_key) for operation, args, *_ in batch_operations]
+        await self._call("execute_item_batch", sum(write_charge(body) for body in bodies), response_hook, None)
+        # All or nothing: every operation is checked before any is applied.
+        for index, (operation, args, *_) in enumerate(batch_operations):
+            if operation not in ("upsert", "patch"):
+                raise NotImplementedError(f"Batch operation {operation!r} is not supported by the fake")
+            if operation == "patch" and self._find(args[0], partition_key) is None:
+                raise exceptions.CosmosBatchOperationError(
+                    error_index=index, headers={}, status_code=404,
+                    message="Entity with the specified id does not exist", operation_responses=[],
+                )
+        results = []
+        for operation, args, *_ in batch_operations:
+            if operation == "patch":
+                results.append({"statusCode": 200, "resourceBody": self._put(_patched(self._find(args[0], partition_key), args[1]))})
+                continue
+            existed = self._find(args[0]["id"], partition_key) is not None
+            results.append({"statusCode": 200 if existed else 201, "resourceBody": self._put(args[0])})
+        return results
+
+    # -- queries -----------------------------------------------------------
+
+    def query_items(self, query: str, parameters: Optional[List[dict]] = None, max_item_count: Optional[int] = None, **kwargs) -> _Query:
+        """Answer the queries ``cosmos_aio`` issues; anything else raises NotImplementedError."""
+        values = {parameter["name"]: parameter["value"] for parameter in parameters or []}
+        include_reserved = "STARTSWITH(c.userId" not in query
+        newest_first = "ORDER BY c._ts DESC" in query
+        offset_limit = _OFFSET_LIMIT.search(query)
+
+        def documents() -> Iterator[dict]:
+            sources = [self._documents] + ([self._reserved] if include_reserved else [])
+            # C-level iterators only, so skipping to a page's offset stays cheap.
+            return itertools.chain.from_iterable(
+                reversed(source.values()) if newest_first else source.values() for source in sources
+            )
+
+        if "@questionnaireIds" in values:
+            wanted = set(values["@questionnaireIds"])
+            user_id = values["@userId"]
+
+            def select(offset: int, limit: int) -> List[Any]:
+                rows = [
+                    {"questionnaireId": document["questionnaireId"], "answers": document.get("answers")}
+                    for document in self._documents.values()
+                    if document.get("userId") == user_id and document.get("questionnaireId") in wanted
+                ]
+                return rows[offset:offset + limit]
+        elif query.startswith("SELECT VALUE c.questionnaireId"):
+            def select(offset: int, limit: int) -> List[Any]:
+                return [document["questionnaireId"] for document in itertools.islice(documents(), offset, offset + limit)]
+        elif "ARRAY_LENGTH(c.questions)" in query:
+            def select(offset: int, limit: int) -> List[Any]:
+                fields = ("id", "title", "description", "type", "questionnaireType", "contentHash", "_etag")
+                return [
+                    {**{name: document[name] for name in fields if name in document},
+                     "questionCount": len(document.get("questions") or [])}
+                    for document in itertools.islice(documents(), offset, offset + limit)
+                ]
+        elif query.startswith("SELECT * FROM c"):
+            questionnaire_id = values.get("@questionnaireId")
+            before = (values["@ts"], values["@id"]) if "@ts" in values else None
+
+            def select(offset: int, limit: int) -> List[Any]:
+                matching = documents()
+                if before is not None:
+                    # Keyset page of the newest-first listing: skip down to the (_ts, id) key.
+                    matching = itertools.dropwhile(lambda document: (document["_ts"], document["id"]) >= before, matching)
+                if questionnaire_id is not None:
+                    matching = (document for document in matching if document.get("questionnaireId") == questionnaire_id)
+                if offset_limit:
+                    start, count = int(offset_limit.group(1)), int(offset_limit.group(2))
+                    matching = itertools.islice(matching, start, start + count)
+                return [_wire_copy(document) for document in itertools.islice(matching, offset, offset + limit)]
+        else:
+            raise NotImplementedError(f"Query not supported by the fake container: {query}")
+
+        cross_partition_order_by = "ORDER BY" in query and kwargs.get("partition_key") is None
+        return _Query(self, select, max_item_count or 1000, cross_partition_order_by)
+
+    async def _fetch(self, select, offset: int, limit: int) -> List[Any]:
+        items = select(offset, limit)
+        await self._call("query_items", query_charge(items), body=items)
+        return items
+
+
+def install(cosmos_module, answers: FakeContainer, questionnaires: FakeContainer) -> None:
+    """Bind fakes into ``cosmos_aio`` behind its resilience wrapper, as ``init_cosmos`` would."""
+    cosmos_module._answers_container = cosmos_module._resilient(answers, "/" + answers.partition_field)
+    cosmos_module._questionnaire_container = cosmos_module._resilient(questionnaires, "/" + questionnaires.partition_field)
+
+
+def uninstall(cosmos_module) -> None:
+    cosmos_module._answers_container = None
+    cosmos_module._questionnaire_container = None
+
+
+def charge_summary(*containers: FakeContainer) -> Dict[str, Tuple[int, float]]:
+    """{operation: (calls, request units)} summed over ``containers``."""
+    summary: Dict[str, Tuple[int, float]] = {}
+    for container in containers:
+        for operation, calls in container.operations.items():
+            previous_calls, previous_charge = summary.get(operation, (0, 0.0))
+            summary[operation] = (previous_calls + calls, previous_charge + container.request_charge[operation])
+    return summary
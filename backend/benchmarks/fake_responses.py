@@ -0,0 +1,294 @@
+"""Local stand-in for the Responses API (``responses.create``) used by the upload path.
+
+Run from ``backend/``::
+
+    python -m benchmarks.fake_responses [--port 8090] [--latency-ms 800] [--malformed-rate 0.05]
+
+then point the backend at it::
+
+    AZURE_OPENAI_BASE_URL=http://127.0.0.1:8090/openai/v1/ AZURE_OPENAI_API_KEY=local uvicorn main:app
+
+Serves ``POST /openai/v1/responses`` (and ``/v1/responses``) both as a single
+JSON response and, with ``"stream": true``, as server-sent events
+(``response.created``, ``response.output_text.delta``, ``response.completed``),
+which is all :class:`content_generator.ContentGenerator` reads. The output is a
+flashcard set or test, depending on the system prompt, for the topic named in
+the user message: templated questions by default, or the ``--flashcard-file``
+/ ``--test-file`` JSON with ``<topic>`` replaced.
+
+Timing follows a hosted model: a log-normal time to first token (median
+``--latency-ms``, spread ``--sigma``), hidden reasoning tokens per
+``reasoning.effort``, and ``--token-ms`` per output token, streamed in the
+same cadence. ``usage`` is estimated at four characters per token (plus a fixed
+cost per image). ``--malformed-rate`` of the responses are cut off mid-JSON, to
+exercise the error handling of both upload endpoints.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from typing import Dict, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+# Hidden reasoning tokens per reasoning.effort, roughly what the upload prompts use.
+REASONING_TOKENS = {"none": 0, "minimal": 16, "low": 64, "medium": 256, "high": 1024}
+IMAGE_INPUT_TOKENS = 765
+CHARS_PER_TOKEN = 4
+_TOPIC = re.compile(r"^Topic: (.+)$", re.MULTILINE)
+
+
+def _slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "topic"
+
+
+def _tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def templated_questionnaire(kind: str, topic: str, questions: int = 5) -> dict:
+    """A flashcard set or test for ``topic`` in the shape the prompts ask for."""
+    if kind == "flashcard":
+        items = [
+            {
+                "id": f"card-{n}",
+                "text": f"Co je klíčový pojem číslo {n} tématu {topic}?",
+                "type": "text",
+                "options": None,
+                "scaleMax": None,
+                "rightAnswer": f"Klíčový pojem {n} tématu {topic} a jeho stručné vysvětlení.",
+            }
+            for n in range(1, questions + 1)
+        ]
+        description = f"Kartičky k procvičení tématu {topic}."
+    else:
+        items = [
+            {
+                "id": f"q{n}",
+                "text": f"Které tvrzení o tématu {topic} je správné ({n})?",
+                "type": "multichoice",
+                "options": [f"Tvrzení {letter}" for letter in "ABCD"],
+                "scaleMax": None,
+                "rightAnswer": "Tvrzení A",
+            }
+            for n in range(1, questions + 1)
+        ]
+        description = f"Test z tématu {topic}."
+    return {
+        "id": f"{_slugify(topic)}-{kind}",
+        "type": kind,
+        "title": f"{topic} - {'kartičky' if kind == 'flashcard' else 'test'}",
+        "questions": items,
+        "description": description,
+    }
+
+
+class FakeResponses:
+    """Builds the output text and timing for one ``responses.create`` request."""
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        sigma: float = 0.4,
+        token_ms: float = 2.0,
+        malformed_rate: float = 0.0,
+        templates: Optional[Dict[str, str]] = None,
+        questions: int = 5,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.token_ms = token_ms
+        self.malformed_rate = malformed_rate
+        self.templates = templates or {}
+        self.questions = questions
+        self._random = random.Random(seed)
+        self.served = 0
+        self.malformed = 0
+
+    def first_token_seconds(self, reasoning_tokens: int) -> float:
+        if self.latency_ms <= 0:
+            return reasoning_tokens * self.token_ms / 1000
+        latency = self._random.lognormvariate(math.log(self.latency_ms / 1000), self.sigma)
+        return latency + reasoning_tokens * self.token_ms / 1000
+
+    def output_text(self, kind: str, topic: str) -> str:
+        if kind in self.templates:
+            text = self.templates[kind].replace("<topic>", topic)
+        else:
+            text = json.dumps(templated_questionnaire(kind, topic, self.questions), ensure_ascii=False, indent=2)
+        self.served += 1
+        if self.malformed_rate > 0 and self._random.random() < self.malformed_rate:
+            self.malformed += 1
+            return text[: self._random.randint(1, len(text) - 1)]
+        return text
+
+
+def _parse_request(body: dict) -> dict:
+    """Kind, topic, effort and input token estimate of a ``responses.create`` body."""
+    system_prompt, user_text, images = "", "", 0
+    for message in body.get("input") or []:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts = [{"type": "input_text", "text": content}]
+        else:
+            parts = content or []
+        for part in parts:
+            if part.get("type") == "input_image":
+                images += 1
+            elif message.get("role") == "system":
+                system_prompt += part.get("text", "")
+            else:
+                user_text += part.get("text", "")
+    match = _TOPIC.search(user_text)
+    return {
+        "kind": "flashcard" if '"type": "flashcard"' in system_prompt else "test",
+        "topic": match.group(1).strip() if match else "Téma",
+        "effort": ((body.get("reasoning") or {}).get("effort")) or "none",
+        "input_tokens": _tokens(system_prompt + user_text) + images * IMAGE_INPUT_TOKENS,
+    }
+
+
+def _response_object(response_id: str, model: str, text: Optional[str], usage: Optional[dict], created: int) -> dict:
+    output = []
+    if text is not None:
+        output.append({
+            "id": f"msg_{response_id[5:]}",
+            "type": "message",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        })
+    return {
+        "id": response_id,
+        "object": "response",
+        "created_at": created,
+        "status": "completed" if text is not None else "in_progress",
+        "model": model,
+        "output": output,
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": usage,
+    }
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def create_app(fake: FakeResponses, chunk_tokens: int = 8) -> Starlette:
+    async def create(request: Request):
+        body = await request.json()
+        parsed = _parse_request(body)
+        model = body.get("model") or "fake-model"
+        reasoning_tokens = REASONING_TOKENS.get(parsed["effort"], 0)
+        text = fake.output_text(parsed["kind"], parsed["topic"])
+        usage = {
+            "input_tokens": parsed["input_tokens"],
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": _tokens(text) + reasoning_tokens,
+            "output_tokens_details": {"reasoning_tokens": reasoning_tokens},
+            "total_tokens": parsed["input_tokens"] + _tokens(text) + reasoning_tokens,
+        }
+        response_id = f"resp_{uuid.uuid4().hex}"
+        created = int(time.time())
+        first_token = fake.first_token_seconds(reasoning_tokens)
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token + _tokens(text) * fake.token_ms / 1000)
+            return JSONResponse(_response_object(response_id, model, text, usage, created))
+
+        async def events():
+            sequence = 0
+            yield _sse({
+                "type": "response.created",
+                "sequence_number": sequence,
+                "response": _response_object(response_id, model, None, None, created),
+            })
+            await asyncio.sleep(first_token)
+            chunk_chars = chunk_tokens * CHARS_PER_TOKEN
+            for start in range(0, len(text), chunk_chars):
+                sequence += 1
+                yield _sse({
+                    "type": "response.output_text.delta",
+                    "sequence_number": sequence,
+                    "item_id": f"msg_{response_id[5:]}",
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": text[start:start + chunk_chars],
+                    "logprobs": [],
+                })
+                await asyncio.sleep(chunk_tokens * fake.token_ms / 1000)
+            yield _sse({
+                "type": "response.completed",
+                "sequence_number": sequence + 1,
+                "response": _response_object(response_id, model, text, usage, created),
+            })
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def stats(request: Request):
+        return JSONResponse({"served": fake.served, "malformed": fake.malformed})
+
+    return Starlette(routes=[
+        Route("/openai/v1/responses", create, methods=["POST"]),
+        Route("/v1/responses", create, methods=["POST"]),
+        Route("/stats", stats, methods=["GET"]),
+    ])
+
+
+def _load_templates(flashcard_file: Optional[str], test_file: Optional[str]) -> Dict[str, str]:
+    templates = {}
+    for kind, path in (("flashcard", flashcard_file), ("test", test_file)):
+        if path:
+            with open(path, encoding="utf-8") as handle:
+                templates[kind] = handle.read()
+    return templates
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options shared with :mod:`benchmarks.bench_upload`."""
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Median time to first token (0 disables)")
+    parser.add_argument("--sigma", type=float, default=0.4, help="Log-normal spread of the time to first token")
+    parser.add_argument("--token-ms", type=float, default=2.0, help="Generation time per output/reasoning token")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of responses cut off mid-JSON")
+    parser.add_argument("--questions", type=int, default=5, help="Questions per templated flashcard set/test")
+    parser.add_argument("--flashcard-file", help="Canned flashcard JSON (<topic> is replaced) instead of the template")
+    parser.add_argument("--test-file", help="Canned test JSON (<topic> is replaced) instead of the template")
+    parser.add_argument("--seed", type=int, help="Seed for latency and malformed-output draws")
+
+
+def fake_from_args(args: argparse.Namespace) -> FakeResponses:
+    return FakeResponses(
+        latency_ms=args.latency_ms,
+        sigma=args.sigma,
+        token_ms=args.token_ms,
+        malformed_rate=args.malformed_rate,
+        templates=_load_templates(args.flashcard_file, args.test_file),
+        questions=args.questions,
+        seed=args.seed,
+    )
+
+
+def main_cli() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(fake_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -6,11 +6,28 @@ import json
 import logging
 import os
 import re
-from typing import Optional
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
 
 from openai import OpenAI
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
+try:
+    from backend.generation_cache import GenerationCache, generation_key
+    from backend.metrics import observe_generation
+    from backend.models import QuestionnaireCreate
+    from backend.questionnaire_store import validate_questionnaire
+except ImportError:  # Allow fallback execution without package context
+    import sys
+
+    sys.path.append(str(Path(__file__).resolve().parent))
+    from generation_cache import GenerationCache, generation_key
+    from metrics import observe_generation
+    from models import QuestionnaireCreate
+    from questionnaire_store import validate_questionnaire
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,6 +43,18 @@ def _get_setting(*keys: str, default: Optional[str] = None) -> Optional[str]:
 # Azure OpenAI configuration
 AZURE_OPENAI_ENDPOINT = _get_setting("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_MODEL = _get_setting("AZURE_OPENAI_MODEL", default="gpt-4o")
+# Any Responses-compatible base URL (e.g. the local fake in benchmarks/fake_responses.py);
+# overrides the one derived from AZURE_OPENAI_ENDPOINT.
+AZURE_OPENAI_BASE_URL = _get_setting("AZURE_OPENAI_BASE_URL")
+# Key authentication instead of Entra ID (required for endpoints without Entra ID).
+AZURE_OPENAI_API_KEY = _get_setting("AZURE_OPENAI_API_KEY")
+
+# Cache of generation results (set GENERATION_CACHE_MAX_BYTES=0 to disable)
+GENERATION_CACHE_PATH = _get_setting(
+    "GENERATION_CACHE_PATH", default=str(Path(tempfile.gettempdir()) / "generation-cache.sqlite")
+)
+GENERATION_CACHE_MAX_BYTES = int(_get_setting("GENERATION_CACHE_MAX_BYTES", default=str(50 * 1024 * 1024)))
+GENERATION_CACHE_MAX_AGE_SECONDS = float(_get_setting("GENERATION_CACHE_MAX_AGE_SECONDS", default=str(7 * 24 * 3600)))
 
 
 # Prompts for generating content
@@ -146,12 +175,98 @@ def _extract_json_from_response(text: str) -> dict:
     return json.loads(text.strip())
 
 
+class QuestionStreamParser:
+    """Incrementally extract the objects of the top-level ``questions`` array.
+
+    Feed streamed text deltas to :meth:`feed`; each call returns the question
+    objects completed by that delta. Only brace/bracket depth and string state
+    are tracked, and only the text of the object or key still open is kept for
+    the next delta, so the cost is linear in the streamed text.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        # Unconsumed tail of the stream; the positions below index into it.
+        self._buffer = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._questions_depth: Optional[int] = None
+        self._object_start: Optional[int] = None
+
+    def feed(self, delta: str) -> List[dict]:
+        self._chunks.append(delta)
+        completed: List[dict] = []
+        text = self._buffer + delta
+        for index in range(len(self._buffer), len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start:index]
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = index + 1
+            elif char == ":" and self._depth == 1:
+                self._pending_key = self._last_key
+            elif char == "," and self._depth == 1:
+                self._pending_key = None
+            elif char in "{[":
+                if char == "[" and self._depth == 1 and self._pending_key == "questions":
+                    self._questions_depth = 2
+                elif char == "{" and self._depth == self._questions_depth:
+                    self._object_start = index
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == self._questions_depth and char == "}" and self._object_start is not None:
+                    try:
+                        completed.append(json.loads(text[self._object_start:index + 1]))
+                    except json.JSONDecodeError:
+                        logger.debug("Skipping malformed streamed question object")
+                    self._object_start = None
+                elif self._questions_depth is not None and self._depth < self._questions_depth:
+                    self._questions_depth = None
+        self._buffer = self._unconsumed(text)
+        return completed
+
+    def _unconsumed(self, text: str) -> str:
+        """Drop the scanned text no later delta can refer back to, shifting the positions."""
+        keep = len(text)
+        if self._object_start is not None:
+            keep = self._object_start
+        if self._in_string:
+            keep = min(keep, self._string_start)
+        if self._object_start is not None:
+            self._object_start -= keep
+        self._string_start -= keep
+        return text[keep:]
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+
 class ContentGenerator:
     """Generator for creating educational content using Azure OpenAI Responses API."""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[GenerationCache] = None):
         self._client: Optional[OpenAI] = None
         self._initialized = False
+        self._cache = cache if cache is not None else GenerationCache(
+            GENERATION_CACHE_PATH,
+            max_bytes=GENERATION_CACHE_MAX_BYTES,
+            max_age_seconds=GENERATION_CACHE_MAX_AGE_SECONDS,
+        )
         
     def _ensure_client(self) -> bool:
         """Initialize the OpenAI client if not already done."""
@@ -160,21 +275,25 @@ class ContentGenerator:
             
         self._initialized = True
         
-        if not AZURE_OPENAI_ENDPOINT:
+        if not AZURE_OPENAI_ENDPOINT and not AZURE_OPENAI_BASE_URL:
             logger.warning(
                 "Azure OpenAI not configured. Set AZURE_OPENAI_ENDPOINT."
             )
             return False
         
         try:
+            # Use v1 endpoint for Responses API
+            base_url = AZURE_OPENAI_BASE_URL or f"{AZURE_OPENAI_ENDPOINT.rstrip('/')}/openai/v1/"
+            if AZURE_OPENAI_API_KEY:
+                self._client = OpenAI(api_key=AZURE_OPENAI_API_KEY, base_url=base_url)
+                logger.info("Azure OpenAI client initialized with API key for %s", base_url)
+                return True
+
             # Use Entra ID with DefaultAzureCredential for managed identity
             token_provider = get_bearer_token_provider(
                 DefaultAzureCredential(),
                 "https://cognitiveservices.azure.com/.default"
             )
-            
-            # Use v1 endpoint for Responses API
-            base_url = f"{AZURE_OPENAI_ENDPOINT.rstrip('/')}/openai/v1/"
             self._client = OpenAI(
                 api_key=token_provider,
                 base_url=base_url,
@@ -189,6 +308,10 @@ class ContentGenerator:
         """Check if the generator is available."""
         return self._ensure_client()
 
+    def cache_stats(self) -> Dict[str, object]:
+        """Return hit/miss counters and size of the generation cache."""
+        return self._cache.stats()
+
     def _build_user_content(self, topic_name: str, topic_text: str, images: Optional[list[dict]] = None):
         """Build a Responses API user message content payload, including optional images."""
 
@@ -210,7 +333,109 @@ class ContentGenerator:
                     image_index += 1
 
         return content
+
+    def _create_response(self, kind: str, prompt: str, user_content: list, reasoning_effort: str):
+        """Call the Responses API once, recording latency and token usage."""
+        started = time.perf_counter()
+        try:
+            response = self._client.responses.create(
+                model=AZURE_OPENAI_MODEL,
+                input=[
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": user_content}
+                ],
+                reasoning={"effort": reasoning_effort}
+            )
+        except Exception:
+            observe_generation(kind, reasoning_effort, started, failed=True)
+            raise
+        observe_generation(kind, reasoning_effort, started, getattr(response, "usage", None))
+        return response
     
+    def _accept(self, kind: str, topic_name: str, cache_key: str, result: dict) -> None:
+        """Fill in a missing id and cache ``result`` once it passes the checks storing it will apply.
+
+        Output the store would reject is never cached, so uploading the topic again
+        asks the model again instead of replaying the failure.
+        """
+        if "id" not in result or not result["id"]:
+            result["id"] = f"{_slugify(topic_name)}-{kind}"
+        try:
+            validate_questionnaire(QuestionnaireCreate(**result))
+        except ValueError as e:
+            raise ValueError(f"Generated {kind} is not a valid questionnaire: {e}") from e
+        self._cache.set(cache_key, result)
+
+    def stream_questionnaire(
+        self,
+        kind: str,
+        topic_name: str,
+        topic_text: str,
+        images: Optional[list[dict]] = None,
+        reasoning_effort: str = "none",
+    ) -> Iterator[dict]:
+        """
+        Stream a flashcard set (``kind="flashcard"``) or test (``kind="test"``).
+
+        Yields ``{"type": "card", "card": {...}}`` as soon as each question object
+        is complete in the streamed output, then a single
+        ``{"type": "questionnaire", "questionnaire": {...}}`` with the full result.
+        """
+        if not self._ensure_client():
+            raise RuntimeError("Azure OpenAI is not configured")
+
+        prompt_template = _PROMPTS[kind]
+        cache_key = generation_key(prompt_template, AZURE_OPENAI_MODEL, reasoning_effort, topic_name, topic_text, images)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.info("Streaming cached %s for topic: %s", kind, topic_name)
+            for card in cached.get("questions") or []:
+                yield {"type": "card", "card": card}
+            yield {"type": "questionnaire", "questionnaire": cached}
+            return
+
+        logger.info("Streaming %s for topic: %s (reasoning: %s)", kind, topic_name, reasoning_effort)
+        started = time.perf_counter()
+        usage = None
+        failed = False
+        parser = QuestionStreamParser()
+        try:
+            stream = self._client.responses.create(
+                model=AZURE_OPENAI_MODEL,
+                input=[
+                    {"role": "system", "content": prompt_template.replace("<topic>", topic_name)},
+                    {"role": "user", "content": self._build_user_content(topic_name, topic_text, images)},
+                ],
+                reasoning={"effort": reasoning_effort},
+                stream=True,
+            )
+            for event in stream:
+                event_type = getattr(event, "type", "")
+                if event_type == "response.output_text.delta":
+                    for card in parser.feed(event.delta):
+                        yield {"type": "card", "card": card}
+                elif event_type == "response.completed":
+                    usage = getattr(getattr(event, "response", None), "usage", None)
+                elif event_type in ("response.failed", "error"):
+                    raise RuntimeError(f"Streaming generation failed: {getattr(event, 'message', event_type)}")
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # Also reached when the consumer stops early (client disconnected).
+            observe_generation(kind, reasoning_effort, started, usage, failed=failed)
+
+        if not parser.text:
+            raise ValueError("No output text in response")
+        try:
+            result = _extract_json_from_response(parser.text)
+        except json.JSONDecodeError as e:
+            logger.error("Failed to parse streamed %s response as JSON: %s", kind, e)
+            raise ValueError(f"Invalid JSON in response: {e}")
+        self._accept(kind, topic_name, cache_key, result)
+        logger.info("Successfully streamed %s for topic: %s", kind, topic_name)
+        yield {"type": "questionnaire", "questionnaire": result}
+
     def generate_flashcards(
         self,
         topic_name: str,
@@ -233,24 +458,21 @@ class ContentGenerator:
         if not self._ensure_client():
             raise RuntimeError("Azure OpenAI is not configured")
         
-        topic_id = _slugify(topic_name)
-        
         # Build the prompt with topic context
         prompt = FLASHCARD_PROMPT.replace("<topic>", topic_name)
         
+        cache_key = generation_key(FLASHCARD_PROMPT, AZURE_OPENAI_MODEL, reasoning_effort, topic_name, topic_text, images)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.info("Serving cached flashcards for topic: %s", topic_name)
+            return cached
+
         user_content = self._build_user_content(topic_name, topic_text, images)
 
         logger.info("Generating flashcards for topic: %s (reasoning: %s)", topic_name, reasoning_effort)
         
         try:
-            response = self._client.responses.create(
-                model=AZURE_OPENAI_MODEL,
-                input=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                reasoning={"effort": reasoning_effort}
-            )
+            response = self._create_response("flashcard", prompt, user_content, reasoning_effort)
             
             # Extract text from response
             output_text = ""
@@ -265,9 +487,7 @@ class ContentGenerator:
             
             result = _extract_json_from_response(output_text)
             
-            # Ensure the ID is set correctly
-            if "id" not in result or not result["id"]:
-                result["id"] = f"{topic_id}-flashcard"
+            self._accept("flashcard", topic_name, cache_key, result)
             
             logger.info("Successfully generated flashcards for topic: %s", topic_name)
             return result
@@ -301,24 +521,21 @@ class ContentGenerator:
         if not self._ensure_client():
             raise RuntimeError("Azure OpenAI is not configured")
         
-        topic_id = _slugify(topic_name)
-        
         # Build the prompt with topic context
         prompt = TEST_PROMPT.replace("<topic>", topic_name)
         
+        cache_key = generation_key(TEST_PROMPT, AZURE_OPENAI_MODEL, reasoning_effort, topic_name, topic_text, images)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.info("Serving cached test for topic: %s", topic_name)
+            return cached
+
         user_content = self._build_user_content(topic_name, topic_text, images)
 
         logger.info("Generating test for topic: %s (reasoning: %s)", topic_name, reasoning_effort)
         
         try:
-            response = self._client.responses.create(
-                model=AZURE_OPENAI_MODEL,
-                input=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                reasoning={"effort": reasoning_effort}
-            )
+            response = self._create_response("test", prompt, user_content, reasoning_effort)
             
             # Extract text from response
             output_text = ""
@@ -333,9 +550,7 @@ class ContentGenerator:
             
             result = _extract_json_from_response(output_text)
             
-            # Ensure the ID is set correctly
-            if "id" not in result or not result["id"]:
-                result["id"] = f"{topic_id}-test"
+            self._accept("test", topic_name, cache_key, result)
             
             logger.info("Successfully generated test for topic: %s", topic_name)
             return result
@@ -348,6 +563,9 @@ class ContentGenerator:
             raise
 
 
+_PROMPTS = {"flashcard": FLASHCARD_PROMPT, "test": TEST_PROMPT}
+
+
 # Singleton instance
 _generator: Optional[ContentGenerator] = None
 
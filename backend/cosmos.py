@@ -48,6 +48,8 @@ _QUESTIONNAIRE_PARTITION_KEY = _get_setting(
     "COSMOS_QUESTIONNAIRE_PARTITION_KEY",
     default="/id",
 )
+# Statistics documents per questionnaire, each in its own logical partition.
+COSMOS_STATS_SHARDS = max(1, int(_get_setting("COSMOS_STATS_SHARDS", default="8")))
 
 _client: Optional[CosmosClient] = None
 _answers_container = None
@@ -62,6 +64,11 @@ def _should_skip_ssl_verification() -> bool:
     return _get_setting("COSMOS_EMULATOR_DISABLE_SSL_VERIFY") in {"1", "true", "True"}
 
 
+def _should_provision() -> bool:
+    """False binds to existing resources without create-if-not-exists management calls."""
+    return _get_setting("COSMOS_PROVISION", default="true") not in {"0", "false", "False", "no"}
+
+
 def _managed_identity_available() -> bool:
     if COSMOS_KEY:
         return False
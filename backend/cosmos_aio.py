@@ -0,0 +1,792 @@
+"""Async twin of :mod:`cosmos` built on ``azure.cosmos.aio``.
+
+Function names and return shapes mirror the synchronous module so callers can
+switch between them by awaiting. The client is created by :func:`init_cosmos`
+and must be released with :func:`close_cosmos` (both driven by the FastAPI
+lifespan).
+"""
+import asyncio
+import logging
+import random
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from azure.core import MatchConditions
+from azure.cosmos import PartitionKey, exceptions
+from azure.cosmos.aio import CosmosClient
+from azure.cosmos.documents import ConnectionPolicy, RetryOptions
+from azure.identity.aio import ManagedIdentityCredential
+
+try:
+    from backend.cosmos import (
+        COSMOS_ANSWERS_CONTAINER,
+        COSMOS_DATABASE_NAME,
+        COSMOS_ENDPOINT,
+        COSMOS_KEY,
+        COSMOS_QUESTIONNAIRE_CONTAINER,
+        COSMOS_STATS_SHARDS,
+        _ANSWERS_PARTITION_KEY,
+        _MANAGED_IDENTITY_CLIENT_ID,
+        _QUESTIONNAIRE_PARTITION_KEY,
+        _managed_identity_available,
+        _prune_system_fields,
+        _should_provision,
+        _should_skip_ssl_verification,
+    )
+    from backend.cosmos_resilience import CosmosConflictError, CosmosGuard, CosmosUnavailableError, ResilientContainer
+    from backend.metrics import answer_counter_failures, observe_cosmos
+except ImportError:  # Allow fallback execution without package context
+    import sys
+
+    sys.path.append(str(Path(__file__).resolve().parent))
+    from cosmos import (
+        COSMOS_ANSWERS_CONTAINER,
+        COSMOS_DATABASE_NAME,
+        COSMOS_ENDPOINT,
+        COSMOS_KEY,
+        COSMOS_QUESTIONNAIRE_CONTAINER,
+        COSMOS_STATS_SHARDS,
+        _ANSWERS_PARTITION_KEY,
+        _MANAGED_IDENTITY_CLIENT_ID,
+        _QUESTIONNAIRE_PARTITION_KEY,
+        _managed_identity_available,
+        _prune_system_fields,
+        _should_provision,
+        _should_skip_ssl_verification,
+    )
+    from cosmos_resilience import CosmosConflictError, CosmosGuard, CosmosUnavailableError, ResilientContainer
+    from metrics import answer_counter_failures, observe_cosmos
+
+
+logger = logging.getLogger(__name__)
+
+# Reserved partitions in the answers container holding bookkeeping documents: the
+# response counters in STATS_PARTITION and the statistics shards in partitions named
+# after it. Listing queries exclude them all via _ANSWERS_FILTER.
+STATS_PARTITION = "__stats__"
+_COUNTS_DOCUMENT_ID = "answer-counts"
+_STATS_DOCUMENT_PREFIX = "answer-stats:"
+_ANSWERS_FILTER = f"NOT STARTSWITH(c.userId, '{STATS_PARTITION}')"
+# Service limit for operations in one transactional batch.
+_MAX_BATCH_OPERATIONS = 100
+# Service limit for operations in one partial document update.
+_MAX_PATCH_OPERATIONS = 10
+# Newest-first listings order by (_ts, id); Cosmos needs a composite index for that.
+_ANSWERS_COMPOSITE_INDEX = [{"path": "/_ts", "order": "descending"}, {"path": "/id", "order": "descending"}]
+_ANSWERS_INDEXING_POLICY = {
+    "indexingMode": "consistent",
+    "includedPaths": [{"path": "/*"}],
+    "excludedPaths": [{"path": '/"_etag"/?'}],
+    "compositeIndexes": [_ANSWERS_COMPOSITE_INDEX],
+}
+# Read-then-conditional-write attempts before giving up on an exact previous state.
+_MAX_CONDITIONAL_ATTEMPTS = 5
+
+_client: Optional[CosmosClient] = None
+_credential: Optional[ManagedIdentityCredential] = None
+_answers_container = None
+_questionnaire_container = None
+# Shared by both containers and kept across re-initialization so /check history survives.
+_guard = CosmosGuard.from_env()
+
+
+def _resolve_credential() -> Tuple[Optional[object], str]:
+    global _credential
+
+    if COSMOS_KEY:
+        return COSMOS_KEY, "key"
+    if _managed_identity_available():
+        try:
+            if _MANAGED_IDENTITY_CLIENT_ID:
+                _credential = ManagedIdentityCredential(client_id=_MANAGED_IDENTITY_CLIENT_ID)
+            else:
+                _credential = ManagedIdentityCredential()
+            return _credential, "managed identity"
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception("Failed to initialize managed identity credential")
+    return None, "none"
+
+
+def _connection_policy() -> ConnectionPolicy:
+    # Throttled requests are retried by the resilience layer, which honours the
+    # budget and breaker; SDK-level retries would wait invisibly underneath it.
+    policy = ConnectionPolicy()
+    policy.RetryOptions = RetryOptions(max_retry_attempt_count=0)
+    return policy
+
+
+def _resilient(container, partition_key_path: str) -> ResilientContainer:
+    return ResilientContainer(container, _guard, partition_field=partition_key_path.lstrip("/"))
+
+
+async def init_cosmos(timings: Optional[Dict[str, float]] = None) -> bool:
+    """Create the async client and bind the answers/questionnaire containers.
+
+    With ``COSMOS_PROVISION`` disabled the containers are bound by name without
+    any management round trips, so startup does no network I/O at all; a missing
+    database or container then surfaces on the first request instead. Elapsed
+    milliseconds per step are recorded into ``timings`` when given.
+    """
+
+    global _client, _answers_container, _questionnaire_container
+
+    if _client is not None:
+        await close_cosmos()
+
+    if not COSMOS_ENDPOINT:
+        logger.warning("Skipping Cosmos initialization because endpoint is missing. Using in-memory fallback.")
+        return False
+
+    started = time.perf_counter()
+
+    def record(step: str) -> None:
+        nonlocal started
+        now = time.perf_counter()
+        if timings is not None:
+            timings[step] = round((now - started) * 1000, 1)
+        started = now
+
+    credential, auth_mode = _resolve_credential()
+    if not credential:
+        logger.warning(
+            "Skipping Cosmos initialization because no valid credential was resolved. Using in-memory fallback.")
+        return False
+
+    try:
+        client_kwargs = {}
+        if _should_skip_ssl_verification():
+            client_kwargs["connection_verify"] = False
+            logger.info("COSMOS_EMULATOR_DISABLE_SSL_VERIFY is set; disabling SSL verification for client.")
+
+        provision = _should_provision()
+        logger.info(
+            "Creating async Cosmos client with %s authentication and %s database/containers...",
+            auth_mode,
+            "ensuring" if provision else "binding to existing",
+        )
+        client_kwargs["connection_policy"] = _connection_policy()
+        _client = CosmosClient(COSMOS_ENDPOINT, credential=credential, **client_kwargs)
+        record("cosmosClient")
+
+        if not provision:
+            database = _client.get_database_client(COSMOS_DATABASE_NAME)
+            answers_container = database.get_container_client(COSMOS_ANSWERS_CONTAINER)
+            questionnaire_container = database.get_container_client(COSMOS_QUESTIONNAIRE_CONTAINER)
+            record("cosmosBind")
+        else:
+            database = await _client.create_database_if_not_exists(COSMOS_DATABASE_NAME)
+            record("cosmosDatabase")
+
+            answers_container = await database.create_container_if_not_exists(
+                id=COSMOS_ANSWERS_CONTAINER,
+                partition_key=PartitionKey(path=_ANSWERS_PARTITION_KEY),
+                indexing_policy=_ANSWERS_INDEXING_POLICY,
+            )
+            await _ensure_composite_index(database, answers_container)
+
+            questionnaire_container = await database.create_container_if_not_exists(
+                id=COSMOS_QUESTIONNAIRE_CONTAINER,
+                partition_key=PartitionKey(path=_QUESTIONNAIRE_PARTITION_KEY),
+            )
+            record("cosmosContainers")
+        _answers_container = _resilient(answers_container, _ANSWERS_PARTITION_KEY)
+        _questionnaire_container = _resilient(questionnaire_container, _QUESTIONNAIRE_PARTITION_KEY)
+        logger.info("Cosmos containers ready: answers=%s questionnaire=%s", COSMOS_ANSWERS_CONTAINER, COSMOS_QUESTIONNAIRE_CONTAINER)
+        return True
+    except Exception:  # pragma: no cover - defensive logging
+        logger.exception("Cosmos initialization failed; falling back to in-memory store")
+        await close_cosmos()
+        return False
+
+
+async def _ensure_composite_index(database, container) -> None:
+    """Add the listing's composite index to an answers container created without it."""
+    properties = await container.read()
+    policy = properties.get("indexingPolicy") or {}
+    if _ANSWERS_COMPOSITE_INDEX in (policy.get("compositeIndexes") or []):
+        return
+    policy = {**policy, "compositeIndexes": [*(policy.get("compositeIndexes") or []), _ANSWERS_COMPOSITE_INDEX]}
+    logger.info("Adding the (_ts, id) composite index to container %s", COSMOS_ANSWERS_CONTAINER)
+    await database.replace_container(
+        container,
+        partition_key=PartitionKey(path=_ANSWERS_PARTITION_KEY),
+        indexing_policy=policy,
+    )
+
+
+async def close_cosmos() -> None:
+    """Close the async client and credential, if any."""
+
+    global _client, _credential, _answers_container, _questionnaire_container
+
+    client, credential = _client, _credential
+    _client = None
+    _credential = None
+    _answers_container = None
+    _questionnaire_container = None
+
+    if client is not None:
+        try:
+            await client.close()
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception("Failed to close Cosmos client")
+    if credential is not None:
+        try:
+            await credential.close()
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception("Failed to close managed identity credential")
+
+
+def _json_pointer_segment(value: str) -> str:
+    return value.replace("~", "~0").replace("/", "~1")
+
+
+def cosmos_available() -> bool:
+    return _answers_container is not None
+
+
+def questionnaire_available() -> bool:
+    return _questionnaire_container is not None
+
+
+def resilience_stats() -> Dict[str, object]:
+    """Breaker state, request-unit budget and retry counters for ``/check``."""
+    return _guard.stats()
+
+
+@observe_cosmos
+async def upsert_answers(user_id: str, questionnaire_id: str, answers: dict) -> Optional[Tuple[Dict, Optional[Dict]]]:
+    """Write an answers document and return it with the answers it replaced.
+
+    The current document is read and then replaced only if its ETag is unchanged,
+    so the returned previous answers (None for a new document) are exactly what
+    was overwritten even under concurrent saves.
+    """
+    if not cosmos_available():
+        logger.debug("Cosmos unavailable when upserting answers for user %s; returning None", user_id)
+        return None
+    document_id = f"{questionnaire_id}:{user_id}"
+    document = {
+        "id": document_id,
+        "userId": user_id,
+        "questionnaireId": questionnaire_id,
+        "answers": answers,
+    }
+    for _ in range(_MAX_CONDITIONAL_ATTEMPTS):
+        try:
+            current = await _answers_container.read_item(item=document_id, partition_key=user_id)
+        except exceptions.CosmosResourceNotFoundError:
+            try:
+                await _answers_container.create_item(document)
+            except exceptions.CosmosResourceExistsError:
+                continue  # Lost a race with another first save; re-read its document.
+            await _adjust_answer_counts(questionnaire_id, 1)
+            return document, None
+        try:
+            await _answers_container.replace_item(
+                item=document_id,
+                body=document,
+                etag=current["_etag"],
+                match_condition=MatchConditions.IfNotModified,
+            )
+        except exceptions.CosmosAccessConditionFailedError:
+            continue
+        return document, current.get("answers") or {}
+
+    # Writing unconditionally would return stale previous answers and skip the count
+    # of a newly created document, so counters and statistics would drift silently.
+    raise CosmosConflictError(f"Answers {document_id} kept changing underneath the save; retry later")
+
+
+@observe_cosmos
+async def patch_answers(user_id: str, questionnaire_id: str, answers: dict) -> Optional[Tuple[Dict, Optional[Dict]]]:
+    """Set individual ``answers`` entries with partial document updates.
+
+    Creates the document when it does not exist yet. Returns the merged document
+    together with the answers it had before (None when it was created), or None
+    if Cosmos is unavailable. The first partial update is conditional on the ETag
+    that was read, so the previous answers match what the patch replaced.
+    """
+    if not cosmos_available():
+        return None
+    document_id = f"{questionnaire_id}:{user_id}"
+    operations = [
+        {"op": "set", "path": f"/answers/{_json_pointer_segment(question_id)}", "value": detail}
+        for question_id, detail in answers.items()
+    ]
+
+    for _ in range(_MAX_CONDITIONAL_ATTEMPTS):
+        try:
+            current = await _answers_container.read_item(item=document_id, partition_key=user_id)
+        except exceptions.CosmosResourceNotFoundError:
+            document = {
+                "id": document_id,
+                "userId": user_id,
+                "questionnaireId": questionnaire_id,
+                "answers": answers,
+            }
+            try:
+                await _answers_container.create_item(document)
+            except exceptions.CosmosResourceExistsError:
+                continue  # Lost a race with another first save; patch onto its document.
+            await _adjust_answer_counts(questionnaire_id, 1)
+            return document, None
+        if not operations:
+            return _prune_system_fields(current), current.get("answers") or {}
+        previous = current.get("answers") or {}
+        try:
+            document = await _answers_container.patch_item(
+                item=document_id,
+                partition_key=user_id,
+                patch_operations=operations[:_MAX_PATCH_OPERATIONS],
+                etag=current["_etag"],
+                match_condition=MatchConditions.IfNotModified,
+            )
+        except exceptions.CosmosAccessConditionFailedError:
+            continue
+        except exceptions.CosmosResourceNotFoundError:
+            continue  # Deleted between the read and the patch.
+        # Each set is idempotent, so splitting at the per-request operation limit is safe.
+        for start in range(_MAX_PATCH_OPERATIONS, len(operations), _MAX_PATCH_OPERATIONS):
+            document = await _answers_container.patch_item(
+                item=document_id,
+                partition_key=user_id,
+                patch_operations=operations[start:start + _MAX_PATCH_OPERATIONS],
+            )
+        return _prune_system_fields(document), previous
+    raise CosmosConflictError(f"Answers {document_id} kept changing underneath the patch; retry later")
+
+
+@observe_cosmos
+async def upsert_answers_batch(user_id: str, entries: List[Tuple[str, dict]]) -> List[Optional[str]]:
+    """Upsert several answers documents of one user with transactional batches.
+
+    ``entries`` are (questionnaire_id, answers) pairs that must not repeat a
+    questionnaire. Each batch of up to ``_MAX_BATCH_OPERATIONS`` is atomic; the
+    result holds an error message per entry, or None when it was stored.
+    """
+    if not cosmos_available():
+        return ["Cosmos answers container not available"] * len(entries)
+
+    errors: List[Optional[str]] = []
+    created: Dict[str, int] = {}
+    for start in range(0, len(entries), _MAX_BATCH_OPERATIONS):
+        chunk = entries[start:start + _MAX_BATCH_OPERATIONS]
+        operations = [
+            ("upsert", ({
+                "id": f"{questionnaire_id}:{user_id}",
+                "userId": user_id,
+                "questionnaireId": questionnaire_id,
+                "answers": answers,
+            },))
+            for questionnaire_id, answers in chunk
+        ]
+        try:
+            results = await _answers_container.execute_item_batch(batch_operations=operations, partition_key=user_id)
+        except exceptions.CosmosBatchOperationError as exc:
+            message = f"Batch rejected: operation {exc.error_index} failed with status {exc.status_code}"
+            errors.extend([message] * len(chunk))
+            continue
+        except exceptions.CosmosHttpResponseError as exc:
+            errors.extend([f"Batch failed: {exc.message}"] * len(chunk))
+            continue
+        except CosmosUnavailableError as exc:
+            errors.extend([f"Batch failed: {exc}"] * len(chunk))
+            continue
+        for (questionnaire_id, _), result in zip(chunk, results):
+            if result.get("statusCode") == 201:
+                created[questionnaire_id] = created.get(questionnaire_id, 0) + 1
+        errors.extend([None] * len(chunk))
+
+    for questionnaire_id, delta in created.items():
+        await _adjust_answer_counts(questionnaire_id, delta)
+    return errors
+
+
+@observe_cosmos
+async def read_answers_many(user_id: str, questionnaire_ids: List[str]) -> Dict[str, Dict]:
+    """Return {questionnaire_id: answers} for the existing documents of one user.
+
+    A single-partition query, used to capture previous answers before a batch.
+    """
+    if not cosmos_available() or not questionnaire_ids:
+        return {}
+    query = (
+        "SELECT c.questionnaireId, c.answers FROM c "
+        "WHERE c.userId = @userId AND ARRAY_CONTAINS(@questionnaireIds, c.questionnaireId)"
+    )
+    parameters = [
+        {"name": "@userId", "value": user_id},
+        {"name": "@questionnaireIds", "value": list(questionnaire_ids)},
+    ]
+    return {
+        item["questionnaireId"]: item.get("answers") or {}
+        async for item in _answers_container.query_items(query=query, parameters=parameters, partition_key=user_id)
+    }
+
+
+@observe_cosmos
+async def read_answers(user_id: str, questionnaire_id: str):
+    if not cosmos_available():
+        return None
+    try:
+        document_id = f"{questionnaire_id}:{user_id}"
+        return await _answers_container.read_item(item=document_id, partition_key=user_id)
+    except exceptions.CosmosResourceNotFoundError:
+        return None
+
+
+@observe_cosmos
+async def list_answers(limit: int = 100, offset: int = 0) -> Tuple[Optional[List[Dict]], int]:
+    """List all answers with pagination support.
+
+    Returns a tuple of (items, total_count). If Cosmos is unavailable, returns (None, 0).
+    """
+    if not cosmos_available():
+        logger.debug("Cosmos answers container not available; cannot list answers")
+        return None, 0
+
+    counts = await read_answer_counts()
+    total_count = counts["total"]
+
+    query = f"SELECT * FROM c WHERE {_ANSWERS_FILTER} ORDER BY c._ts DESC OFFSET {offset} LIMIT {limit}"
+    items = [_prune_system_fields(item) async for item in _answers_container.query_items(query=query)]
+    return items, total_count
+
+
+@observe_cosmos
+async def _adjust_answer_counts(questionnaire_id: str, delta: int) -> None:
+    operations = [
+        {"op": "incr", "path": "/total", "value": delta},
+        {"op": "incr", "path": f"/byQuestionnaire/{_json_pointer_segment(questionnaire_id)}", "value": delta},
+    ]
+    try:
+        try:
+            await _answers_container.patch_item(
+                item=_COUNTS_DOCUMENT_ID,
+                partition_key=STATS_PARTITION,
+                patch_operations=operations,
+                idempotent=False,
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            # Start counting from this change; a scan does not belong on the write path.
+            # Answers stored before the document existed need /api/responses/counts/rebuild.
+            try:
+                await _answers_container.create_item({
+                    "id": _COUNTS_DOCUMENT_ID,
+                    "userId": STATS_PARTITION,
+                    "total": delta,
+                    "byQuestionnaire": {questionnaire_id: delta},
+                })
+                logger.info("Created the answer counter document; rebuild it if answers predate it")
+            except exceptions.CosmosResourceExistsError:
+                # Another writer created it first; apply the change on top.
+                await _answers_container.patch_item(
+                    item=_COUNTS_DOCUMENT_ID,
+                    partition_key=STATS_PARTITION,
+                    patch_operations=operations,
+                    idempotent=False,
+                )
+    except (exceptions.CosmosHttpResponseError, CosmosUnavailableError):
+        answer_counter_failures.inc("counts")
+        logger.warning(
+            "Failed to adjust answer counters for %s by %d; counts may drift until rebuilt",
+            questionnaire_id,
+            delta,
+            exc_info=True,
+        )
+
+
+@observe_cosmos
+async def rebuild_answer_counts() -> Optional[Dict[str, object]]:
+    """Recount answers exactly and overwrite the counter document.
+
+    Streams only the questionnaireId projection, so it is a single cross-partition
+    scan meant for recovery, not for the request path.
+    """
+    if not cosmos_available():
+        return None
+    by_questionnaire: Dict[str, int] = {}
+    total = 0
+    query = f"SELECT VALUE c.questionnaireId FROM c WHERE {_ANSWERS_FILTER}"
+    async for questionnaire_id in _answers_container.query_items(query=query):
+        by_questionnaire[questionnaire_id] = by_questionnaire.get(questionnaire_id, 0) + 1
+        total += 1
+    await _answers_container.upsert_item({
+        "id": _COUNTS_DOCUMENT_ID,
+        "userId": STATS_PARTITION,
+        "total": total,
+        "byQuestionnaire": by_questionnaire,
+    })
+    logger.info("Rebuilt answer counters: total=%d questionnaires=%d", total, len(by_questionnaire))
+    return {"total": total, "byQuestionnaire": by_questionnaire}
+
+
+@observe_cosmos
+async def read_answer_counts() -> Optional[Dict[str, object]]:
+    """Return {"total", "byQuestionnaire"} from the counter document (one point read).
+
+    Zeros until the first write creates the document; ``rebuild_answer_counts``
+    recounts answers that predate it.
+    """
+    if not cosmos_available():
+        return None
+    try:
+        document = await _answers_container.read_item(item=_COUNTS_DOCUMENT_ID, partition_key=STATS_PARTITION)
+    except exceptions.CosmosResourceNotFoundError:
+        return {"total": 0, "byQuestionnaire": {}}
+    by_questionnaire = {
+        questionnaire_id: count
+        for questionnaire_id, count in (document.get("byQuestionnaire") or {}).items()
+        if count > 0
+    }
+    return {"total": max(0, document.get("total", 0)), "byQuestionnaire": by_questionnaire}
+
+
+@observe_cosmos
+async def list_answers_page(
+    limit: int = 100,
+    before: Optional[Tuple[int, str]] = None,
+) -> Tuple[Optional[List[Dict]], Optional[Tuple[int, str]]]:
+    """Fetch one page of answers, newest first, below the ``(_ts, id)`` key ``before``.
+
+    Returns a tuple of (items, next key). The next key is the ``(_ts, id)`` of the
+    last item returned, or None on the last page. If Cosmos is unavailable,
+    returns (None, None).
+
+    Continuation tokens cannot resume a cross-partition ORDER BY query, so every
+    page is a fresh query bounded by the key; ``id`` breaks ties between
+    documents written in the same second (``_ANSWERS_INDEXING_POLICY``).
+    """
+    if not cosmos_available():
+        logger.debug("Cosmos answers container not available; cannot list answers")
+        return None, None
+
+    query = f"SELECT * FROM c WHERE {_ANSWERS_FILTER}"
+    parameters: List[Dict[str, object]] = []
+    if before is not None:
+        query += " AND (c._ts < @ts OR (c._ts = @ts AND c.id < @id))"
+        parameters = [{"name": "@ts", "value": before[0]}, {"name": "@id", "value": before[1]}]
+    query += " ORDER BY c._ts DESC, c.id DESC"
+    documents: List[Dict] = []
+    # One extra document tells whether another page follows.
+    async for document in _answers_container.query_items(
+        query=query,
+        parameters=parameters,
+        max_item_count=limit + 1,
+    ):
+        documents.append(document)
+        if len(documents) > limit:
+            break
+    page = documents[:limit]
+    next_key = (page[-1]["_ts"], page[-1]["id"]) if len(documents) > limit and page else None
+    return [_prune_system_fields(document) for document in page], next_key
+
+
+@observe_cosmos
+async def iter_answers(questionnaire_id: Optional[str] = None, page_size: int = 500) -> AsyncIterator[Dict]:
+    """Yield every answers document, fetching pages lazily.
+
+    Only one page of ``page_size`` documents is held in memory at a time.
+    """
+    if not cosmos_available():
+        return
+    query = f"SELECT * FROM c WHERE {_ANSWERS_FILTER}"
+    parameters: List[Dict[str, object]] = []
+    if questionnaire_id:
+        query += " AND c.questionnaireId = @questionnaireId"
+        parameters.append({"name": "@questionnaireId", "value": questionnaire_id})
+    async for item in _answers_container.query_items(
+        query=query,
+        parameters=parameters,
+        max_item_count=page_size,
+    ):
+        yield _prune_system_fields(item)
+
+
+@observe_cosmos
+async def delete_answers(user_id: str, questionnaire_id: str) -> Optional[Dict]:
+    """Delete an answers document and return it, or None if it did not exist."""
+    if not cosmos_available():
+        logger.debug("Cosmos answers container not available; cannot delete answers")
+        return None
+    document_id = f"{questionnaire_id}:{user_id}"
+    for _ in range(_MAX_CONDITIONAL_ATTEMPTS):
+        try:
+            current = await _answers_container.read_item(item=document_id, partition_key=user_id)
+            await _answers_container.delete_item(
+                item=document_id,
+                partition_key=user_id,
+                etag=current["_etag"],
+                match_condition=MatchConditions.IfNotModified,
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+        except exceptions.CosmosAccessConditionFailedError:
+            continue
+        await _adjust_answer_counts(questionnaire_id, -1)
+        return _prune_system_fields(current)
+    raise CosmosConflictError(f"Answers {document_id} kept changing underneath the delete; retry later")
+
+
+def _stats_shard(questionnaire_id: str, shard: int) -> Tuple[str, str]:
+    """(document id, partition key) of one statistics shard of a questionnaire."""
+    return f"{_STATS_DOCUMENT_PREFIX}{questionnaire_id}:{shard}", f"{STATS_PARTITION}:{questionnaire_id}:{shard}"
+
+
+def _stats_document(questionnaire_id: str, shard: int, counters: Dict[str, int]) -> Dict:
+    document_id, partition = _stats_shard(questionnaire_id, shard)
+    return {"id": document_id, "userId": partition, "questionnaireId": questionnaire_id, "counters": counters}
+
+
+async def _incr_stats_shard(document_id: str, partition: str, operations: List[Dict]) -> None:
+    """Apply ``incr`` operations to a shard; more than one patch's worth go as one batch."""
+    if len(operations) <= _MAX_PATCH_OPERATIONS:
+        await _answers_container.patch_item(
+            item=document_id,
+            partition_key=partition,
+            patch_operations=operations,
+            idempotent=False,
+        )
+        return
+    patches = [
+        ("patch", (document_id, operations[start:start + _MAX_PATCH_OPERATIONS]))
+        for start in range(0, len(operations), _MAX_PATCH_OPERATIONS)
+    ]
+    for start in range(0, len(patches), _MAX_BATCH_OPERATIONS):
+        try:
+            await _answers_container.execute_item_batch(
+                batch_operations=patches[start:start + _MAX_BATCH_OPERATIONS],
+                partition_key=partition,
+            )
+        except exceptions.CosmosBatchOperationError as exc:
+            if exc.status_code == 404:
+                raise exceptions.CosmosResourceNotFoundError(status_code=404, message=str(exc)) from exc
+            raise
+
+
+@observe_cosmos
+async def adjust_answer_stats(questionnaire_id: str, delta: Dict[str, int]) -> None:
+    """Add ``delta`` to one randomly chosen statistics shard of a questionnaire.
+
+    Shards sit in their own logical partitions, so concurrent saves spread over
+    ``COSMOS_STATS_SHARDS`` documents instead of queueing on one. Counters are
+    changed with ``incr`` partial updates, which the service applies atomically,
+    so concurrent saves never conflict; a delta of more than ten counters goes as
+    one transactional batch of patches. A missing shard is created holding the
+    delta. A delta that cannot be applied is logged and counted in
+    ``answer_counter_updates_failed_total``.
+    """
+    delta = {key: count for key, count in delta.items() if count}
+    if not delta:
+        return
+    shard = random.randrange(COSMOS_STATS_SHARDS)
+    document_id, partition = _stats_shard(questionnaire_id, shard)
+    operations = [
+        {"op": "incr", "path": f"/counters/{_json_pointer_segment(key)}", "value": count}
+        for key, count in delta.items()
+    ]
+    try:
+        try:
+            await _incr_stats_shard(document_id, partition, operations)
+        except exceptions.CosmosResourceNotFoundError:
+            try:
+                await _answers_container.create_item(_stats_document(questionnaire_id, shard, delta))
+            except exceptions.CosmosResourceExistsError:
+                # Another save created the shard first; apply the delta on top.
+                await _incr_stats_shard(document_id, partition, operations)
+    except (exceptions.CosmosHttpResponseError, exceptions.CosmosBatchOperationError, CosmosUnavailableError):
+        answer_counter_failures.inc("stats")
+        logger.warning(
+            "Failed to adjust answer statistics for %s; they may drift until rebuilt",
+            questionnaire_id,
+            exc_info=True,
+        )
+
+
+@observe_cosmos
+async def read_answer_stats(questionnaire_id: str) -> Optional[Dict[str, int]]:
+    """Return the summed statistics shards of a questionnaire, or None if none exist."""
+    if not cosmos_available():
+        return None
+
+    async def read_shard(shard: int) -> Optional[Dict]:
+        document_id, partition = _stats_shard(questionnaire_id, shard)
+        try:
+            return await _answers_container.read_item(item=document_id, partition_key=partition)
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
+    shards = await asyncio.gather(*(read_shard(shard) for shard in range(COSMOS_STATS_SHARDS)))
+    if all(document is None for document in shards):
+        return None
+    counters: Dict[str, int] = {}
+    for document in shards:
+        for key, count in ((document or {}).get("counters") or {}).items():
+            counters[key] = counters.get(key, 0) + count
+    return {key: count for key, count in counters.items() if count}
+
+
+@observe_cosmos
+async def write_answer_stats(questionnaire_id: str, counters: Dict[str, int]) -> None:
+    """Overwrite the statistics of a questionnaire: all in shard 0, the other shards emptied."""
+    await asyncio.gather(*(
+        _answers_container.upsert_item(_stats_document(questionnaire_id, shard, dict(counters) if shard == 0 else {}))
+        for shard in range(COSMOS_STATS_SHARDS)
+    ))
+
+
+@observe_cosmos
+async def upsert_questionnaire(doc: dict):
+    if not questionnaire_available():
+        logger.debug("Cosmos questionnaire container not available; cannot upsert questionnaire")
+        return None
+    await _questionnaire_container.upsert_item(doc)
+    return doc
+
+
+@observe_cosmos
+async def read_questionnaire(questionnaire_id: str):
+    if not questionnaire_available():
+        logger.debug("Cosmos questionnaire container not available; cannot read questionnaire")
+        return None
+    try:
+        document = await _questionnaire_container.read_item(item=questionnaire_id, partition_key=questionnaire_id)
+        return _prune_system_fields(document)
+    except exceptions.CosmosResourceNotFoundError:
+        return None
+
+
+@observe_cosmos
+async def list_questionnaires() -> Optional[List[Dict]]:
+    if not questionnaire_available():
+        logger.debug("Cosmos questionnaire container not available; cannot list questionnaires")
+        return None
+    query = "SELECT * FROM c"
+    return [_prune_system_fields(item) async for item in _questionnaire_container.query_items(query=query)]
+
+
+@observe_cosmos
+async def list_questionnaire_summaries() -> Optional[List[Dict]]:
+    """Project the catalog fields only, so question bodies are neither read nor shipped."""
+    if not questionnaire_available():
+        logger.debug("Cosmos questionnaire container not available; cannot list questionnaire summaries")
+        return None
+    query = (
+        "SELECT c.id, c.title, c.description, c.type, c.questionnaireType, "
+        "ARRAY_LENGTH(c.questions) AS questionCount, c.contentHash, c._etag FROM c"
+    )
+    return [item async for item in _questionnaire_container.query_items(query=query)]
+
+
+@observe_cosmos
+async def delete_questionnaire(questionnaire_id: str) -> bool:
+    if not questionnaire_available():
+        logger.debug("Cosmos questionnaire container not available; cannot delete questionnaire %s", questionnaire_id)
+        return False
+    try:
+        await _questionnaire_container.delete_item(item=questionnaire_id, partition_key=questionnaire_id)
+        return True
+    except exceptions.CosmosResourceNotFoundError:
+        return False
@@ -0,0 +1,533 @@
+"""Client-side request-unit budgeting, retries and circuit breaking for Cosmos calls.
+
+:class:`ResilientContainer` wraps an ``azure.cosmos.aio`` container proxy and
+sends every request through one shared :class:`CosmosGuard`:
+
+* a :class:`TokenBucket` sized to the provisioned throughput
+  (``COSMOS_RU_PER_SECOND``, 0 disables) spaces requests out before the service
+  has to throttle them. Each request takes an estimated charge up front, which
+  is corrected with the ``x-ms-request-charge`` the service reports;
+* 429s and transient failures are retried with jittered exponential backoff
+  that never waits less than the ``x-ms-retry-after-ms`` the service asked for,
+  within a bounded number of attempts and total wait. Non-idempotent writes
+  (creates, ``incr`` patches, batches) are only retried when the service cannot
+  have applied them: throttling and failures before the request was sent;
+* a :class:`CircuitBreaker` opens after consecutive failures and then rejects
+  calls at once with :class:`CosmosUnavailableError` until a cool-down has
+  passed and a single trial call succeeds. While it is open, point reads are
+  answered from the last successful read of the same item.
+
+The SDK's own throttle retries are switched off by ``cosmos_aio`` so waits only
+happen here.
+"""
+import asyncio
+import copy
+import logging
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+from azure.cosmos import exceptions
+
+try:
+    from backend.metrics import record_request_charge
+except ImportError:  # Allow fallback execution without package context
+    import sys
+    from pathlib import Path
+
+    sys.path.append(str(Path(__file__).resolve().parent))
+    from metrics import record_request_charge
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+COSMOS_RU_PER_SECOND = float(os.getenv("COSMOS_RU_PER_SECOND", "0"))
+COSMOS_RU_MAX_WAIT_SECONDS = float(os.getenv("COSMOS_RU_MAX_WAIT_SECONDS", "5"))
+COSMOS_MAX_RETRIES = int(os.getenv("COSMOS_MAX_RETRIES", "4"))
+COSMOS_RETRY_MAX_WAIT_SECONDS = float(os.getenv("COSMOS_RETRY_MAX_WAIT_SECONDS", "5"))
+COSMOS_BREAKER_FAILURES = int(os.getenv("COSMOS_BREAKER_FAILURES", "5"))
+COSMOS_BREAKER_COOLDOWN_SECONDS = float(os.getenv("COSMOS_BREAKER_COOLDOWN_SECONDS", "10"))
+COSMOS_STALE_READ_ENTRIES = int(os.getenv("COSMOS_STALE_READ_ENTRIES", "1024"))
+
+# Statuses worth retrying: throttled, request timeout, "retry with", service unavailable.
+_TRANSIENT_STATUSES = {408, 429, 449, 503}
+# The subset that guarantees the write was not applied, safe to retry for any operation.
+_NOT_APPLIED_STATUSES = {429, 449}
+# Up-front request-unit estimates; the reported charge replaces them afterwards.
+_READ_CHARGE = 1.0
+_WRITE_CHARGE = 10.0
+_QUERY_PAGE_CHARGE = 5.0
+_BASE_BACKOFF_SECONDS = 0.05
+_MAX_BACKOFF_SECONDS = 2.0
+
+
+class CosmosUnavailableError(RuntimeError):
+    """Raised when Cosmos is throttling or failing and the call was given up or rejected."""
+
+    def __init__(self, message: str, retry_after_seconds: float = 1.0):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+class CosmosConflictError(RuntimeError):
+    """Raised when a conditional write kept losing to concurrent writes of the same item."""
+
+
+def _retry_after_seconds(exc: exceptions.CosmosHttpResponseError) -> Optional[float]:
+    headers = getattr(exc, "headers", None) or {}
+    value = headers.get("x-ms-retry-after-ms")
+    try:
+        return float(value) / 1000 if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_transient(exc: BaseException, idempotent: bool = True) -> bool:
+    if not idempotent:
+        # After a timeout, 408 or 503 the write may already have been applied.
+        if isinstance(exc, ServiceRequestError):
+            return True
+        return isinstance(exc, exceptions.CosmosHttpResponseError) and exc.status_code in _NOT_APPLIED_STATUSES
+    if isinstance(exc, (exceptions.CosmosClientTimeoutError, ServiceRequestError, ServiceResponseError, asyncio.TimeoutError)):
+        return True
+    return isinstance(exc, exceptions.CosmosHttpResponseError) and exc.status_code in _TRANSIENT_STATUSES
+
+
+def _request_charge(headers: Optional[Dict[str, str]]) -> Optional[float]:
+    try:
+        return float((headers or {}).get("x-ms-request-charge"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Request-unit bucket refilled at ``rate`` per second, holding at most ``capacity``.
+
+    Takers reserve their cost immediately and sleep off any deficit, so waiting
+    callers are served in arrival order without a lock. A rate of zero disables it.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = max(0.0, rate)
+        self.capacity = capacity if capacity is not None else self.rate
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, cost: float, max_wait_seconds: float) -> float:
+        """Take ``cost`` and return the seconds to wait, or raise if that exceeds ``max_wait_seconds``."""
+        if not self.enabled:
+            return 0.0
+        self._refill()
+        wait = max(0.0, (cost - self._tokens) / self.rate)
+        if wait > max_wait_seconds:
+            raise CosmosUnavailableError("Request-unit budget exhausted", retry_after_seconds=wait)
+        self._tokens -= cost
+        return wait
+
+    def adjust(self, delta: float) -> None:
+        """Charge (or refund, when negative) the difference between estimate and actual cost."""
+        if self.enabled and delta:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+    def available(self) -> float:
+        if not self.enabled:
+            return 0.0
+        self._refill()
+        return self._tokens
+
+
+class CircuitBreaker:
+    """Closed, open after ``failure_threshold`` consecutive failures, half-open after ``cooldown_seconds``."""
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def retry_after(self) -> float:
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown_seconds - (self._clock() - self._opened_at))
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed" or self.failure_threshold <= 0:
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release(self) -> None:
+        """Give up a half-open trial slot without a verdict (the call never reached Cosmos)."""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("Cosmos circuit breaker closed after a successful trial call")
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        reopen = self._trial_in_flight
+        self._trial_in_flight = False
+        if self.failure_threshold > 0 and (reopen or self._failures >= self.failure_threshold):
+            if self._opened_at is None or reopen:
+                logger.warning("Cosmos circuit breaker opened after %d consecutive failures", self._failures)
+                self.opened += 1
+            self._opened_at = self._clock()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "consecutiveFailures": self._failures,
+            "retryAfterSeconds": round(self.retry_after(), 3),
+            "timesOpened": self.opened,
+        }
+
+
+class CosmosGuard:
+    """Budget, retry and breaker policy shared by every container of one client."""
+
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        breaker: CircuitBreaker,
+        max_retries: int = COSMOS_MAX_RETRIES,
+        max_retry_wait_seconds: float = COSMOS_RETRY_MAX_WAIT_SECONDS,
+        max_budget_wait_seconds: float = COSMOS_RU_MAX_WAIT_SECONDS,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_retries = max(0, max_retries)
+        self.max_retry_wait_seconds = max_retry_wait_seconds
+        self.max_budget_wait_seconds = max_budget_wait_seconds
+        self._sleep = sleep
+        self.retries = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.stale_reads = 0
+        self.request_charge = 0.0
+
+    @classmethod
+    def from_env(cls) -> "CosmosGuard":
+        return cls(
+            TokenBucket(COSMOS_RU_PER_SECOND),
+            CircuitBreaker(COSMOS_BREAKER_FAILURES, COSMOS_BREAKER_COOLDOWN_SECONDS),
+        )
+
+    def _backoff(self, exc: BaseException, attempt: int) -> float:
+        # Full jitter spreads retries from many callers; the service's hint is a floor.
+        delay = random.uniform(0, min(_MAX_BACKOFF_SECONDS, _BASE_BACKOFF_SECONDS * 2 ** attempt))
+        hinted = _retry_after_seconds(exc) if isinstance(exc, exceptions.CosmosHttpResponseError) else None
+        return max(delay, hinted * random.uniform(1.0, 1.2)) if hinted is not None else delay
+
+    def charged(self, estimate: float, actual: Optional[float]) -> None:
+        if actual is not None:
+            self.request_charge += actual
+            self.bucket.adjust(actual - estimate)
+            record_request_charge(actual)
+
+    async def call(self, operation: Callable[[], Awaitable[T]], estimate: float, idempotent: bool = True) -> T:
+        """Run ``operation`` under the budget, retry and breaker policy.
+
+        Raises :class:`CosmosUnavailableError` when the breaker is open, the budget
+        wait would be too long, or transient failures outlast the retries. Other
+        errors (404, 409, 412, ...) are answers rather than outages and pass through.
+        With ``idempotent=False`` only failures that leave the write unapplied are
+        retried; the rest are raised as :class:`CosmosUnavailableError` at once.
+        """
+        trial = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CosmosUnavailableError("Cosmos circuit breaker is open", self.breaker.retry_after() or 1.0)
+        try:
+            return await self._attempts(operation, estimate, idempotent)
+        finally:
+            # A cancelled trial records no verdict; free the slot so the next call can try.
+            # After a verdict the slot is already free and this is a no-op.
+            if trial:
+                self.breaker.release()
+
+    async def _attempts(self, operation: Callable[[], Awaitable[T]], estimate: float, idempotent: bool) -> T:
+        waited = 0.0
+        attempt = 0
+        while True:
+            try:
+                wait = self.bucket.reserve(estimate, self.max_budget_wait_seconds)
+            except CosmosUnavailableError:
+                # No verdict on the service; a trial slot this call holds is freed by call().
+                self.rejected += 1
+                raise
+            if wait:
+                await self._sleep(wait)
+            try:
+                result = await operation()
+            except StopAsyncIteration:
+                self.breaker.record_success()
+                raise
+            except Exception as exc:
+                if not _is_transient(exc):
+                    self.breaker.record_success()
+                    raise
+                if not _is_transient(exc, idempotent):
+                    self.breaker.record_failure()
+                    raise CosmosUnavailableError(
+                        f"Cosmos write outcome unknown, not retried: {exc}", retry_after_seconds=1.0,
+                    ) from exc
+                if isinstance(exc, exceptions.CosmosHttpResponseError) and exc.status_code == 429:
+                    self.throttled += 1
+                delay = self._backoff(exc, attempt)
+                if attempt >= self.max_retries or waited + delay > self.max_retry_wait_seconds:
+                    self.breaker.record_failure()
+                    raise CosmosUnavailableError(
+                        f"Cosmos request failed after {attempt + 1} attempt(s): {exc}",
+                        retry_after_seconds=max(delay, 1.0),
+                    ) from exc
+                attempt += 1
+                self.retries += 1
+                waited += delay
+                await self._sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "breaker": self.breaker.stats(),
+            "ruPerSecond": self.bucket.rate,
+            "ruAvailable": round(self.bucket.available(), 1),
+            "requestCharge": round(self.request_charge, 2),
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "staleReads": self.stale_reads,
+        }
+
+
+class _Page:
+    """One fetched query page, iterable like the SDK's page objects."""
+
+    def __init__(self, items: list):
+        self._items = items
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for item in self._items:
+            yield item
+
+
+class _GuardedPages:
+    """Page iterator that fetches through the guard and resumes from the last continuation token."""
+
+    def __init__(self, container: "ResilientContainer", start_query: Callable[[], Any], continuation_token: Optional[str]):
+        self._container = container
+        self._start_query = start_query
+        self._pages = None
+        self.continuation_token = continuation_token
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> _Page:
+        async def fetch() -> list:
+            if self._pages is None:
+                self._pages = self._start_query().by_page(self.continuation_token)
+            try:
+                page = await self._pages.__anext__()
+                return [item async for item in page]
+            except StopAsyncIteration:
+                raise
+            except Exception:
+                # Start over from the last token that was handed out on the next attempt.
+                self._pages = None
+                raise
+
+        items = await self._container._guarded(fetch, _QUERY_PAGE_CHARGE, from_connection=True)
+        self.continuation_token = self._pages.continuation_token
+        return _Page(items)
+
+
+class _GuardedQuery:
+    def __init__(self, container: "ResilientContainer", start_query: Callable[[], Any]):
+        self._container = container
+        self._start_query = start_query
+
+    def by_page(self, continuation_token: Optional[str] = None) -> _GuardedPages:
+        return _GuardedPages(self._container, self._start_query, continuation_token)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        # Fetch page by page so a retry only repeats the page that failed.
+        async for page in self.by_page():
+            async for item in page:
+                yield item
+
+
+class ResilientContainer:
+    """Drop-in wrapper for the container methods ``cosmos_aio`` uses."""
+
+    def __init__(
+        self,
+        container: Any,
+        guard: CosmosGuard,
+        partition_field: str,
+        stale_entries: int = COSMOS_STALE_READ_ENTRIES,
+    ):
+        self._container = container
+        self._guard = guard
+        self._partition_field = partition_field
+        self._stale_entries = stale_entries
+        self._last_reads: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+
+    async def _guarded(
+        self,
+        operation: Callable[..., Awaitable[T]],
+        estimate: float,
+        from_connection: bool = False,
+        idempotent: bool = True,
+    ) -> T:
+        charge: Dict[str, Optional[float]] = {"value": None}
+
+        async def attempt() -> T:
+            if from_connection:
+                result = await operation()
+                # Query pages do not take a per-page hook; read the headers of the fetch instead.
+                connection = getattr(self._container, "client_connection", None)
+                charge["value"] = _request_charge(getattr(connection, "last_response_headers", None))
+                return result
+
+            def hook(headers, _body) -> None:
+                charge["value"] = _request_charge(headers)
+
+            return await operation(response_hook=hook)
+
+        try:
+            return await self._guard.call(attempt, estimate, idempotent)
+        finally:
+            self._guard.charged(estimate, charge["value"])
+
+    def _remember(self, item: str, partition_key: Any, document: Optional[dict]) -> None:
+        if self._stale_entries <= 0:
+            return
+        key = (str(item), str(partition_key))
+        if document is None:
+            self._last_reads.pop(key, None)
+            return
+        self._last_reads[key] = document
+        self._last_reads.move_to_end(key)
+        while len(self._last_reads) > self._stale_entries:
+            self._last_reads.popitem(last=False)
+
+    async def read_item(self, item: str, partition_key: Any, **kwargs) -> dict:
+        try:
+            document = await self._guarded(
+                lambda **extra: self._container.read_item(item=item, partition_key=partition_key, **kwargs, **extra),
+                _READ_CHARGE,
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            self._remember(item, partition_key, None)
+            raise
+        except CosmosUnavailableError:
+            stale = self._last_reads.get((str(item), str(partition_key)))
+            if stale is None:
+                raise
+            self._guard.stale_reads += 1
+            return copy.deepcopy(stale)
+        self._remember(item, partition_key, copy.deepcopy(document))
+        return document
+
+    async def _write(self, method: str, key: Tuple[Optional[str], Any], idempotent: bool = True, **kwargs) -> Any:
+        result = await self._guarded(
+            lambda **extra: getattr(self._container, method)(**kwargs, **extra),
+            _WRITE_CHARGE,
+            idempotent=idempotent,
+        )
+        item, partition_key = key
+        if item is not None:
+            # Writes return the new document (None for deletes); keep the stale copy current.
+            self._remember(item, partition_key, copy.deepcopy(result) if isinstance(result, dict) else None)
+        return result
+
+    async def create_item(self, body: dict, **kwargs) -> dict:
+        # A retried create that had been applied would fail with 409 and hide the success.
+        return await self._write("create_item", self._key_of(body), idempotent=False, body=body, **kwargs)
+
+    async def upsert_item(self, body: dict, **kwargs) -> dict:
+        return await self._write("upsert_item", self._key_of(body), body=body, **kwargs)
+
+    async def replace_item(self, item: str, body: dict, idempotent: bool = True, **kwargs) -> dict:
+        return await self._write(
+            "replace_item", (item, body.get(self._partition_field)), idempotent=idempotent,
+            item=item, body=body, **kwargs,
+        )
+
+    async def patch_item(
+        self, item: str, partition_key: Any, patch_operations: list, idempotent: bool = True, **kwargs,
+    ) -> dict:
+        """Pass ``idempotent=False`` for operations such as ``incr`` that must not be applied twice."""
+        return await self._write(
+            "patch_item", (item, partition_key), idempotent=idempotent,
+            item=item, partition_key=partition_key, patch_operations=patch_operations, **kwargs,
+        )
+
+    async def delete_item(self, item: str, partition_key: Any, **kwargs) -> None:
+        await self._write("delete_item", (item, partition_key), item=item, partition_key=partition_key, **kwargs)
+        self._remember(item, partition_key, None)
+
+    async def execute_item_batch(self, batch_operations: list, partition_key: Any, **kwargs) -> list:
+        for _, args, *_ in batch_operations:
+            if args and isinstance(args[0], dict) and "id" in args[0]:
+                self._remember(args[0]["id"], partition_key, None)
+            elif args and isinstance(args[0], str):
+                # Replace, patch and delete operations name the item by id.
+                self._remember(args[0], partition_key, None)
+        return await self._guarded(
+            lambda **extra: self._container.execute_item_batch(
+                batch_operations=batch_operations, partition_key=partition_key, **kwargs, **extra
+            ),
+            _WRITE_CHARGE * max(1, len(batch_operations)),
+            # Callers count the 201s of the first attempt; a replay would report 200s.
+            idempotent=False,
+        )
+
+    def query_items(self, *args, **kwargs) -> _GuardedQuery:
+        return _GuardedQuery(self, lambda: self._container.query_items(*args, **kwargs))
+
+    def _key_of(self, body: dict) -> Tuple[Optional[str], Any]:
+        return body.get("id"), body.get(self._partition_field)
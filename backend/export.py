@@ -0,0 +1,56 @@
+"""Serializers for streaming response exports.
+
+Both formats consume an async iterator of StoredAnswers and yield encoded
+chunks one record at a time, so memory use does not depend on export size.
+"""
+import csv
+import io
+from pathlib import Path
+from typing import AsyncIterator, List
+
+try:
+    from backend.models import StoredAnswers
+except ImportError:  # Allow fallback execution without package context
+    import sys
+
+    sys.path.append(str(Path(__file__).resolve().parent))
+    from models import StoredAnswers
+
+
+CSV_COLUMNS = ["questionnaireId", "userId", "questionId", "value", "correct", "rightAnswer", "revealed"]
+
+
+async def to_ndjson(items: AsyncIterator[StoredAnswers]) -> AsyncIterator[bytes]:
+    async for stored in items:
+        yield stored.model_dump_json(exclude_none=True).encode("utf-8") + b"\n"
+
+
+def _csv_row(buffer: io.StringIO, writer, row: List[object]) -> bytes:
+    buffer.seek(0)
+    buffer.truncate()
+    writer.writerow(row)
+    return buffer.getvalue().encode("utf-8")
+
+
+async def to_csv(items: AsyncIterator[StoredAnswers]) -> AsyncIterator[bytes]:
+    """One row per answered question; responses without answers get a single blank row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    yield _csv_row(buffer, writer, CSV_COLUMNS)
+    async for stored in items:
+        if not stored.answers:
+            yield _csv_row(buffer, writer, [stored.questionnaireId, stored.userId, "", "", "", "", ""])
+            continue
+        for question_id, detail in stored.answers.items():
+            right_answer = detail.rightAnswer
+            if isinstance(right_answer, list):
+                right_answer = "|".join(right_answer)
+            yield _csv_row(buffer, writer, [
+                stored.questionnaireId,
+                stored.userId,
+                question_id,
+                detail.value if detail.value is not None else "",
+                detail.correct or "",
+                right_answer if right_answer is not None else "",
+                "" if detail.revealed is None else str(detail.revealed).lower(),
+            ])
@@ -0,0 +1,150 @@
+"""Opt-in fast response path: orjson rendering and size-thresholded compression.
+
+``FAST_RESPONSES=1`` makes the hot read endpoints hand their already-built
+models straight to :class:`FastJSONResponse`, skipping FastAPI's re-validation
+against ``response_model`` and the stdlib ``json`` encoder. Output is the same
+JSON FastAPI would produce (aliases applied, None kept).
+
+``RESPONSE_COMPRESSION_MIN_BYTES`` > 0 enables :class:`CompressionMiddleware`,
+which brotli- or gzip-compresses complete (non-streaming) responses at or above
+that size. Both ``orjson`` and ``brotli`` are optional; without them the code
+falls back to the stdlib encoder and gzip.
+"""
+import gzip
+import json
+import os
+from typing import Any, List, Optional
+
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+FAST_RESPONSES_ENABLED = os.getenv("FAST_RESPONSES", "0").lower() in {"1", "true", "yes"}
+COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "0"))
+
+
+def _default(value: Any):
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response that serializes pydantic models directly, without re-validation."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_responses_enabled() -> bool:
+    return FAST_RESPONSES_ENABLED
+
+
+def _quality(parameters: List[str]) -> float:
+    for parameter in parameters:
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value.strip())
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = set()
+    for token in accept_encoding.split(","):
+        coding, *parameters = token.split(";")
+        # q=0 (or 0.0, 0.000) refuses the coding; an unreadable q-value is not an acceptance.
+        if coding.strip() and _quality(parameters) > 0:
+            accepted.add(coding.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """Compress complete responses of at least ``minimum_size`` bytes.
+
+    Streaming responses (SSE, exports) and already-encoded bodies pass through
+    untouched so they keep flushing incrementally.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                if "content-encoding" in Headers(raw=message["headers"]):
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if encoding == "br":
+                compressed = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                compressed = gzip.compress(body, compresslevel=self.gzip_level)
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The encoded bytes differ from the identity representation.
+                headers["ETag"] = f"W/{etag}"
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,216 @@
+"""Disk-backed, content-addressed cache for generated questionnaires.
+
+Entries are keyed by a hash of everything that determines a generation: the
+prompt template, model, reasoning effort, topic name and text, and the decoded
+bytes of every attached image. Values are the parsed JSON results, stored in a
+local SQLite database so they survive restarts and are shared by workers on the
+same host. Entries older than ``max_age_seconds`` are dropped, and the least
+recently used ones are evicted once the stored values exceed ``max_bytes``.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS generations_accessed_at ON generations (accessed_at);
+"""
+
+
+def _image_bytes(image: dict) -> bytes:
+    data_url = image.get("dataUrl")
+    if not isinstance(data_url, str):
+        return b""
+    _, _, payload = data_url.partition(",")
+    try:
+        return base64.b64decode(payload, validate=False)
+    except (binascii.Error, ValueError):
+        return data_url.encode("utf-8")
+
+
+def generation_key(
+    prompt_template: str,
+    model: str,
+    reasoning_effort: str,
+    topic_name: str,
+    topic_text: str,
+    images: Optional[Iterable[dict]] = None,
+) -> str:
+    """Hash the inputs of one generation; each part is length-prefixed so boundaries are unambiguous."""
+    digest = hashlib.sha256()
+    parts = [prompt_template, model, reasoning_effort, topic_name, topic_text]
+    for part in parts:
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    for image in images or []:
+        data = _image_bytes(image)
+        digest.update(b"image")
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+
+class GenerationCache:
+    """SQLite-backed cache of generation results with age and size limits.
+
+    A ``max_bytes`` or ``max_age_seconds`` of zero, or an empty ``path``,
+    disables caching so it can be switched off through configuration.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_age_seconds: float = 7 * 24 * 3600,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._path = path
+        self._max_bytes = max(0, max_bytes)
+        self._max_age_seconds = max(0.0, max_age_seconds)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._failed = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._path) and self._max_bytes > 0 and self._max_age_seconds > 0 and not self._failed
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._connection is None and self.enabled:
+            try:
+                Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+                connection = sqlite3.connect(self._path, check_same_thread=False, timeout=5.0)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                connection.executescript(_SCHEMA)
+                self._connection = connection
+                logger.info("Generation cache opened at %s", self._path)
+            except sqlite3.Error:
+                # A broken cache must never break generation; run uncached instead.
+                logger.warning("Generation cache unavailable at %s; continuing without it", self._path, exc_info=True)
+                self._failed = True
+        return self._connection
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        now = self._clock()
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return None
+            try:
+                row = connection.execute(
+                    "SELECT value, created_at FROM generations WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or row[1] < now - self._max_age_seconds:
+                    if row is not None:
+                        connection.execute("DELETE FROM generations WHERE key = ?", (key,))
+                        connection.commit()
+                        self.evictions += 1
+                    self.misses += 1
+                    return None
+                connection.execute("UPDATE generations SET accessed_at = ? WHERE key = ?", (now, key))
+                connection.commit()
+            except sqlite3.Error:
+                logger.warning("Generation cache read failed", exc_info=True)
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict) -> None:
+        if not self.enabled:
+            return
+        encoded = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        size = len(encoded.encode("utf-8"))
+        if size > self._max_bytes:
+            return
+        now = self._clock()
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO generations (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, encoded, size, now, now),
+                )
+                self._evict(connection, now)
+                connection.commit()
+            except sqlite3.Error:
+                logger.warning("Generation cache write failed", exc_info=True)
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> None:
+        expired = connection.execute(
+            "DELETE FROM generations WHERE created_at < ?", (now - self._max_age_seconds,)
+        ).rowcount
+        self.evictions += max(0, expired)
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM generations").fetchone()[0]
+        if total <= self._max_bytes:
+            return
+        victims = []
+        for key, size in connection.execute("SELECT key, size FROM generations ORDER BY accessed_at"):
+            if total <= self._max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM generations WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def clear(self) -> None:
+        with self._lock:
+            connection = self._connect()
+            if connection is not None:
+                connection.execute("DELETE FROM generations")
+                connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self) -> Dict[str, object]:
+        entries, size = 0, 0
+        with self._lock:
+            connection = self._connect()
+            if connection is not None:
+                try:
+                    entries, size = connection.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generations"
+                    ).fetchone()
+                except sqlite3.Error:
+                    pass
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "bytes": size,
+            "maxBytes": self._max_bytes,
+            "maxAgeSeconds": self._max_age_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,196 @@
+"""Preprocessing of images attached to topic uploads.
+
+Each data URL is size-checked from its base64 length before decoding, decoded
+once, de-duplicated by the SHA-256 of its bytes, and, when Pillow is installed,
+downsized to ``UPLOAD_IMAGE_MAX_DIMENSION`` and recompressed as JPEG. The
+processed list replaces the request's images, so the flashcard and test calls
+share one copy. :class:`UploadSizeLimitMiddleware` rejects oversized upload
+bodies before they are buffered.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+    ImageOps = None
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MAX_DIMENSION = int(os.getenv("UPLOAD_IMAGE_MAX_DIMENSION", "1568"))
+IMAGE_JPEG_QUALITY = int(os.getenv("UPLOAD_IMAGE_JPEG_QUALITY", "82"))
+IMAGE_MAX_BYTES = int(os.getenv("UPLOAD_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_MAX_COUNT = int(os.getenv("UPLOAD_IMAGE_MAX_COUNT", "10"))
+UPLOAD_MAX_BODY_BYTES = int(os.getenv("UPLOAD_MAX_BODY_BYTES", str(40 * 1024 * 1024)))
+
+# Refuse decompression bombs: a small file that expands to a huge bitmap.
+_MAX_PIXELS = 40_000_000
+
+
+class ImageRejectedError(ValueError):
+    """Raised when an uploaded image is not a decodable base64 data URL."""
+
+
+class ImageTooLargeError(ImageRejectedError):
+    """Raised when uploaded images exceed the configured count, byte or pixel limits."""
+
+
+def _split_data_url(data_url: str) -> Tuple[str, str]:
+    header, separator, payload = data_url.partition(",")
+    if not separator or not header.startswith("data:") or not header.endswith(";base64"):
+        raise ImageRejectedError("Images must be base64 data URLs")
+    return header[len("data:"):-len(";base64")], payload
+
+
+def _decoded_size(payload: str) -> int:
+    stripped = payload.rstrip("=")
+    return len(stripped) * 3 // 4
+
+
+def _recompress(data: bytes) -> Tuple[bytes, str, bool]:
+    """Downsize to the target resolution and re-encode; returns (bytes, mime type, resized)."""
+    with Image.open(io.BytesIO(data)) as image:
+        if image.width * image.height > _MAX_PIXELS:
+            raise ImageTooLargeError(f"Image of {image.width}x{image.height} pixels is too large")
+        image = ImageOps.exif_transpose(image)
+        original_size = image.size
+        image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+        if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+            # JPEG has no alpha and convert("RGB") turns transparent pixels black (a dark
+            # diagram on a transparent PNG would come out solid black); flatten on white.
+            image = image.convert("RGBA")
+            image = Image.alpha_composite(Image.new("RGBA", image.size, (255, 255, 255, 255)), image)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+        return output.getvalue(), "image/jpeg", image.size != original_size
+
+
+def preprocess_images(images: List[dict]) -> Tuple[List[dict], Dict[str, object]]:
+    """Validate, de-duplicate and shrink uploaded images.
+
+    ``images`` are ``{"filename", "dataUrl"}`` dicts; the result has the same
+    shape plus a stats dict. Raises :class:`ImageTooLargeError` when a limit is
+    exceeded and :class:`ImageRejectedError` for undecodable input.
+    """
+    started = time.perf_counter()
+    if len(images) > IMAGE_MAX_COUNT:
+        raise ImageTooLargeError(f"At most {IMAGE_MAX_COUNT} images can be uploaded at once")
+
+    processed: List[dict] = []
+    seen = set()
+    original_bytes = 0
+    processed_bytes = 0
+    duplicates = 0
+    for image in images:
+        mime_type, payload = _split_data_url(image.get("dataUrl") or "")
+        if _decoded_size(payload) > IMAGE_MAX_BYTES:
+            raise ImageTooLargeError(f"Image '{image.get('filename') or 'unnamed'}' exceeds {IMAGE_MAX_BYTES} bytes")
+        try:
+            data = base64.b64decode(payload, validate=False)
+        except (binascii.Error, ValueError) as exc:
+            raise ImageRejectedError(f"Image '{image.get('filename') or 'unnamed'}' is not valid base64") from exc
+        original_bytes += len(data)
+
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in seen:
+            duplicates += 1
+            continue
+        seen.add(digest)
+
+        if Image is not None:
+            try:
+                recompressed, new_mime_type, resized = _recompress(data)
+            except ImageRejectedError:
+                raise
+            except Exception as exc:
+                raise ImageRejectedError(f"Image '{image.get('filename') or 'unnamed'}' could not be decoded") from exc
+            # Image tokens scale with resolution, so a resized copy always wins; at the
+            # original resolution keep whichever encoding is smaller.
+            if resized or len(recompressed) < len(data):
+                data, mime_type = recompressed, new_mime_type
+        processed_bytes += len(data)
+        processed.append({
+            "filename": image.get("filename"),
+            "dataUrl": f"data:{mime_type};base64,{base64.b64encode(data).decode('ascii')}",
+        })
+
+    stats = {
+        "images": len(processed),
+        "duplicatesDropped": duplicates,
+        "originalBytes": original_bytes,
+        "processedBytes": processed_bytes,
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    if images:
+        logger.info("Preprocessed upload images: %s", stats)
+    return processed, stats
+
+
+class UploadSizeLimitMiddleware:
+    """Reject request bodies above ``max_bytes`` on ``path_prefix`` with 413.
+
+    A declared Content-Length is checked before anything is read; chunked bodies
+    are counted as they arrive and cut off as soon as they pass the limit.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, path_prefix: str = "/api/upload"):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.max_bytes <= 0 or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        declared: Optional[str] = Headers(scope=scope).get("content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Answer now and tell the app the client went away; whatever it
+                    # sends afterwards is dropped.
+                    rejected = True
+                    await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            if not rejected:
+                await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+    async def _reject(self, send: Send) -> None:
+        body = json.dumps({"detail": f"Upload body exceeds {self.max_bytes} bytes"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("ascii"))],
+        })
+        await send({"type": "http.response.body", "body": body})
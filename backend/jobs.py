@@ -0,0 +1,162 @@
+"""Background jobs for long-running topic uploads.
+
+Job state lives behind :class:`JobStore` so a shared store can replace
+:class:`InMemoryJobStore` when running more than one worker:
+``sqlite_backend.SqliteJobStore`` does for workers on one host
+(``STORAGE_BACKEND=sqlite``).
+:class:`JobRunner` owns a bounded queue drained by a fixed number of worker
+tasks, so at most ``concurrency`` generations run at once per process.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+try:
+    from backend.models import TopicUploadRequest, UploadJobStatus
+except ImportError:  # Allow fallback execution without package context
+    import sys
+
+    sys.path.append(str(Path(__file__).resolve().parent))
+    from models import TopicUploadRequest, UploadJobStatus
+
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"succeeded", "failed"}
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the job queue cannot accept more work."""
+
+
+class JobStore(ABC):
+    """Minimal persistence interface for upload job state."""
+
+    @abstractmethod
+    async def create(self, job: UploadJobStatus) -> UploadJobStatus:
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[UploadJobStatus]:
+        ...
+
+    @abstractmethod
+    async def update(self, job_id: str, **changes) -> Optional[UploadJobStatus]:
+        ...
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local job store; finished jobs are pruned after ``ttl_seconds``."""
+
+    def __init__(self, ttl_seconds: float = 3600.0, max_jobs: int = 1000):
+        self._jobs: Dict[str, UploadJobStatus] = {}
+        self._ttl_seconds = ttl_seconds
+        self._max_jobs = max_jobs
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self._ttl_seconds
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status in TERMINAL_STATUSES and job.updatedAt < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        # Oldest finished jobs go first when the store is still over capacity.
+        if len(self._jobs) >= self._max_jobs:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.status in TERMINAL_STATUSES),
+                key=lambda job: job.updatedAt,
+            )
+            for job in finished[: len(self._jobs) - self._max_jobs + 1]:
+                del self._jobs[job.jobId]
+
+    async def create(self, job: UploadJobStatus) -> UploadJobStatus:
+        self._prune()
+        self._jobs[job.jobId] = job
+        return job
+
+    async def get(self, job_id: str) -> Optional[UploadJobStatus]:
+        return self._jobs.get(job_id)
+
+    async def update(self, job_id: str, **changes) -> Optional[UploadJobStatus]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        updated = job.model_copy(update={**changes, "updatedAt": time.time()})
+        self._jobs[job_id] = updated
+        return updated
+
+
+JobHandler = Callable[[str, TopicUploadRequest], Awaitable[None]]
+
+
+class JobRunner:
+    """Bounded worker pool that executes queued upload jobs."""
+
+    def __init__(self, store: JobStore, handler: JobHandler, concurrency: int = 2, max_queue: int = 100):
+        self.store = store
+        self._handler = handler
+        self._concurrency = max(1, concurrency)
+        self._queue: "asyncio.Queue[tuple[str, TopicUploadRequest]]" = asyncio.Queue(maxsize=max_queue)
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(index), name=f"upload-job-worker-{index}")
+            for index in range(self._concurrency)
+        ]
+        logger.info("Started %d upload job worker(s)", self._concurrency)
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Jobs still queued will never run; do not leave them "queued" in the store.
+        while not self._queue.empty():
+            job_id, _ = self._queue.get_nowait()
+            self._queue.task_done()
+            await self.store.update(job_id, status="failed", errors=["Job cancelled during shutdown"])
+
+    async def submit(self, payload: TopicUploadRequest) -> UploadJobStatus:
+        if self._queue.full():
+            raise QueueFullError("Upload job queue is full; retry later")
+        now = time.time()
+        job = UploadJobStatus(
+            jobId=uuid.uuid4().hex,
+            status="queued",
+            topicName=payload.topicName,
+            progress={"flashcard": "pending", "test": "pending"},
+            createdAt=now,
+            updatedAt=now,
+        )
+        await self.store.create(job)
+        try:
+            self._queue.put_nowait((job.jobId, payload))
+        except asyncio.QueueFull:
+            # Concurrent submits filled the queue while this one was storing its job.
+            await self.store.update(job.jobId, status="failed", errors=["Upload job queue is full"])
+            raise QueueFullError("Upload job queue is full; retry later") from None
+        return job
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id, payload = await self._queue.get()
+            try:
+                await self.store.update(job_id, status="running")
+                await self._handler(job_id, payload)
+            except asyncio.CancelledError:
+                await self.store.update(job_id, status="failed", errors=["Job cancelled during shutdown"])
+                raise
+            except Exception as exc:  # pragma: no cover - defensive logging
+                logger.exception("Upload job %s failed in worker %d", job_id, index)
+                await self.store.update(job_id, status="failed", errors=[str(exc)])
+            finally:
+                self._queue.task_done()
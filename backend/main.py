@@ -1,10 +1,21 @@
+import time
+
+# Taken before the heavy imports below so the startup report can show their cost.
+_IMPORTS_STARTED = time.perf_counter()
+
+import asyncio
+import hmac
+import json
+import logging
+import math
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from typing import List, Optional
+from typing import Awaitable, Callable, Dict, List, Literal, Optional, Tuple, Union
 
-from fastapi import FastAPI, HTTPException, Query, Response, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from dotenv import load_dotenv
@@ -14,42 +25,137 @@ import os
 import sys
 
 sys.path.append(str(Path(__file__).resolve().parent))
-import cosmos
 from models import (
+    AnswersPatch,
     AnswersPayload,
+    BulkAnswerResult,
+    BulkAnswersRequest,
+    BulkAnswersResponse,
     Questionnaire,
     QuestionnaireCreate,
+    QuestionnaireStats,
+    QuestionnaireSummary,
     QuestionnaireUpdate,
+    RegradeStatus,
     StoredAnswers,
     TopicUploadRequest,
     TopicUploadResponse,
+    UploadedImage,
     PaginatedAnswersResponse,
+    ResponseCounts,
+    UploadJobStatus,
+    is_reserved_user_id,
 )
 from questionnaire_store import (
+    cache_stats as questionnaire_cache_stats,
     create_questionnaire,
     delete_questionnaire,
     get_default_questionnaire,
+    get_default_questionnaire_with_etag,
     get_questionnaire,
-    list_questionnaires,
+    get_questionnaire_with_etag,
+    list_questionnaire_summaries_with_etag,
+    list_questionnaires_with_etag,
+    peek_catalog_etag,
+    peek_default_questionnaire_etag,
+    peek_questionnaire_etag,
     seed_if_empty,
-    update_questionnaire,
+    update_questionnaire_with_previous,
+)
+from storage import (
+    close_storage,
+    delete_stored_answers,
+    get_answer_counts,
+    get_answer_stats,
+    get_answers,
+    init_storage,
+    iter_all_answers,
+    list_all_answers,
+    list_answers_page,
+    patch_answers,
+    rebuild_answer_counts,
+    rebuild_answer_stats,
+    save_answers,
+    save_answers_bulk,
+    storage_available,
+    storage_backend_name,
+    storage_resilience_stats,
 )
-from storage import save_answers, get_answers, init_storage, list_all_answers, delete_stored_answers
 from content_generator import get_content_generator
+from cosmos_resilience import CosmosConflictError, CosmosUnavailableError
+import metrics
+from request_profiler import PROFILE_DIR, PROFILE_MAX_BYTES, PROFILE_SECRET, ProfileStore, ProfilingMiddleware
+from answer_stats import RESPONSES_KEY
+import export
+from fast_responses import COMPRESSION_MIN_BYTES, CompressionMiddleware, FastJSONResponse, fast_responses_enabled
+from jobs import TERMINAL_STATUSES, JobRunner, QueueFullError
+from regrade import RegradeInProgressError, RegradeRunner
+from storage_backend import job_store
+from image_pipeline import (
+    UPLOAD_MAX_BODY_BYTES,
+    ImageRejectedError,
+    ImageTooLargeError,
+    UploadSizeLimitMiddleware,
+    preprocess_images,
+)
+from startup import (
+    STARTUP_BACKGROUND_INIT,
+    STARTUP_READY_TIMEOUT_SECONDS,
+    ReadinessGateMiddleware,
+    StartupReport,
+)
+
+_IMPORTS_MS = (time.perf_counter() - _IMPORTS_STARTED) * 1000
 
 
-def _answers_or_empty(user_id: str, questionnaire_id: str) -> StoredAnswers:
-    stored = get_answers(user_id, questionnaire_id)
+logger = logging.getLogger(__name__)
+
+
+async def _answers_or_empty(user_id: str, questionnaire_id: str) -> StoredAnswers:
+    stored = await get_answers(user_id, questionnaire_id)
     if stored:
         return stored
     # Return an empty payload so callers don't need to special-case new users.
     return StoredAnswers(userId=user_id, questionnaireId=questionnaire_id, answers={})
 
+startup_report = StartupReport()
+
+
+async def _initialize(raise_errors: bool) -> None:
+    try:
+        with startup_report.phase("storage") as steps:
+            await init_storage(timings=steps)
+        with startup_report.phase("seed"):
+            await seed_if_empty()
+    except Exception as exc:
+        startup_report.finish(exc)
+        if raise_errors:
+            raise
+        logger.exception("Background startup initialization failed")
+        return
+    startup_report.finish()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_storage()
-    seed_if_empty()
-    yield
+    startup_report.begin()
+    startup_report.record("imports", _IMPORTS_MS)
+    job_runner.start()
+    init_task = None
+    if STARTUP_BACKGROUND_INIT:
+        # Accept connections right away; ReadinessGateMiddleware holds API calls until done.
+        init_task = asyncio.create_task(_initialize(raise_errors=False), name="startup-init")
+    else:
+        await _initialize(raise_errors=True)
+    try:
+        yield
+    finally:
+        if init_task is not None:
+            init_task.cancel()
+            await asyncio.gather(init_task, return_exceptions=True)
+        await job_runner.stop()
+        await regrade_runner.stop()
+        await close_storage()
 
 
 app = FastAPI(title="Student Questionnaire API", version="0.1.0", lifespan=lifespan)
@@ -57,116 +163,510 @@ app = FastAPI(title="Student Questionnaire API", version="0.1.0", lifespan=lifes
 FE_FQDN = os.getenv("FRONTEND_FQDN")
 
 # CORS for local development
+# Added before CORS so that 413 responses still carry CORS headers.
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=UPLOAD_MAX_BODY_BYTES)
+app.add_middleware(
+    ReadinessGateMiddleware,
+    report=startup_report,
+    timeout_seconds=STARTUP_READY_TIMEOUT_SECONDS,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", f"https://{FE_FQDN}"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-@app.get("/api/questionnaire", response_model=Questionnaire)
-def questionnaire_endpoint():
-    return get_default_questionnaire()
+if COMPRESSION_MIN_BYTES > 0:
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_MAX_BYTES)
+app.add_middleware(ProfilingMiddleware, store=profile_store)
 
+if metrics.METRICS_ENABLED:
+    # Outermost, so latency covers every other middleware too.
+    app.add_middleware(metrics.MetricsMiddleware, routes=app.routes)
 
-@app.get("/api/questionnaires", response_model=List[Questionnaire])
-def list_questionnaires_endpoint():
-    return list_questionnaires()
+
+@app.exception_handler(CosmosUnavailableError)
+async def _cosmos_unavailable(request: Request, exc: CosmosUnavailableError) -> JSONResponse:
+    # Throttled past the retry budget or the breaker is open: tell clients when to come back.
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Storage is temporarily unavailable; retry shortly"},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after_seconds)))},
+    )
+
+
+@app.exception_handler(CosmosConflictError)
+async def _cosmos_conflict(request: Request, exc: CosmosConflictError) -> JSONResponse:
+    # Concurrent writes to the same answers kept winning; nothing was stored.
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={"detail": "The answers were changed concurrently; retry the request"},
+        headers={"Retry-After": "1"},
+    )
+
+
+def _etag_matches(request: Request, etag: Optional[str]) -> bool:
+    if not etag:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {candidate.strip().removeprefix("W/").strip('"') for candidate in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _etag_headers(etag: str) -> dict:
+    # no-cache: clients may store the payload but must revalidate with If-None-Match.
+    return {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=_etag_headers(etag))
+
+
+def _render(content, response: Response, headers: Optional[dict] = None):
+    """Return ``content`` through the fast path when enabled, else let FastAPI serialize it."""
+    if fast_responses_enabled():
+        return FastJSONResponse(content, headers=headers)
+    if headers:
+        response.headers.update(headers)
+    return content
+
+
+@app.get("/api/questionnaire", response_model=Questionnaire)
+async def questionnaire_endpoint(request: Request, response: Response):
+    known = await peek_default_questionnaire_etag()
+    if _etag_matches(request, known):
+        return _not_modified(known)
+    questionnaire, etag = await get_default_questionnaire_with_etag()
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+    return _render(questionnaire, response, _etag_headers(etag))
+
+
+@app.get("/api/questionnaires", response_model=Union[List[Questionnaire], List[QuestionnaireSummary]])
+async def list_questionnaires_endpoint(
+    request: Request,
+    response: Response,
+    view: Literal["full", "summary"] = Query("full", description="'summary' omits question bodies"),
+):
+    known = await peek_catalog_etag(view)
+    if _etag_matches(request, known):
+        return _not_modified(known)
+    if view == "summary":
+        questionnaires, etag = await list_questionnaire_summaries_with_etag()
+    else:
+        questionnaires, etag = await list_questionnaires_with_etag()
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+    return _render(questionnaires, response, _etag_headers(etag))
 
 
 @app.get("/api/questionnaires/{questionnaire_id}", response_model=Questionnaire)
-def get_questionnaire_endpoint(questionnaire_id: str):
-    questionnaire = get_questionnaire(questionnaire_id)
-    if not questionnaire:
+async def get_questionnaire_endpoint(questionnaire_id: str, request: Request, response: Response):
+    known = await peek_questionnaire_etag(questionnaire_id)
+    if _etag_matches(request, known):
+        return _not_modified(known)
+    entry = await get_questionnaire_with_etag(questionnaire_id)
+    if not entry:
         raise HTTPException(status_code=404, detail="Questionnaire not found")
-    return questionnaire
+    questionnaire, etag = entry
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+    return _render(questionnaire, response, _etag_headers(etag))
 
 
 @app.post("/api/questionnaires", response_model=Questionnaire, status_code=201)
-def create_questionnaire_endpoint(payload: QuestionnaireCreate):
+async def create_questionnaire_endpoint(payload: QuestionnaireCreate):
     try:
-        return create_questionnaire(payload)
+        return await create_questionnaire(payload)
     except ValueError as exc:
         raise HTTPException(status_code=409, detail=str(exc)) from exc
 
 
 @app.put("/api/questionnaires/{questionnaire_id}", response_model=Questionnaire)
-def update_questionnaire_endpoint(questionnaire_id: str, payload: QuestionnaireUpdate):
-    updated = update_questionnaire(questionnaire_id, payload)
-    if not updated:
+async def update_questionnaire_endpoint(questionnaire_id: str, payload: QuestionnaireUpdate):
+    entry = await update_questionnaire_with_previous(questionnaire_id, payload)
+    if not entry:
         raise HTTPException(status_code=404, detail="Questionnaire not found")
+    previous, updated = entry
+    if updated.type == "test" and _right_answers(previous) != _right_answers(updated):
+        # Stored correct flags were graded against the old answers; a running re-grade
+        # uses an older snapshot, so another one follows it.
+        regrade_runner.schedule(updated)
     return updated
 
 
+def _right_answers(questionnaire: Optional[Questionnaire]) -> Dict[str, object]:
+    if questionnaire is None:
+        return {}
+    return {question.id: question.rightAnswer for question in questionnaire.questions}
+
+
+regrade_runner = RegradeRunner(
+    batch_size=int(os.getenv("REGRADE_BATCH_SIZE", "500")),
+    concurrency=int(os.getenv("REGRADE_CONCURRENCY", "8")),
+)
+
+
+@app.post("/api/questionnaires/{questionnaire_id}/regrade", response_model=RegradeStatus, status_code=202)
+async def start_regrade(questionnaire_id: str):
+    """Re-grade every stored answer of a test questionnaire against its current right answers."""
+    questionnaire = await get_questionnaire(questionnaire_id)
+    if not questionnaire:
+        raise HTTPException(status_code=404, detail="Questionnaire not found")
+    if questionnaire.type != "test":
+        raise HTTPException(status_code=400, detail="Only test questionnaires are graded")
+    try:
+        return regrade_runner.start(questionnaire)
+    except RegradeInProgressError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+
+@app.get("/api/questionnaires/{questionnaire_id}/regrade", response_model=RegradeStatus)
+async def regrade_status(questionnaire_id: str):
+    """Progress of the latest re-grade of a questionnaire.
+
+    Progress is kept by the worker process running the re-grade; other workers answer 404.
+    """
+    current = regrade_runner.status(questionnaire_id)
+    if not current:
+        raise HTTPException(status_code=404, detail="No re-grade has run for this questionnaire")
+    return current
+
+
 @app.delete("/api/questionnaires/{questionnaire_id}", status_code=204)
-def delete_questionnaire_endpoint(questionnaire_id: str):
-    deleted = delete_questionnaire(questionnaire_id)
+async def delete_questionnaire_endpoint(questionnaire_id: str):
+    deleted = await delete_questionnaire(questionnaire_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Questionnaire not found")
     return Response(status_code=204)
 
 @app.post("/api/answers", response_model=StoredAnswers)
-def post_answers(payload: AnswersPayload):
-    questionnaire_id = payload.questionnaireId or get_default_questionnaire().id
-    stored = save_answers(payload.userId, questionnaire_id, payload.answers)
+async def post_answers(payload: AnswersPayload):
+    questionnaire_id = payload.questionnaireId or (await get_default_questionnaire()).id
+    stored = await save_answers(payload.userId, questionnaire_id, payload.answers)
     return stored
 
+@app.post("/api/answers/bulk", response_model=BulkAnswersResponse)
+async def post_answers_bulk(payload: BulkAnswersRequest):
+    """Import many answer sets at once (paper sessions, offline tablets)."""
+    default_id = None
+    if any(not item.questionnaireId for item in payload.items):
+        default_id = (await get_default_questionnaire()).id
+    entries = [
+        (item.userId, item.questionnaireId or default_id, item.answers)
+        for item in payload.items
+    ]
+    errors = await save_answers_bulk(entries)
+    results = [
+        BulkAnswerResult(
+            index=index,
+            userId=user_id,
+            questionnaireId=questionnaire_id,
+            status="error" if error else "ok",
+            error=error,
+        )
+        for index, ((user_id, questionnaire_id, _), error) in enumerate(zip(entries, errors))
+    ]
+    failed = sum(1 for error in errors if error)
+    return BulkAnswersResponse(succeeded=len(results) - failed, failed=failed, results=results)
+
+
 @app.get("/api/answers/{user_id}", response_model=StoredAnswers)
-def fetch_answers(user_id: str, questionnaire_id: Optional[str] = Query(default=None)):
-    effective_id = questionnaire_id or get_default_questionnaire().id
-    return _answers_or_empty(user_id, effective_id)
+async def fetch_answers(user_id: str, questionnaire_id: Optional[str] = Query(default=None)):
+    effective_id = questionnaire_id or (await get_default_questionnaire()).id
+    return await _answers_or_empty(user_id, effective_id)
 
 
 @app.post("/api/questionnaires/{questionnaire_id}/answers", response_model=StoredAnswers, status_code=201)
-def post_answers_for_questionnaire(questionnaire_id: str, payload: AnswersPayload):
+async def post_answers_for_questionnaire(questionnaire_id: str, payload: AnswersPayload):
     effective_id = payload.questionnaireId or questionnaire_id
     if payload.questionnaireId and payload.questionnaireId != questionnaire_id:
         raise HTTPException(status_code=400, detail="Questionnaire ID mismatch")
-    stored = save_answers(payload.userId, effective_id, payload.answers)
+    stored = await save_answers(payload.userId, effective_id, payload.answers)
     return stored
 
 
 @app.get("/api/questionnaires/{questionnaire_id}/answers/{user_id}", response_model=StoredAnswers)
-def fetch_answers_for_questionnaire(questionnaire_id: str, user_id: str):
-    return _answers_or_empty(user_id, questionnaire_id)
+async def fetch_answers_for_questionnaire(questionnaire_id: str, user_id: str):
+    return await _answers_or_empty(user_id, questionnaire_id)
+
+
+@app.patch("/api/questionnaires/{questionnaire_id}/answers/{user_id}", response_model=StoredAnswers)
+async def patch_answers_for_questionnaire(questionnaire_id: str, user_id: str, payload: AnswersPatch):
+    """Apply only the changed answers (autosave) and return the merged answers."""
+    if is_reserved_user_id(user_id):
+        raise HTTPException(status_code=400, detail="Reserved user ID")
+    return await patch_answers(user_id, questionnaire_id, payload.answers)
+
+
+@app.get("/api/questionnaires/{questionnaire_id}/stats", response_model=QuestionnaireStats)
+async def questionnaire_stats(questionnaire_id: str):
+    """Per-question correctness rates and answer distributions from the maintained aggregates."""
+    stats = await get_answer_stats(questionnaire_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Questionnaire not found")
+    return stats
 
 
 @app.get("/api/responses", response_model=PaginatedAnswersResponse)
-def list_responses(
-    page: int = Query(default=1, ge=1, description="Page number (1-indexed)"),
+async def list_responses(
+    response: Response,
+    page: int = Query(default=1, ge=1, description="Page number (1-indexed); prefer cursor for deep paging"),
     pageSize: int = Query(default=10, ge=1, le=100, description="Number of items per page"),
+    cursor: Optional[str] = Query(default=None, description="Opaque nextCursor from the previous page"),
 ):
-    """List all stored answers with pagination."""
-    import math
-    offset = (page - 1) * pageSize
-    items, total = list_all_answers(limit=pageSize, offset=offset)
+    """List all stored answers with pagination.
+
+    The first page and any request carrying ``cursor`` use continuation-token
+    paging; follow ``nextCursor`` for subsequent pages. ``page`` > 1 without a
+    cursor falls back to OFFSET/LIMIT paging for older clients.
+    """
+    next_cursor = None
+    if cursor or page == 1:
+        try:
+            items, next_cursor, total = await list_answers_page(limit=pageSize, cursor=cursor)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+    else:
+        offset = (page - 1) * pageSize
+        items, total = await list_all_answers(limit=pageSize, offset=offset)
     total_pages = math.ceil(total / pageSize) if total > 0 else 1
-    return PaginatedAnswersResponse(
-        items=items,
-        total=total,
-        page=page,
-        pageSize=pageSize,
-        totalPages=total_pages,
+    return _render(
+        PaginatedAnswersResponse(
+            items=items,
+            total=total,
+            page=page,
+            pageSize=pageSize,
+            totalPages=total_pages,
+            nextCursor=next_cursor,
+        ),
+        response,
     )
 
 
+@app.get("/api/responses/export")
+async def export_responses(
+    export_format: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+    questionnaireId: Optional[str] = Query(default=None, description="Only export responses to this questionnaire"),
+):
+    """Stream every stored response as NDJSON (one document per line) or CSV (one row per question)."""
+    items = iter_all_answers(questionnaireId)
+    if export_format == "csv":
+        body, media_type = export.to_csv(items), "text/csv; charset=utf-8"
+    else:
+        body, media_type = export.to_ndjson(items), "application/x-ndjson"
+    filename = f"responses-{questionnaireId or 'all'}.{export_format}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/api/responses/counts", response_model=ResponseCounts)
+async def response_counts():
+    """Total and per-questionnaire response counts from the maintained counters."""
+    return await get_answer_counts()
+
+
+@app.post("/api/responses/counts/rebuild", response_model=ResponseCounts)
+async def rebuild_response_counts():
+    """Recount all responses exactly and reset the counters (recovery after drift)."""
+    return await rebuild_answer_counts()
+
+
+@app.post("/api/responses/stats/rebuild", response_model=Dict[str, int])
+async def rebuild_response_stats(
+    questionnaireId: Optional[str] = Query(default=None, description="Only rebuild this questionnaire"),
+):
+    """Recompute the answer statistics from stored responses (recovery after drift).
+
+    Returns the number of responses counted per rebuilt questionnaire.
+    """
+    rebuilt = await rebuild_answer_stats(questionnaireId)
+    return {questionnaire_id: counters.get(RESPONSES_KEY, 0) for questionnaire_id, counters in rebuilt.items()}
+
+
 @app.delete("/api/responses/{questionnaire_id}/{user_id}", status_code=204)
-def delete_response(questionnaire_id: str, user_id: str):
+async def delete_response(questionnaire_id: str, user_id: str):
     """Delete a specific response by questionnaire ID and user ID."""
-    deleted = delete_stored_answers(user_id, questionnaire_id)
+    deleted = await delete_stored_answers(user_id, questionnaire_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Response not found")
     return Response(status_code=204)
 
 
-@app.post("/api/upload", response_model=TopicUploadResponse)
-def upload_topic(payload: TopicUploadRequest):
+async def _store_generated(label: str, data: dict, fallback_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """Persist a generated questionnaire, retrying once with a unique id on collision.
+
+    Returns (created questionnaire id, error message).
+    """
+    try:
+        created = await create_questionnaire(QuestionnaireCreate(**data))
+        return created.id, None
+    except ValueError:
+        # Duplicate ID - try with a unique suffix
+        try:
+            data["id"] = f"{data.get('id', fallback_id)}-{int(time.time())}"
+            created = await create_questionnaire(QuestionnaireCreate(**data))
+            return created.id, None
+        except Exception as inner_e:
+            return None, f"{label} creation failed: {inner_e}"
+    except Exception as e:
+        return None, f"{label} creation failed: {e}"
+
+
+async def _generate_and_store(
+    label: str,
+    generate: Callable[..., dict],
+    fallback_id: str,
+    payload: TopicUploadRequest,
+    images: List[dict],
+) -> Tuple[Optional[str], Optional[str], float]:
+    """Run one generation branch of a topic upload.
+
+    Returns (created questionnaire id, error message, elapsed milliseconds).
+    """
+    started = time.perf_counter()
+    try:
+        data = await run_in_threadpool(
+            generate,
+            payload.topicName, payload.topicText, images=images, reasoning_effort=payload.reasoningEffort
+        )
+    except Exception as e:
+        created_id, error = None, f"{label} generation failed: {e}"
+    else:
+        created_id, error = await _store_generated(label, data, fallback_id)
+    return created_id, error, (time.perf_counter() - started) * 1000
+
+
+async def _run_topic_upload(
+    generator,
+    payload: TopicUploadRequest,
+    on_branch_done: Optional[Callable[[str, Optional[str], Optional[str]], Awaitable[None]]] = None,
+) -> Tuple[Optional[str], Optional[str], List[str], Dict[str, float]]:
+    """Generate and persist flashcards and test for a topic.
+
+    Returns (flashcard id, test id, errors, timings). ``on_branch_done`` is awaited
+    with (branch, created id, error) as soon as each branch finishes.
+    """
+    images = [image.model_dump() for image in (payload.images or [])]
+
+    async def run_branch(branch: str, label: str, generate: Callable[..., dict]):
+        result = await _generate_and_store(label, generate, branch, payload, images)
+        if on_branch_done:
+            await on_branch_done(branch, result[0], result[1])
+        return result
+
+    # Flashcards and test are independent Responses API calls; run both branches
+    # (generation + persistence) concurrently so latency is the max, not the sum.
+    started = time.perf_counter()
+    (flashcard_id, flashcard_error, flashcard_ms), (test_id, test_error, test_ms) = await asyncio.gather(
+        run_branch("flashcard", "Flashcard", generator.generate_flashcards),
+        run_branch("test", "Test", generator.generate_test),
+    )
+    total_ms = (time.perf_counter() - started) * 1000
+    errors = [error for error in (flashcard_error, test_error) if error]
+    timings = {
+        "flashcardMs": round(flashcard_ms, 1),
+        "testMs": round(test_ms, 1),
+        "totalMs": round(total_ms, 1),
+    }
+    logger.info("Topic upload '%s' timings: %s", payload.topicName, timings)
+    return flashcard_id, test_id, errors, timings
+
+
+async def _preprocess_upload(payload: TopicUploadRequest) -> TopicUploadRequest:
+    """Shrink and de-duplicate the upload's images once, before either generation call."""
+    if not payload.images:
+        return payload
+    try:
+        images, _ = await run_in_threadpool(preprocess_images, [image.model_dump() for image in payload.images])
+    except ImageTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except ImageRejectedError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return payload.model_copy(update={"images": [UploadedImage(**image) for image in images]})
+
+
+def _upload_message(flashcard_id: Optional[str], test_id: Optional[str], errors: List[str]) -> str:
+    message_parts = []
+    if flashcard_id:
+        message_parts.append(f"Flashcards created (ID: {flashcard_id})")
+    if test_id:
+        message_parts.append(f"Test created (ID: {test_id})")
+    if errors:
+        message_parts.append(f"Warnings: {'; '.join(errors)}")
+    return "; ".join(message_parts)
+
+
+async def _process_upload_job(job_id: str, payload: TopicUploadRequest) -> None:
+    """Job handler executed by the upload worker pool."""
+    store = job_runner.store
+    progress = {"flashcard": "running", "test": "running"}
+    await store.update(job_id, progress=dict(progress))
+
+    async def on_branch_done(branch: str, created_id: Optional[str], error: Optional[str]) -> None:
+        progress[branch] = "failed" if error else "succeeded"
+        changes = {"progress": dict(progress)}
+        if created_id:
+            changes[f"{branch}Id"] = created_id
+        await store.update(job_id, **changes)
+
+    flashcard_id, test_id, errors, timings = await _run_topic_upload(
+        get_content_generator(), payload, on_branch_done=on_branch_done
+    )
+    if flashcard_id or test_id:
+        status_value = "succeeded"
+        message = _upload_message(flashcard_id, test_id, errors)
+    else:
+        status_value = "failed"
+        message = f"Failed to generate content: {'; '.join(errors)}"
+    await store.update(
+        job_id,
+        status=status_value,
+        flashcardId=flashcard_id,
+        testId=test_id,
+        errors=errors,
+        message=message,
+        timings=timings,
+    )
+
+
+job_runner = JobRunner(
+    job_store(ttl_seconds=float(os.getenv("UPLOAD_JOB_TTL_SECONDS", "3600"))),
+    handler=_process_upload_job,
+    concurrency=int(os.getenv("UPLOAD_JOB_CONCURRENCY", "2")),
+    max_queue=int(os.getenv("UPLOAD_JOB_QUEUE_SIZE", "100")),
+)
+
+
+@app.post(
+    "/api/upload",
+    response_model=TopicUploadResponse,
+    responses={202: {"model": UploadJobStatus, "description": "Job accepted (mode=async)"}},
+)
+async def upload_topic(
+    payload: TopicUploadRequest,
+    mode: Literal["sync", "async"] = Query(
+        default="sync",
+        description="'async' queues a background job and returns 202 with its id",
+    ),
+):
     """
     Upload a new topic to generate flashcards and test questions.
     
     This endpoint uses Azure OpenAI to generate educational content
     and stores it in CosmosDB as new questionnaire documents.
+    With ``mode=async`` the work is queued and progress can be polled at
+    ``/api/upload/jobs/{job_id}``.
     """
     generator = get_content_generator()
     
@@ -175,97 +675,187 @@ def upload_topic(payload: TopicUploadRequest):
             status_code=503,
             detail="Content generation service is not available. Check Azure OpenAI configuration."
         )
-    
-    flashcard_id = None
-    test_id = None
-    errors = []
-    
-    images = [image.model_dump() for image in (payload.images or [])]
-    reasoning_effort = payload.reasoningEffort
+    payload = await _preprocess_upload(payload)
 
-    # Generate flashcards
-    try:
-        flashcard_data = generator.generate_flashcards(
-            payload.topicName, payload.topicText, images=images, reasoning_effort=reasoning_effort
-        )
-        flashcard_questionnaire = QuestionnaireCreate(**flashcard_data)
-        created_flashcard = create_questionnaire(flashcard_questionnaire)
-        flashcard_id = created_flashcard.id
-    except ValueError as e:
-        # Duplicate ID - try with a unique suffix
+    if mode == "async":
         try:
-            import time
-            flashcard_data["id"] = f"{flashcard_data.get('id', 'flashcard')}-{int(time.time())}"
-            flashcard_questionnaire = QuestionnaireCreate(**flashcard_data)
-            created_flashcard = create_questionnaire(flashcard_questionnaire)
-            flashcard_id = created_flashcard.id
-        except Exception as inner_e:
-            errors.append(f"Flashcard creation failed: {inner_e}")
-    except Exception as e:
-        errors.append(f"Flashcard generation failed: {e}")
-    
-    # Generate test
-    try:
-        test_data = generator.generate_test(
-            payload.topicName, payload.topicText, images=images, reasoning_effort=reasoning_effort
+            job = await job_runner.submit(payload)
+        except QueueFullError as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=job.model_dump(),
+            headers={"Location": f"/api/upload/jobs/{job.jobId}"},
         )
-        test_questionnaire = QuestionnaireCreate(**test_data)
-        created_test = create_questionnaire(test_questionnaire)
-        test_id = created_test.id
-    except ValueError as e:
-        # Duplicate ID - try with a unique suffix
-        try:
-            import time
-            test_data["id"] = f"{test_data.get('id', 'test')}-{int(time.time())}"
-            test_questionnaire = QuestionnaireCreate(**test_data)
-            created_test = create_questionnaire(test_questionnaire)
-            test_id = created_test.id
-        except Exception as inner_e:
-            errors.append(f"Test creation failed: {inner_e}")
-    except Exception as e:
-        errors.append(f"Test generation failed: {e}")
-    
+
+    flashcard_id, test_id, errors, timings = await _run_topic_upload(generator, payload)
+
     if not flashcard_id and not test_id:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate content: {'; '.join(errors)}"
         )
     
-    message_parts = []
-    if flashcard_id:
-        message_parts.append(f"Flashcards created (ID: {flashcard_id})")
-    if test_id:
-        message_parts.append(f"Test created (ID: {test_id})")
-    if errors:
-        message_parts.append(f"Warnings: {'; '.join(errors)}")
-    
     return TopicUploadResponse(
         success=True,
-        message="; ".join(message_parts),
+        message=_upload_message(flashcard_id, test_id, errors),
         flashcardId=flashcard_id,
-        testId=test_id
+        testId=test_id,
+        timings=timings,
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/upload/stream")
+async def upload_topic_stream(payload: TopicUploadRequest):
+    """
+    Generate flashcards and a test while streaming each card as it is written.
+
+    Responds with server-sent events: ``card`` ({branch, index, card}) as soon
+    as a question object is complete, ``questionnaire`` ({branch, id}) once a
+    branch is stored, ``error`` ({branch, error}) when a branch fails, and a
+    final ``done`` ({flashcardId, testId, errors, timings}).
+    """
+    generator = get_content_generator()
+    if not generator.is_available():
+        raise HTTPException(
+            status_code=503,
+            detail="Content generation service is not available. Check Azure OpenAI configuration."
+        )
+    payload = await _preprocess_upload(payload)
+    images = [image.model_dump() for image in (payload.images or [])]
+    queue: "asyncio.Queue[Tuple[str, Optional[dict]]]" = asyncio.Queue()
+    started = time.perf_counter()
+
+    async def run_branch(branch: str, label: str) -> Tuple[Optional[str], Optional[str], Dict[str, float]]:
+        created_id, error, data = None, None, None
+        timings: Dict[str, float] = {}
+        try:
+            events = generator.stream_questionnaire(
+                branch, payload.topicName, payload.topicText, images=images, reasoning_effort=payload.reasoningEffort
+            )
+            index = 0
+            async for event in iterate_in_threadpool(events):
+                if event["type"] == "card":
+                    if index == 0:
+                        timings[f"{branch}FirstCardMs"] = round((time.perf_counter() - started) * 1000, 1)
+                    await queue.put(("card", {"branch": branch, "index": index, "card": event["card"]}))
+                    index += 1
+                else:
+                    data = event["questionnaire"]
+            if data is None:
+                raise ValueError("No questionnaire in response")
+        except Exception as e:
+            error = f"{label} generation failed: {e}"
+        else:
+            created_id, error = await _store_generated(label, data, branch)
+        timings[f"{branch}Ms"] = round((time.perf_counter() - started) * 1000, 1)
+        if error:
+            await queue.put(("error", {"branch": branch, "error": error}))
+        else:
+            await queue.put(("questionnaire", {"branch": branch, "id": created_id}))
+        await queue.put(("branch-done", None))
+        return created_id, error, timings
+
+    async def events():
+        # Branches run as tasks so a client disconnect does not abandon persistence.
+        tasks = [
+            asyncio.create_task(run_branch("flashcard", "Flashcard")),
+            asyncio.create_task(run_branch("test", "Test")),
+        ]
+        remaining = len(tasks)
+        while remaining:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=15)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event == "branch-done":
+                remaining -= 1
+            else:
+                yield _sse(event, data)
+        (flashcard_id, flashcard_error, flashcard_timings), (test_id, test_error, test_timings) = [
+            task.result() for task in tasks
+        ]
+        timings = {**flashcard_timings, **test_timings, "totalMs": round((time.perf_counter() - started) * 1000, 1)}
+        logger.info("Streamed topic upload '%s' timings: %s", payload.topicName, timings)
+        yield _sse("done", {
+            "flashcardId": flashcard_id,
+            "testId": test_id,
+            "errors": [error for error in (flashcard_error, test_error) if error],
+            "timings": timings,
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/upload/jobs/{job_id}", response_model=UploadJobStatus)
+async def get_upload_job(job_id: str):
+    job = await job_runner.store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job
+
+
+@app.get("/api/upload/jobs/{job_id}/events")
+async def stream_upload_job(job_id: str, request: Request):
+    """Server-sent events stream that emits the job status whenever it changes."""
+    if not await job_runner.store.get(job_id):
+        raise HTTPException(status_code=404, detail="Upload job not found")
+
+    async def events():
+        last_sent = None
+        last_emit = time.monotonic()
+        while not await request.is_disconnected():
+            job = await job_runner.store.get(job_id)
+            if job is None:
+                return
+            data = job.model_dump_json()
+            if data != last_sent:
+                yield f"event: status\ndata: {data}\n\n"
+                last_sent = data
+                last_emit = time.monotonic()
+                if job.status in TERMINAL_STATUSES:
+                    return
+            elif time.monotonic() - last_emit > 15:
+                # Comment line keeps proxies from closing an idle stream.
+                yield ": keep-alive\n\n"
+                last_emit = time.monotonic()
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 @app.get("/check")
-def check_cosmos_connection():
+async def check_cosmos_connection():
     """Return the current Cosmos DB connectivity status."""
 
     connected = False
     detail = "Cosmos DB connection not initialized."
 
     try:
-        connected = cosmos.cosmos_available()
+        connected = storage_available()
         if connected:
             detail = "Cosmos DB connection is healthy."
         else:
             # Attempt a one-time re-initialization in case connectivity was restored.
-            init_attempt = cosmos.init_cosmos()
-            if init_attempt and cosmos.cosmos_available():
+            init_attempt = await init_storage()
+            if init_attempt and storage_available():
                 connected = True
                 detail = "Cosmos DB connection re-established after re-initialization."
             else:
-                detail = "Cosmos DB is unavailable or not configured; API is using in-memory storage."
+                detail = f"Cosmos DB is unavailable or not configured; API is using {storage_backend_name()} storage."
     except Exception as exc:  # pragma: no cover - defensive logging
         return JSONResponse(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -282,17 +872,67 @@ def check_cosmos_connection():
             "status": "ok" if connected else "unavailable",
             "connected": connected,
             "detail": detail,
+            "storageBackend": storage_backend_name(),
+            "cosmosResilience": storage_resilience_stats(),
+            "startup": startup_report.as_dict(),
+            "questionnaireCache": questionnaire_cache_stats(),
+            "generationCache": get_content_generator().cache_stats(),
         },
     )
 
 
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once startup initialization has finished, with per-phase timings."""
+    report = startup_report.as_dict()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if report["status"] == "ready" else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=report,
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Request, Cosmos DB and LLM metrics in the Prometheus text format."""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def _require_profile_key(request: Request) -> None:
+    # Profiles expose code paths and timings: admin access needs the profiling secret.
+    if not PROFILE_SECRET:
+        raise HTTPException(status_code=404, detail="Profiling admin is disabled")
+    key = request.headers.get("x-profile-key", "")
+    if not hmac.compare_digest(key.encode("utf-8"), PROFILE_SECRET.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid profile key")
+
+
+@app.get("/admin/profiles", include_in_schema=False)
+async def list_profiles(request: Request):
+    """Recently saved request profiles, newest first."""
+    _require_profile_key(request)
+    return {"profiles": await run_in_threadpool(profile_store.list)}
+
+
+@app.get("/admin/profiles/{name}", include_in_schema=False)
+async def download_profile(name: str, request: Request):
+    """Download one saved profile (pstats or speedscope JSON)."""
+    _require_profile_key(request)
+    path = profile_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/json" if name.endswith(".json") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=name)
+
+
 @app.get("/api/config")
-def get_config():
+async def get_config():
     """Return public configuration information including the OpenAI model in use."""
     return {
         "openaiModel": os.getenv("AZURE_OPENAI_MODEL", "unknown"),
@@ -0,0 +1,305 @@
+"""In-process Prometheus metrics served at ``/metrics``.
+
+A minimal counter/gauge/histogram implementation rendering the Prometheus text
+format, so no client library is needed. Each observation is one dict lookup and
+a few additions under a lock (the generator runs in worker threads), cheap
+enough to leave on in production. Recorded:
+
+* HTTP: request latency and in-flight requests per route template, from
+  :class:`MetricsMiddleware`, and a request counter per status code;
+* Cosmos: latency per ``cosmos_aio`` operation (:func:`observe_cosmos`) and the
+  request units it consumed, summed from ``x-ms-request-charge`` via
+  :func:`record_request_charge`;
+* LLM: Responses API latency and input/output/reasoning tokens per kind and
+  reasoning effort (:func:`observe_generation`).
+"""
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") in {"1", "true", "True"}
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COSMOS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LLM_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = HTTP_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last one is +Inf), sum].
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = self._header()
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"), HTTP_BUCKETS,
+)
+http_requests = Counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served.", ("method", "route"))
+cosmos_duration = Histogram(
+    "cosmos_operation_duration_seconds", "Cosmos DB operation latency, retries included.", ("operation",), COSMOS_BUCKETS,
+)
+cosmos_errors = Counter("cosmos_operation_errors_total", "Cosmos DB operations that raised.", ("operation",))
+cosmos_request_charge = Counter(
+    "cosmos_request_charge_total", "Request units consumed (x-ms-request-charge) by operation.", ("operation",),
+)
+llm_duration = Histogram(
+    "llm_request_duration_seconds", "Responses API call latency.", ("kind", "reasoning_effort"), LLM_BUCKETS,
+)
+llm_tokens = Counter(
+    "llm_tokens_total", "Responses API token usage by type.", ("kind", "reasoning_effort", "type"),
+)
+llm_errors = Counter("llm_request_errors_total", "Responses API calls that failed.", ("kind", "reasoning_effort"))
+answer_counter_failures = Counter(
+    "answer_counter_updates_failed_total",
+    "Answer count or statistics deltas that could not be applied; rebuild them to correct.",
+    ("counter",),
+)
+
+REGISTRY = (
+    http_request_duration,
+    http_requests,
+    http_in_flight,
+    cosmos_duration,
+    cosmos_errors,
+    cosmos_request_charge,
+    llm_duration,
+    llm_tokens,
+    llm_errors,
+    answer_counter_failures,
+)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Request units of the innermost running observe_cosmos operation: [charge]. Charges
+# go to the innermost operation only, so summing the counter never double counts.
+_cosmos_charge: ContextVar[Optional[List[float]]] = ContextVar("cosmos_charge", default=None)
+
+
+def record_request_charge(request_units: float) -> None:
+    """Attribute a reported request charge to the running Cosmos operation."""
+    charge = _cosmos_charge.get()
+    if charge is not None:
+        charge[0] += request_units
+    else:
+        cosmos_request_charge.inc("other", amount=request_units)
+
+
+def _finish_cosmos(operation: str, started: float, charge: List[float], failed: bool) -> None:
+    cosmos_duration.observe(time.perf_counter() - started, operation)
+    if failed:
+        cosmos_errors.inc(operation)
+    if charge[0]:
+        cosmos_request_charge.inc(operation, amount=charge[0])
+
+
+def observe_cosmos(func: Callable) -> Callable:
+    """Record latency, failures and request units of a Cosmos coroutine or async generator."""
+    operation = func.__name__
+
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def generator_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            charge = [0.0]
+            failed = False
+            iterator = func(*args, **kwargs)
+            try:
+                while True:
+                    # Only bind the accumulator while the generator runs, not while the caller does.
+                    token = _cosmos_charge.set(charge)
+                    try:
+                        item = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        _cosmos_charge.reset(token)
+                    yield item
+            except Exception:
+                failed = True
+                raise
+            finally:
+                await iterator.aclose()
+                _finish_cosmos(operation, started, charge, failed)
+
+        return generator_wrapper
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        charge = [0.0]
+        token = _cosmos_charge.set(charge)
+        failed = False
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _cosmos_charge.reset(token)
+            _finish_cosmos(operation, started, charge, failed)
+
+    return wrapper
+
+
+def observe_generation(kind: str, reasoning_effort: str, started: float, usage=None, failed: bool = False) -> None:
+    """Record one Responses API call; ``usage`` is the response's ``usage`` object, if any."""
+    llm_duration.observe(time.perf_counter() - started, kind, reasoning_effort)
+    if failed:
+        llm_errors.inc(kind, reasoning_effort)
+    if usage is None:
+        return
+    details = getattr(usage, "output_tokens_details", None)
+    for token_type, value in (
+        ("input", getattr(usage, "input_tokens", None)),
+        ("output", getattr(usage, "output_tokens", None)),
+        ("reasoning", getattr(details, "reasoning_tokens", None)),
+    ):
+        if value:
+            llm_tokens.inc(kind, reasoning_effort, token_type, amount=value)
+
+
+class MetricsMiddleware:
+    """Time HTTP requests and track in-flight counts per route template.
+
+    The route is matched up front against ``routes`` so in-flight requests carry
+    the same label as their latency; unmatched paths share one ``unmatched`` label
+    to keep the series count bounded.
+    """
+
+    def __init__(self, app: ASGIApp, routes: Sequence):
+        self.app = app
+        self.routes = routes
+
+    def _route_of(self, scope: Scope) -> str:
+        partial = None
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match is Match.FULL:
+                return getattr(route, "path", "unmatched")
+            if match is Match.PARTIAL and partial is None:
+                partial = getattr(route, "path", None)
+        return partial or "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route_of(scope)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(method, route)
+            http_request_duration.observe(time.perf_counter() - started, method, route)
+            http_requests.inc(method, route, str(status_code))
@@ -1,9 +1,16 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Dict, List, Optional, Union, Literal
 
 
 RightAnswer = Union[str, List[str]]
 QuestionnaireType = Literal["question", "test", "flashcard"]
+# User ids starting with this name the bookkeeping partitions of the Cosmos answers
+# container (cosmos_aio.STATS_PARTITION), so clients may not write answers under them.
+RESERVED_USER_ID_PREFIX = "__stats__"
+
+
+def is_reserved_user_id(user_id: str) -> bool:
+    return user_id.startswith(RESERVED_USER_ID_PREFIX)
 
 
 class AnswerDetail(BaseModel):
@@ -37,12 +44,56 @@ class AnswersPayload(BaseModel):
     userId: str
     answers: Dict[str, AnswerDetail]
 
+    @field_validator("userId")
+    @classmethod
+    def _not_reserved(cls, value: str) -> str:
+        if is_reserved_user_id(value):
+            raise ValueError(f"userId must not start with {RESERVED_USER_ID_PREFIX!r}")
+        return value
+
+class AnswersPatch(BaseModel):
+    """Changed answer entries only; entries not listed are left untouched."""
+    answers: Dict[str, AnswerDetail]
+
+
+class BulkAnswersRequest(BaseModel):
+    items: List[AnswersPayload] = Field(..., max_length=5000)
+
+
+class BulkAnswerResult(BaseModel):
+    index: int
+    userId: str
+    questionnaireId: str
+    status: Literal["ok", "error"]
+    error: Optional[str] = None
+
+
+class BulkAnswersResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkAnswerResult]
+
+
 class StoredAnswers(BaseModel):
     questionnaireId: str
     userId: str
     answers: Dict[str, AnswerDetail]
 
 
+class QuestionnaireSummary(BaseModel):
+    """Catalog entry without question bodies, returned by ``?view=summary``."""
+
+    model_config = {
+        "populate_by_name": True,
+    }
+
+    id: str
+    title: str
+    description: str = ""
+    type: QuestionnaireType = Field(default="question", alias="questionnaireType")
+    questionCount: int = 0
+
+
 class QuestionnaireCreate(Questionnaire):
     pass
 
@@ -83,6 +134,27 @@ class TopicUploadResponse(BaseModel):
     message: str
     flashcardId: Optional[str] = None
     testId: Optional[str] = None
+    # Per-branch wall-clock timings in milliseconds (flashcardMs, testMs, totalMs)
+    timings: Optional[Dict[str, float]] = None
+
+
+UploadJobState = Literal["queued", "running", "succeeded", "failed"]
+
+
+class UploadJobStatus(BaseModel):
+    """Status of a background topic upload job."""
+    jobId: str
+    status: UploadJobState
+    topicName: str
+    # Per-branch progress: "flashcard"/"test" -> pending | running | succeeded | failed
+    progress: Dict[str, str] = Field(default_factory=dict)
+    flashcardId: Optional[str] = None
+    testId: Optional[str] = None
+    message: Optional[str] = None
+    errors: List[str] = Field(default_factory=list)
+    timings: Optional[Dict[str, float]] = None
+    createdAt: float
+    updatedAt: float
 
 
 class PaginatedAnswersResponse(BaseModel):
@@ -92,3 +164,41 @@ class PaginatedAnswersResponse(BaseModel):
     page: int
     pageSize: int
     totalPages: int
+    # Opaque cursor for the next page; None when this is the last page
+    nextCursor: Optional[str] = None
+
+
+class ResponseCounts(BaseModel):
+    """Total and per-questionnaire number of stored responses."""
+    total: int
+    byQuestionnaire: Dict[str, int]
+
+
+class QuestionStats(BaseModel):
+    """Aggregates for one question; ``distribution`` is set for multichoice and scale."""
+    questionId: str
+    type: str
+    answered: int
+    graded: int
+    correct: int
+    correctRate: Optional[float] = None
+    distribution: Optional[Dict[str, int]] = None
+
+
+class QuestionnaireStats(BaseModel):
+    questionnaireId: str
+    responses: int
+    questions: List[QuestionStats]
+
+
+class RegradeStatus(BaseModel):
+    """Progress of a background re-grade of a test questionnaire's stored answers."""
+    questionnaireId: str
+    status: Literal["running", "succeeded", "failed"]
+    scanned: int = 0
+    changedDocuments: int = 0
+    changedAnswers: int = 0
+    failed: int = 0
+    errors: List[str] = Field(default_factory=list)
+    startedAt: float
+    updatedAt: float
@@ -1,39 +1,58 @@
+import hashlib
+import json
 import logging
+import os
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
 
 try:
-    from backend.cosmos import (
-        delete_questionnaire as cosmos_delete_questionnaire,
-        list_questionnaires as cosmos_list_questionnaires,
-        questionnaire_available,
-        read_questionnaire as cosmos_read_questionnaire,
-        upsert_questionnaire as cosmos_upsert_questionnaire,
-    )
+    from backend.cache import TTLCache
     from backend.data import DEFAULT_QUESTIONNAIRE_ID, QUESTIONNAIRES
-    from backend.models import Questionnaire, QuestionnaireCreate, QuestionnaireUpdate
+    from backend.models import Questionnaire, QuestionnaireCreate, QuestionnaireSummary, QuestionnaireUpdate
+    from backend.storage_backend import questionnaire_backend
 except ImportError:  # Allow execution when package context is unavailable
     import sys
 
     sys.path.append(str(Path(__file__).resolve().parent))
-    from cosmos import (
-        delete_questionnaire as cosmos_delete_questionnaire,
-        list_questionnaires as cosmos_list_questionnaires,
-        questionnaire_available,
-        read_questionnaire as cosmos_read_questionnaire,
-        upsert_questionnaire as cosmos_upsert_questionnaire,
-    )
+    from cache import TTLCache
     from data import DEFAULT_QUESTIONNAIRE_ID, QUESTIONNAIRES
-    from models import Questionnaire, QuestionnaireCreate, QuestionnaireUpdate
+    from models import Questionnaire, QuestionnaireCreate, QuestionnaireSummary, QuestionnaireUpdate
+    from storage_backend import questionnaire_backend
 
 
 logger = logging.getLogger(__name__)
 
-_memory_store: Dict[str, Questionnaire] = {q.id: q for q in QUESTIONNAIRES}
+
+def _content_hash(questionnaire: Questionnaire) -> str:
+    """Stable hash of a questionnaire's content, used as its ETag."""
+    canonical = json.dumps(questionnaire.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def _catalog_etag(etags: Iterable[Tuple[str, str]], view: str = "full") -> str:
+    joined = "\n".join(f"{questionnaire_id}:{etag}" for questionnaire_id, etag in sorted(etags))
+    if view != "full":
+        # Different representations of the same catalog must not share a validator.
+        joined = f"{view}\n{joined}"
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:32]
+
+
+# Read-through cache of parsed questionnaires in front of the storage backend. Entries are keyed by
+# questionnaire id and hold (questionnaire, etag); the full catalog is cached under a
+# separate key as (questionnaires, catalog etag), and its summary view likewise.
+_CATALOG_CACHE_KEY = ("catalog",)
+_SUMMARY_CACHE_KEY = ("catalog", "summary")
+_cache: TTLCache = TTLCache(
+    max_entries=int(os.getenv("QUESTIONNAIRE_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=float(os.getenv("QUESTIONNAIRE_CACHE_TTL_SECONDS", "60")),
+)
+# Backend write generation the cache was filled at; None for backends that cannot report one.
+_cache_generation: Optional[int] = None
 
 
 def _coerce_questionnaire_doc(doc: Dict[str, object]) -> Questionnaire:
     data = dict(doc)
+    data.pop("contentHash", None)
     if "type" not in data and "questionnaireType" in data:
         data["type"] = data.get("questionnaireType")
     data.pop("questionnaireType", None)
@@ -41,7 +60,16 @@ def _coerce_questionnaire_doc(doc: Dict[str, object]) -> Questionnaire:
     return Questionnaire(**data)
 
 
-def _validate_questionnaire(questionnaire: Questionnaire) -> None:
+def _coerce_summary_doc(doc: Dict[str, object]) -> Tuple[QuestionnaireSummary, str]:
+    data = {key: value for key, value in doc.items() if key not in {"contentHash", "_etag", "questionnaireType"}}
+    data.setdefault("type", doc.get("questionnaireType") or "question")
+    # Summaries never see the questions, so documents without a stored content hash
+    # fall back to the backend's _etag, which changes on every write.
+    return QuestionnaireSummary(**data), str(doc.get("contentHash") or doc.get("_etag") or "")
+
+
+def validate_questionnaire(questionnaire: Questionnaire) -> None:
+    """Raise ValueError when a test or flashcard set lacks right answers."""
     q_type = questionnaire.type
     if q_type == "test":
         missing = [
@@ -75,99 +103,193 @@ def _validate_questionnaire(questionnaire: Questionnaire) -> None:
             )
 
 
-def _use_memory_store() -> bool:
-    return not questionnaire_available()
+def _coerce_with_etag(doc: Dict[str, object]) -> Tuple[Questionnaire, str]:
+    questionnaire = _coerce_questionnaire_doc(doc)
+    # Documents written before content hashes were stored get one computed on read.
+    etag = doc.get("contentHash") or _content_hash(questionnaire)
+    return questionnaire, etag
 
 
-def _store_questionnaire_locally(questionnaire: Questionnaire) -> Questionnaire:
-    _memory_store[questionnaire.id] = questionnaire
-    return questionnaire
+def _to_document(questionnaire: Questionnaire) -> Dict[str, object]:
+    return {**questionnaire.model_dump(), "contentHash": _content_hash(questionnaire)}
 
 
-def seed_if_empty() -> bool:
-    if not questionnaire_available():
-        logger.warning("Skipping questionnaire seed because Cosmos questionnaire container is unavailable.")
-        return False
+def _invalidate_cached(questionnaire_id: str) -> None:
+    _cache.invalidate(questionnaire_id, _CATALOG_CACHE_KEY, _SUMMARY_CACHE_KEY)
 
-    existing = cosmos_list_questionnaires() or []
-    if existing:
-        logger.info("Questionnaires already present in Cosmos; skipping seed.")
+
+async def _revalidate_cache() -> Optional[int]:
+    """Drop the cache when another process wrote questionnaires; returns the current generation."""
+    global _cache_generation
+    if not _cache.enabled:
+        return None
+    generation = await questionnaire_backend().generation()
+    if generation != _cache_generation:
+        _cache.clear()
+        _cache_generation = generation
+    return generation
+
+
+def _cache_set(key: Hashable, value: object, generation: Optional[int]) -> None:
+    # A read that raced with a newer generation must not repopulate the cache.
+    if generation == _cache_generation:
+        _cache.set(key, value)
+
+
+def cache_stats() -> Dict[str, object]:
+    """Return hit/miss counters for the questionnaire read cache."""
+    return _cache.stats()
+
+
+def clear_cache() -> None:
+    _cache.clear()
+
+
+async def seed_if_empty() -> bool:
+    backend = questionnaire_backend()
+    # One point read covers every start after the first; the catalog is only
+    # listed when the default questionnaire is gone.
+    if await backend.read(DEFAULT_QUESTIONNAIRE_ID) or await backend.list():
+        logger.info("Questionnaires already present in %s storage; skipping seed.", backend.name)
         return True
 
-    logger.info("Seeding %d default questionnaire(s) into Cosmos", len(QUESTIONNAIRES))
+    logger.info("Seeding %d default questionnaire(s) into %s storage", len(QUESTIONNAIRES), backend.name)
     for questionnaire in QUESTIONNAIRES:
-        cosmos_upsert_questionnaire(questionnaire.model_dump())
+        await backend.upsert(_to_document(questionnaire))
+    _cache.clear()
     logger.info("Default questionnaires seeded successfully.")
     return True
 
 
-def list_questionnaires() -> List[Questionnaire]:
-    if _use_memory_store():
-        return list(_memory_store.values())
+async def peek_questionnaire_etag(questionnaire_id: str) -> Optional[str]:
+    """Return the known ETag for a questionnaire without reading the document, if any."""
+    await _revalidate_cache()
+    cached = _cache.peek(questionnaire_id)
+    return cached[1] if cached else None
 
-    docs = cosmos_list_questionnaires()
-    if docs is None:
-        logger.debug("Cosmos list returned None; falling back to in-memory questionnaires")
-        return list(_memory_store.values())
-    return [_coerce_questionnaire_doc(doc) for doc in docs]
 
+async def peek_catalog_etag(view: str = "full") -> Optional[str]:
+    """Return the known ETag of the catalog ``view`` without reading the documents, if any."""
+    await _revalidate_cache()
+    cached = _cache.peek(_SUMMARY_CACHE_KEY if view == "summary" else _CATALOG_CACHE_KEY)
+    return cached[1] if cached else None
 
-def get_questionnaire(questionnaire_id: str) -> Optional[Questionnaire]:
-    if _use_memory_store():
-        return _memory_store.get(questionnaire_id)
-    doc = cosmos_read_questionnaire(questionnaire_id)
-    return _coerce_questionnaire_doc(doc) if doc else None
 
+async def list_questionnaires_with_etag() -> Tuple[List[Questionnaire], str]:
+    generation = await _revalidate_cache()
+    cached = _cache.get(_CATALOG_CACHE_KEY)
+    if cached is not None:
+        return list(cached[0]), cached[1]
 
-def get_default_questionnaire() -> Questionnaire:
-    questionnaire = get_questionnaire(DEFAULT_QUESTIONNAIRE_ID)
-    if questionnaire:
-        return questionnaire
+    docs = await questionnaire_backend().list()
+    entries = [_coerce_with_etag(doc) for doc in docs]
+    questionnaires = [questionnaire for questionnaire, _ in entries]
+    etag = _catalog_etag((questionnaire.id, etag) for questionnaire, etag in entries)
+    _cache_set(_CATALOG_CACHE_KEY, (questionnaires, etag), generation)
+    return list(questionnaires), etag
+
+
+async def list_questionnaires() -> List[Questionnaire]:
+    questionnaires, _ = await list_questionnaires_with_etag()
+    return questionnaires
+
+
+async def list_questionnaire_summaries_with_etag() -> Tuple[List[QuestionnaireSummary], str]:
+    generation = await _revalidate_cache()
+    cached = _cache.get(_SUMMARY_CACHE_KEY)
+    if cached is not None:
+        return list(cached[0]), cached[1]
+
+    docs = await questionnaire_backend().list_summaries()
+    entries = [_coerce_summary_doc(doc) for doc in docs]
+    summaries = [summary for summary, _ in entries]
+    etag = _catalog_etag(((summary.id, etag) for summary, etag in entries), "summary")
+    _cache_set(_SUMMARY_CACHE_KEY, (summaries, etag), generation)
+    return list(summaries), etag
+
+
+async def list_questionnaire_summaries() -> List[QuestionnaireSummary]:
+    summaries, _ = await list_questionnaire_summaries_with_etag()
+    return summaries
+
+
+async def get_questionnaire_with_etag(questionnaire_id: str) -> Optional[Tuple[Questionnaire, str]]:
+    generation = await _revalidate_cache()
+    cached = _cache.get(questionnaire_id)
+    if cached is not None:
+        return cached
+
+    doc = await questionnaire_backend().read(questionnaire_id)
+    if not doc:
+        return None
+    entry = _coerce_with_etag(doc)
+    _cache_set(questionnaire_id, entry, generation)
+    return entry
+
+
+async def get_questionnaire(questionnaire_id: str) -> Optional[Questionnaire]:
+    entry = await get_questionnaire_with_etag(questionnaire_id)
+    return entry[0] if entry else None
+
+
+async def get_default_questionnaire_with_etag() -> Tuple[Questionnaire, str]:
+    entry = await get_questionnaire_with_etag(DEFAULT_QUESTIONNAIRE_ID)
+    if entry:
+        return entry
     # Defensive fallback to first bundled questionnaire when Cosmos returns empty.
-    return QUESTIONNAIRES[0]
+    return QUESTIONNAIRES[0], _content_hash(QUESTIONNAIRES[0])
+
+
+async def get_default_questionnaire() -> Questionnaire:
+    questionnaire, _ = await get_default_questionnaire_with_etag()
+    return questionnaire
+
 
+async def peek_default_questionnaire_etag() -> Optional[str]:
+    return await peek_questionnaire_etag(DEFAULT_QUESTIONNAIRE_ID)
 
-def create_questionnaire(payload: QuestionnaireCreate) -> Questionnaire:
-    if _use_memory_store():
-        if payload.id in _memory_store:
-            raise ValueError(f"Questionnaire with id '{payload.id}' already exists")
-        questionnaire = Questionnaire(**payload.model_dump())
-        _validate_questionnaire(questionnaire)
-        return _store_questionnaire_locally(questionnaire)
 
-    existing = cosmos_read_questionnaire(payload.id)
+async def create_questionnaire(payload: QuestionnaireCreate) -> Questionnaire:
+    backend = questionnaire_backend()
+    existing = await backend.read(payload.id)
     if existing:
         raise ValueError(f"Questionnaire with id '{payload.id}' already exists")
 
     questionnaire = Questionnaire(**payload.model_dump())
-    _validate_questionnaire(questionnaire)
-    cosmos_upsert_questionnaire(questionnaire.model_dump())
-    _store_questionnaire_locally(questionnaire)
+    validate_questionnaire(questionnaire)
+    await backend.upsert(_to_document(questionnaire))
+    _invalidate_cached(questionnaire.id)
     return questionnaire
 
 
-def update_questionnaire(questionnaire_id: str, updates: QuestionnaireUpdate) -> Optional[Questionnaire]:
-    stored = get_questionnaire(questionnaire_id)
-    if not stored:
+async def update_questionnaire_with_previous(
+    questionnaire_id: str,
+    updates: QuestionnaireUpdate,
+) -> Optional[Tuple[Questionnaire, Questionnaire]]:
+    """Apply ``updates`` and return (stored version it replaced, updated version)."""
+    backend = questionnaire_backend()
+    # Merge onto the stored document, not the cache: another replica may have edited it.
+    doc = await backend.read(questionnaire_id)
+    if not doc:
         return None
 
+    stored = _coerce_questionnaire_doc(doc)
     update_data = updates.model_dump(exclude_unset=True, exclude_none=True)
     merged_data = {**stored.model_dump(), **update_data}
     updated = Questionnaire(**merged_data)
-    _validate_questionnaire(updated)
+    validate_questionnaire(updated)
 
-    if _use_memory_store():
-        return _store_questionnaire_locally(updated)
+    await backend.upsert(_to_document(updated))
+    _invalidate_cached(questionnaire_id)
+    return stored, updated
 
-    cosmos_upsert_questionnaire(updated.model_dump())
-    _store_questionnaire_locally(updated)
-    return updated
 
+async def update_questionnaire(questionnaire_id: str, updates: QuestionnaireUpdate) -> Optional[Questionnaire]:
+    entry = await update_questionnaire_with_previous(questionnaire_id, updates)
+    return entry[1] if entry else None
 
-def delete_questionnaire(questionnaire_id: str) -> bool:
-    if _use_memory_store():
-        return _memory_store.pop(questionnaire_id, None) is not None
 
-    deleted = cosmos_delete_questionnaire(questionnaire_id)
-    _memory_store.pop(questionnaire_id, None)
+async def delete_questionnaire(questionnaire_id: str) -> bool:
+    deleted = await questionnaire_backend().delete(questionnaire_id)
+    _invalidate_cached(questionnaire_id)
     return bool(deleted)
@@ -0,0 +1,199 @@
+"""Re-grade stored answers after a test questionnaire's right answers change.
+
+Answers are streamed in batches. Each batch is graded column by column: for
+every question, the normalized values of all answers in the batch are tested
+against the set of accepted answers in one vectorized membership test
+(``numpy.isin`` when NumPy is installed, a set lookup otherwise). Only answers
+whose ``correct`` flag or stored ``rightAnswer`` changes are written back, as
+partial updates with a bounded number in flight.
+"""
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+try:
+    from backend.models import AnswerDetail, Questionnaire, RegradeStatus, RightAnswer, StoredAnswers
+    from backend.storage import iter_all_answers, patch_answers
+except ImportError:  # Allow fallback execution without package context
+    import sys
+
+    sys.path.append(str(Path(__file__).resolve().parent))
+    from models import AnswerDetail, Questionnaire, RegradeStatus, RightAnswer, StoredAnswers
+    from storage import iter_all_answers, patch_answers
+
+
+logger = logging.getLogger(__name__)
+
+
+class RegradeInProgressError(RuntimeError):
+    """Raised when a re-grade of the same questionnaire is already running."""
+
+
+def _normalize(value: str) -> str:
+    # Same comparison the client uses when grading: trimmed and case-insensitive.
+    return value.strip().lower()
+
+
+def accepted_answers(right_answer: Optional[RightAnswer]) -> Set[str]:
+    """Normalized set of accepted answers; a list-valued rightAnswer accepts any member."""
+    if right_answer is None:
+        return set()
+    candidates = [right_answer] if isinstance(right_answer, str) else right_answer
+    return {_normalize(candidate) for candidate in candidates if isinstance(candidate, str) and candidate.strip()}
+
+
+def _matches(values: Sequence[str], accepted: Set[str]) -> List[bool]:
+    if np is not None:
+        return np.isin(np.asarray(values, dtype=str), np.asarray(sorted(accepted), dtype=str)).tolist()
+    return [value in accepted for value in values]
+
+
+def grade_batch(questionnaire: Questionnaire, batch: Sequence[StoredAnswers]) -> Dict[int, Dict[str, AnswerDetail]]:
+    """Return {batch index: {question id: regraded detail}} for the answers that change."""
+    changes: Dict[int, Dict[str, AnswerDetail]] = {}
+    for question in questionnaire.questions:
+        accepted = accepted_answers(question.rightAnswer)
+        if not accepted:
+            continue
+        rows: List[Tuple[int, AnswerDetail]] = [
+            (index, detail)
+            for index, stored in enumerate(batch)
+            if (detail := stored.answers.get(question.id)) is not None
+            and isinstance(detail.value, str)
+            and detail.value.strip()
+        ]
+        if not rows:
+            continue
+        matches = _matches([_normalize(detail.value) for _, detail in rows], accepted)
+        for (index, detail), match in zip(rows, matches):
+            correct = "yes" if match else "no"
+            if detail.correct == correct and detail.rightAnswer == question.rightAnswer:
+                continue
+            changes.setdefault(index, {})[question.id] = detail.model_copy(
+                update={"correct": correct, "rightAnswer": question.rightAnswer}
+            )
+    return changes
+
+
+class RegradeRunner:
+    """Runs at most one background re-grade per questionnaire and tracks its progress.
+
+    :meth:`schedule` queues a follow-up run when one is already in progress; only
+    the latest questionnaire is kept, and it starts as soon as the current run ends.
+    """
+
+    def __init__(self, batch_size: int = 500, concurrency: int = 8):
+        self._batch_size = max(1, batch_size)
+        self._concurrency = max(1, concurrency)
+        self._statuses: Dict[str, RegradeStatus] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._pending: Dict[str, Questionnaire] = {}
+        self._stopping = False
+
+    def status(self, questionnaire_id: str) -> Optional[RegradeStatus]:
+        return self._statuses.get(questionnaire_id)
+
+    def _running(self, questionnaire_id: str) -> bool:
+        task = self._tasks.get(questionnaire_id)
+        return task is not None and not task.done()
+
+    def start(self, questionnaire: Questionnaire) -> RegradeStatus:
+        if self._running(questionnaire.id):
+            raise RegradeInProgressError(f"A re-grade of '{questionnaire.id}' is already running")
+        return self._launch(questionnaire)
+
+    def schedule(self, questionnaire: Questionnaire) -> RegradeStatus:
+        """Start a re-grade now, or run one against ``questionnaire`` once the current one ends."""
+        if not self._running(questionnaire.id):
+            return self._launch(questionnaire)
+        # The running job grades against an older snapshot of the right answers.
+        self._pending[questionnaire.id] = questionnaire
+        logger.info("Re-grade of %s already running; queued another with the latest answers", questionnaire.id)
+        return self._statuses[questionnaire.id]
+
+    def _launch(self, questionnaire: Questionnaire) -> RegradeStatus:
+        now = time.time()
+        status = RegradeStatus(questionnaireId=questionnaire.id, status="running", startedAt=now, updatedAt=now)
+        self._statuses[questionnaire.id] = status
+        task = asyncio.create_task(self._run(questionnaire), name=f"regrade-{questionnaire.id}")
+        self._tasks[questionnaire.id] = task
+        task.add_done_callback(lambda done: self._finished(questionnaire.id, done))
+        return status
+
+    def _finished(self, questionnaire_id: str, task: asyncio.Task) -> None:
+        if self._tasks.get(questionnaire_id) is task:
+            del self._tasks[questionnaire_id]
+        pending = self._pending.pop(questionnaire_id, None)
+        if pending is not None and not self._stopping:
+            self._launch(pending)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._pending.clear()
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = {}
+        self._stopping = False
+
+    def _update(self, questionnaire_id: str, **changes) -> None:
+        current = self._statuses[questionnaire_id]
+        self._statuses[questionnaire_id] = current.model_copy(update={**changes, "updatedAt": time.time()})
+
+    async def _run(self, questionnaire: Questionnaire) -> None:
+        semaphore = asyncio.Semaphore(self._concurrency)
+        counts = {"scanned": 0, "changedDocuments": 0, "changedAnswers": 0, "failed": 0}
+        errors: List[str] = []
+
+        async def write(stored: StoredAnswers, regraded: Dict[str, AnswerDetail]) -> None:
+            async with semaphore:
+                try:
+                    await patch_answers(stored.userId, stored.questionnaireId, regraded)
+                except Exception as exc:  # pragma: no cover - defensive logging
+                    logger.warning("Re-grade write failed for %s/%s", stored.questionnaireId, stored.userId, exc_info=True)
+                    counts["failed"] += 1
+                    if len(errors) < 20:
+                        errors.append(f"{stored.userId}: {exc}")
+                    return
+            counts["changedDocuments"] += 1
+            counts["changedAnswers"] += len(regraded)
+
+        async def flush(batch: List[StoredAnswers]) -> None:
+            changes = grade_batch(questionnaire, batch)
+            await asyncio.gather(*(write(batch[index], regraded) for index, regraded in changes.items()))
+            counts["scanned"] += len(batch)
+            self._update(questionnaire.id, **counts, errors=list(errors))
+
+        try:
+            batch: List[StoredAnswers] = []
+            async for stored in iter_all_answers(questionnaire.id):
+                batch.append(stored)
+                if len(batch) >= self._batch_size:
+                    await flush(batch)
+                    batch = []
+            if batch:
+                await flush(batch)
+        except asyncio.CancelledError:
+            self._update(questionnaire.id, status="failed", errors=[*errors, "Re-grade cancelled during shutdown"])
+            raise
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logger.exception("Re-grade of %s failed", questionnaire.id)
+            self._update(questionnaire.id, status="failed", errors=[*errors, str(exc)])
+            return
+        self._update(questionnaire.id, status="failed" if counts["failed"] else "succeeded")
+        logger.info(
+            "Re-graded %s: scanned=%d changedDocuments=%d changedAnswers=%d failed=%d",
+            questionnaire.id,
+            counts["scanned"],
+            counts["changedDocuments"],
+            counts["changedAnswers"],
+            counts["failed"],
+        )
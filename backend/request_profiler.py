@@ -0,0 +1,286 @@
+"""On-demand profiling of individual API requests.
+
+:class:`ProfilingMiddleware` profiles a request when it carries a valid
+``X-Profile-Token`` header (``<expires>.<hmac>``, signed with ``PROFILE_SECRET``;
+see :func:`sign_token`) or is picked by ``PROFILE_SAMPLE_RATE``. Untriggered
+requests only pay a header lookup. One request is profiled at a time; others
+proceed unprofiled meanwhile.
+
+Two formats, chosen with ``X-Profile-Format`` or ``PROFILE_FORMAT``:
+
+* ``cprofile``: deterministic cProfile of the event-loop thread, saved as a
+  pstats file (``python -m pstats``, snakeviz). Coroutines of concurrent
+  requests on the loop are included; work in worker threads is not;
+* ``speedscope``: stacks of every thread sampled every
+  ``PROFILE_SAMPLE_INTERVAL_MS``, saved as a speedscope JSON file, so calls the
+  generator makes from the threadpool show up too.
+
+Profiles land in ``PROFILE_DIR``; the oldest are deleted once the directory
+exceeds ``PROFILE_MAX_BYTES``. The response names the file in ``X-Profile-Id``.
+"""
+import asyncio
+import cProfile
+import hashlib
+import hmac
+import json
+import logging
+import marshal
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "cprofile")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/profiles")
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", str(50 * 1024 * 1024)))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+
+FORMATS = {"cprofile": ".prof", "speedscope": ".speedscope.json"}
+_PROFILE_NAME = re.compile(r"^[\w.-]+$")
+# Innermost frames from these files mean a worker thread is parked, not working.
+_IDLE_FILES = ("threading.py", "queue.py")
+
+
+def sign_token(secret: str, ttl_seconds: int = 300, now: Optional[float] = None) -> str:
+    """Return an ``X-Profile-Token`` value valid for ``ttl_seconds``."""
+    expires = int((now if now is not None else time.time()) + ttl_seconds)
+    signature = hmac.new(secret.encode("utf-8"), str(expires).encode("ascii"), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify_token(secret: str, token: str, now: Optional[float] = None) -> bool:
+    expires, _, signature = token.partition(".")
+    if not secret or not expires.isdigit() or int(expires) < (now if now is not None else time.time()):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), expires.encode("ascii"), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class ProfileStore:
+    """Directory of saved profiles, trimmed oldest-first to ``max_bytes``."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def save(self, name: str, data: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary = self.directory / f".{name}.tmp"
+        temporary.write_bytes(data)
+        temporary.replace(self.directory / name)
+        self._trim()
+
+    def _entries(self) -> List[Tuple[Path, os.stat_result]]:
+        if not self.directory.is_dir():
+            return []
+        entries = []
+        for path in self.directory.iterdir():
+            if path.name.startswith(".") or not path.is_file():
+                continue
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                continue
+        return sorted(entries, key=lambda entry: entry[1].st_mtime, reverse=True)
+
+    def _trim(self) -> None:
+        total = 0
+        for path, stat in self._entries():
+            total += stat.st_size
+            if total > self.max_bytes:
+                path.unlink(missing_ok=True)
+
+    def list(self) -> List[Dict[str, object]]:
+        """Saved profiles, newest first."""
+        return [
+            {"name": path.name, "bytes": stat.st_size, "createdAt": stat.st_mtime}
+            for path, stat in self._entries()
+        ]
+
+    def path(self, name: str) -> Optional[Path]:
+        if not _PROFILE_NAME.match(name) or name.startswith("."):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+
+class _StackSampler(threading.Thread):
+    """Record the stack of every other thread each ``interval`` seconds."""
+
+    def __init__(self, interval: float, main_thread_id: int):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self.main_thread_id = main_thread_id
+        self.started = time.perf_counter()
+        self.samples: Dict[int, List[Tuple[float, Tuple[Tuple[str, str, int], ...]]]] = defaultdict(list)
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        previous = 0.0
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter() - self.started
+            # Each sample stands for the time since the last tick, idle threads' skipped ticks excluded.
+            elapsed, previous = now - previous, now
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if thread_id != self.main_thread_id and stack[0][1].endswith(_IDLE_FILES):
+                    continue
+                stack.reverse()
+                self.samples[thread_id].append((elapsed, tuple(stack)))
+
+    def stop(self) -> float:
+        self._stop_event.set()
+        self.join()
+        return time.perf_counter() - self.started
+
+    def speedscope(self, name: str, duration: float) -> dict:
+        frames: List[dict] = []
+        frame_index: Dict[Tuple[str, str, int], int] = {}
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        profiles = []
+        for thread_id, samples in self.samples.items():
+            stacks, weights = [], []
+            for elapsed, stack in samples:
+                indexes = []
+                for key in stack:
+                    if key not in frame_index:
+                        frame_index[key] = len(frames)
+                        frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                    indexes.append(frame_index[key])
+                stacks.append(indexes)
+                weights.append(round(elapsed * 1000, 3))
+            profiles.append({
+                "type": "sampled",
+                "name": thread_names.get(thread_id, f"thread {thread_id}"),
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(duration * 1000, 3),
+                "samples": stacks,
+                "weights": weights,
+            })
+        # The event-loop thread first, so speedscope opens on it.
+        profiles.sort(key=lambda profile: profile["name"] != thread_names.get(self.main_thread_id))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "request_profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+class ProfilingMiddleware:
+    """Profile triggered requests on ``path_prefix`` and save them to ``store``."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        secret: str = PROFILE_SECRET,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        default_format: str = PROFILE_FORMAT,
+        sample_interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS,
+        path_prefix: str = "/api",
+    ):
+        self.app = app
+        self.store = store
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.default_format = default_format if default_format in FORMATS else "cprofile"
+        self.sample_interval = sample_interval_ms / 1000
+        self.path_prefix = path_prefix
+        self._busy = False
+
+    def _requested_format(self, scope: Scope) -> Optional[str]:
+        """The profile format if this request should be profiled, else None."""
+        if self._busy or not scope["path"].startswith(self.path_prefix):
+            return None
+        if self.secret:
+            headers = Headers(scope=scope)
+            token = headers.get("x-profile-token")
+            if token is not None:
+                if verify_token(self.secret, token):
+                    requested = headers.get("x-profile-format", self.default_format)
+                    return requested if requested in FORMATS else self.default_format
+                logger.warning("Ignoring invalid or expired X-Profile-Token")
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.default_format
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not (self.secret or self.sample_rate > 0):
+            await self.app(scope, receive, send)
+            return
+        profile_format = self._requested_format(scope)
+        if profile_format is None:
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        slug = re.sub(r"[^\w]+", "-", scope["path"]).strip("-")[:60] or "root"
+        name = f"{stamp}-{random.getrandbits(24):06x}-{scope['method']}-{slug}{FORMATS[profile_format]}"
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", name.encode("ascii"))]
+            await send(message)
+
+        try:
+            if profile_format == "speedscope":
+                sampler = _StackSampler(self.sample_interval, threading.get_ident())
+                sampler.start()
+                try:
+                    await self.app(scope, receive, send_with_id)
+                finally:
+                    duration = sampler.stop()
+                    data = json.dumps(sampler.speedscope(f"{scope['method']} {scope['path']}", duration)).encode("utf-8")
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    await self.app(scope, receive, send_with_id)
+                finally:
+                    profiler.disable()
+                    data = _pstats_bytes(profiler)
+        finally:
+            self._busy = False
+        try:
+            await asyncio.to_thread(self.store.save, name, data)
+            logger.info("Saved %s profile %s (%d bytes)", profile_format, name, len(data))
+        except OSError:
+            logger.exception("Failed to save profile %s", name)
+
+
+def _pstats_bytes(profiler: cProfile.Profile) -> bytes:
+    # Profile.dump_stats only writes to a path; marshal the same structure instead.
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+
+if __name__ == "__main__":  # pragma: no cover - manual helper
+    if not PROFILE_SECRET:
+        sys.exit("PROFILE_SECRET is not set")
+    ttl = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    print(f"X-Profile-Token: {sign_token(PROFILE_SECRET, ttl)}")
@@ -0,0 +1,494 @@
+"""SQLite storage backend for deployments without Cosmos DB.
+
+Answers, their statistics counters and questionnaires live in one database
+file opened in WAL mode, so readers never wait for the writer and every worker
+process on the host sees the same data. Each answers row carries a write
+sequence that stands in for Cosmos' ``_ts``: listings walk the ``seq`` and
+``(questionnaire_id, seq)`` indexes newest-first and page by key rather than
+by offset, and counts are answered from the primary key alone. Writes run in
+``BEGIN IMMEDIATE`` transactions, so the previous answers returned by a save
+are exactly what it replaced, even with several processes writing.
+Questionnaire writes bump a generation counter through triggers, so each
+process can tell when its questionnaire cache went stale, and background
+upload jobs are kept here too, so any worker can report on them.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional, Tuple, TypeVar
+
+try:
+    from backend.jobs import TERMINAL_STATUSES, JobStore
+    from backend.models import StoredAnswers, UploadJobStatus
+    from backend.storage_backend import Answers, AnswersBackend, PreviousAnswers, QuestionnaireBackend
+except ImportError:  # Allow fallback execution without package context
+    import sys
+
+    sys.path.append(str(Path(__file__).resolve().parent))
+    from jobs import TERMINAL_STATUSES, JobStore
+    from models import StoredAnswers, UploadJobStatus
+    from storage_backend import Answers, AnswersBackend, PreviousAnswers, QuestionnaireBackend
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    questionnaire_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    answers TEXT NOT NULL,
+    PRIMARY KEY (questionnaire_id, user_id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS answers_seq ON answers (seq);
+CREATE INDEX IF NOT EXISTS answers_questionnaire_seq ON answers (questionnaire_id, seq);
+CREATE TABLE IF NOT EXISTS answer_stats (
+    questionnaire_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (questionnaire_id, key)
+);
+CREATE TABLE IF NOT EXISTS questionnaires (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    type TEXT NOT NULL,
+    question_count INTEGER NOT NULL,
+    content_hash TEXT,
+    version INTEGER NOT NULL,
+    document TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS questionnaire_generation (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO questionnaire_generation (id, value) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS questionnaires_inserted AFTER INSERT ON questionnaires
+BEGIN UPDATE questionnaire_generation SET value = value + 1; END;
+CREATE TRIGGER IF NOT EXISTS questionnaires_updated AFTER UPDATE ON questionnaires
+BEGIN UPDATE questionnaire_generation SET value = value + 1; END;
+CREATE TRIGGER IF NOT EXISTS questionnaires_deleted AFTER DELETE ON questionnaires
+BEGIN UPDATE questionnaire_generation SET value = value + 1; END;
+CREATE TABLE IF NOT EXISTS upload_jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS upload_jobs_status_updated ON upload_jobs (status, updated_at);
+"""
+
+# Rows fetched per query while streaming answers.
+_ITER_PAGE_SIZE = 500
+
+
+def _dumps(value: object) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+@contextmanager
+def _transaction(connection: sqlite3.Connection) -> Iterator[None]:
+    # IMMEDIATE takes the write lock up front, so a read-then-write cannot be
+    # interleaved with another process' write to the same rows.
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+class SqliteDatabase:
+    """One lazily opened WAL-mode connection; calls run in worker threads, one at a time."""
+
+    def __init__(self, path: str, busy_timeout_seconds: float = 5.0):
+        self._path = path
+        self._busy_timeout_seconds = busy_timeout_seconds
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit mode: transactions are opened explicitly by _transaction.
+            connection = sqlite3.connect(
+                self._path,
+                check_same_thread=False,
+                timeout=self._busy_timeout_seconds,
+                isolation_level=None,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+            logger.info("SQLite storage opened at %s", self._path)
+        return self._connection
+
+    def _call(self, operation: Callable[[sqlite3.Connection], T]) -> T:
+        with self._lock:
+            return operation(self._connect())
+
+    async def run(self, operation: Callable[[sqlite3.Connection], T]) -> T:
+        return await asyncio.to_thread(self._call, operation)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def _stored(row: Tuple[str, str, str]) -> StoredAnswers:
+    questionnaire_id, user_id, answers = row
+    return StoredAnswers(userId=user_id, questionnaireId=questionnaire_id, answers=json.loads(answers))
+
+
+def _write_answers(
+    connection: sqlite3.Connection,
+    user_id: str,
+    questionnaire_id: str,
+    answers: Answers,
+    merge: bool = False,
+) -> Tuple[Answers, Optional[Answers]]:
+    """Upsert one row inside the caller's transaction; returns (stored answers, previous answers)."""
+    row = connection.execute(
+        "SELECT answers FROM answers WHERE questionnaire_id = ? AND user_id = ?",
+        (questionnaire_id, user_id),
+    ).fetchone()
+    previous = json.loads(row[0]) if row else None
+    stored = {**previous, **answers} if merge and previous is not None else answers
+    connection.execute(
+        "INSERT INTO answers (questionnaire_id, user_id, seq, answers) "
+        "VALUES (?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM answers), ?) "
+        "ON CONFLICT (questionnaire_id, user_id) DO UPDATE SET seq = excluded.seq, answers = excluded.answers",
+        (questionnaire_id, user_id, _dumps(stored)),
+    )
+    return stored, previous
+
+
+class SqliteAnswersBackend(AnswersBackend):
+    """Answers and statistics counters in SQLite; counts are answered from the indexes."""
+
+    name = "sqlite"
+
+    def __init__(self, database: SqliteDatabase):
+        self._database = database
+
+    async def get(self, user_id: str, questionnaire_id: str) -> Optional[StoredAnswers]:
+        row = await self._database.run(lambda connection: connection.execute(
+            "SELECT questionnaire_id, user_id, answers FROM answers WHERE questionnaire_id = ? AND user_id = ?",
+            (questionnaire_id, user_id),
+        ).fetchone())
+        return _stored(row) if row else None
+
+    async def _write(
+        self,
+        user_id: str,
+        questionnaire_id: str,
+        answers: Answers,
+        merge: bool,
+    ) -> Tuple[StoredAnswers, PreviousAnswers]:
+        def write(connection: sqlite3.Connection) -> Tuple[Answers, Optional[Answers]]:
+            with _transaction(connection):
+                return _write_answers(connection, user_id, questionnaire_id, answers, merge)
+
+        stored, previous = await self._database.run(write)
+        return StoredAnswers(userId=user_id, questionnaireId=questionnaire_id, answers=stored), previous
+
+    async def save(self, user_id: str, questionnaire_id: str, answers: Answers) -> Tuple[StoredAnswers, PreviousAnswers]:
+        return await self._write(user_id, questionnaire_id, answers, merge=False)
+
+    async def patch(self, user_id: str, questionnaire_id: str, answers: Answers) -> Tuple[StoredAnswers, PreviousAnswers]:
+        return await self._write(user_id, questionnaire_id, answers, merge=True)
+
+    async def save_many(self, user_id: str, entries: List[Tuple[str, Answers]]) -> List[Tuple[Optional[str], PreviousAnswers]]:
+        # One transaction per user group: a single fsync instead of one per document.
+        def write(connection: sqlite3.Connection) -> List[Tuple[Optional[str], PreviousAnswers]]:
+            with _transaction(connection):
+                return [
+                    (None, _write_answers(connection, user_id, questionnaire_id, answers)[1])
+                    for questionnaire_id, answers in entries
+                ]
+
+        try:
+            return await self._database.run(write)
+        except sqlite3.Error as exc:
+            logger.warning("SQLite batch write for user %s failed", user_id, exc_info=True)
+            return [(f"Batch failed: {exc}", None)] * len(entries)
+
+    async def delete(self, user_id: str, questionnaire_id: str) -> Optional[StoredAnswers]:
+        def delete(connection: sqlite3.Connection) -> Optional[Tuple[str, str, str]]:
+            with _transaction(connection):
+                row = connection.execute(
+                    "SELECT questionnaire_id, user_id, answers FROM answers WHERE questionnaire_id = ? AND user_id = ?",
+                    (questionnaire_id, user_id),
+                ).fetchone()
+                if row is not None:
+                    connection.execute(
+                        "DELETE FROM answers WHERE questionnaire_id = ? AND user_id = ?",
+                        (questionnaire_id, user_id),
+                    )
+                return row
+
+        row = await self._database.run(delete)
+        return _stored(row) if row else None
+
+    async def list_offset(self, limit: int, offset: int) -> Tuple[List[StoredAnswers], int]:
+        def read(connection: sqlite3.Connection) -> Tuple[List[Tuple[str, str, str]], int]:
+            rows = connection.execute(
+                "SELECT questionnaire_id, user_id, answers FROM answers ORDER BY seq DESC LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+            return rows, connection.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+        rows, total = await self._database.run(read)
+        return [_stored(row) for row in rows], total
+
+    async def list_page(
+        self,
+        limit: int,
+        state: Dict[str, object],
+    ) -> Tuple[List[StoredAnswers], Optional[Dict[str, object]], int]:
+        # Cursors hold the sequence of the last row returned; the next page is a
+        # range scan of the seq index below it.
+        if state and not isinstance(state.get("s"), int):
+            raise ValueError("Invalid cursor")
+        before = state.get("s")
+
+        def read(connection: sqlite3.Connection) -> Tuple[List[Tuple[int, str, str, str]], int]:
+            if before is None:
+                rows = connection.execute(
+                    "SELECT seq, questionnaire_id, user_id, answers FROM answers ORDER BY seq DESC LIMIT ?",
+                    (limit + 1,),
+                ).fetchall()
+            else:
+                rows = connection.execute(
+                    "SELECT seq, questionnaire_id, user_id, answers FROM answers WHERE seq < ? ORDER BY seq DESC LIMIT ?",
+                    (before, limit + 1),
+                ).fetchall()
+            return rows, connection.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+        rows, total = await self._database.run(read)
+        page = rows[:limit]
+        next_state = {"s": page[-1][0]} if len(rows) > limit and page else None
+        return [_stored(row[1:]) for row in page], next_state, total
+
+    async def iter(self, questionnaire_id: Optional[str] = None) -> AsyncIterator[StoredAnswers]:
+        # Keyset pages newest-first; only one page is held at a time and no read
+        # transaction stays open while the caller processes it.
+        before: Optional[int] = None
+        while True:
+            clauses, parameters = [], []
+            if questionnaire_id is not None:
+                clauses.append("questionnaire_id = ?")
+                parameters.append(questionnaire_id)
+            if before is not None:
+                clauses.append("seq < ?")
+                parameters.append(before)
+            where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+            query = f"SELECT seq, questionnaire_id, user_id, answers FROM answers {where}ORDER BY seq DESC LIMIT ?"
+            rows = await self._database.run(
+                lambda connection: connection.execute(query, (*parameters, _ITER_PAGE_SIZE)).fetchall()
+            )
+            for row in rows:
+                yield _stored(row[1:])
+            if len(rows) < _ITER_PAGE_SIZE:
+                return
+            before = rows[-1][0]
+
+    async def counts(self) -> Dict[str, object]:
+        rows = await self._database.run(lambda connection: connection.execute(
+            "SELECT questionnaire_id, COUNT(*) FROM answers GROUP BY questionnaire_id"
+        ).fetchall())
+        by_questionnaire = {questionnaire_id: count for questionnaire_id, count in rows}
+        return {"total": sum(by_questionnaire.values()), "byQuestionnaire": by_questionnaire}
+
+    async def rebuild_counts(self) -> Dict[str, object]:
+        # Counted from the primary key index on every read, so there is nothing to drift.
+        return await self.counts()
+
+    async def read_stats(self, questionnaire_id: str) -> Optional[Dict[str, int]]:
+        # Counters are created with the database and adjusted on every write, so a
+        # questionnaire without rows simply has no answers yet.
+        rows = await self._database.run(lambda connection: connection.execute(
+            "SELECT key, count FROM answer_stats WHERE questionnaire_id = ?",
+            (questionnaire_id,),
+        ).fetchall())
+        return {key: count for key, count in rows}
+
+    async def adjust_stats(self, questionnaire_id: str, delta: Mapping[str, int]) -> None:
+        def adjust(connection: sqlite3.Connection) -> None:
+            with _transaction(connection):
+                connection.executemany(
+                    "INSERT INTO answer_stats (questionnaire_id, key, count) VALUES (?, ?, ?) "
+                    "ON CONFLICT (questionnaire_id, key) DO UPDATE SET count = count + excluded.count",
+                    [(questionnaire_id, key, count) for key, count in delta.items()],
+                )
+                connection.execute(
+                    "DELETE FROM answer_stats WHERE questionnaire_id = ? AND count = 0",
+                    (questionnaire_id,),
+                )
+
+        await self._database.run(adjust)
+
+    async def write_stats(self, questionnaire_id: str, counters: Mapping[str, int]) -> None:
+        def write(connection: sqlite3.Connection) -> None:
+            with _transaction(connection):
+                connection.execute("DELETE FROM answer_stats WHERE questionnaire_id = ?", (questionnaire_id,))
+                connection.executemany(
+                    "INSERT INTO answer_stats (questionnaire_id, key, count) VALUES (?, ?, ?)",
+                    [(questionnaire_id, key, count) for key, count in counters.items() if count],
+                )
+
+        await self._database.run(write)
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._database.close)
+
+
+class SqliteQuestionnaireBackend(QuestionnaireBackend):
+    """Questionnaires in SQLite, with the catalog fields in columns so summaries skip the documents."""
+
+    name = "sqlite"
+
+    def __init__(self, database: SqliteDatabase):
+        self._database = database
+
+    async def list(self) -> List[Dict[str, object]]:
+        rows = await self._database.run(lambda connection: connection.execute(
+            "SELECT document FROM questionnaires ORDER BY rowid"
+        ).fetchall())
+        return [json.loads(document) for document, in rows]
+
+    async def list_summaries(self) -> List[Dict[str, object]]:
+        rows = await self._database.run(lambda connection: connection.execute(
+            "SELECT id, title, description, type, question_count, content_hash, version "
+            "FROM questionnaires ORDER BY rowid"
+        ).fetchall())
+        return [
+            {
+                "id": questionnaire_id,
+                "title": title,
+                "description": description,
+                "type": questionnaire_type,
+                "questionCount": question_count,
+                "contentHash": content_hash,
+                "_etag": str(version),
+            }
+            for questionnaire_id, title, description, questionnaire_type, question_count, content_hash, version in rows
+        ]
+
+    async def read(self, questionnaire_id: str) -> Optional[Dict[str, object]]:
+        row = await self._database.run(lambda connection: connection.execute(
+            "SELECT document FROM questionnaires WHERE id = ?",
+            (questionnaire_id,),
+        ).fetchone())
+        return json.loads(row[0]) if row else None
+
+    async def upsert(self, document: Dict[str, object]) -> None:
+        values = (
+            document["id"],
+            document.get("title") or "",
+            document.get("description"),
+            document.get("type") or document.get("questionnaireType") or "question",
+            len(document.get("questions") or []),
+            document.get("contentHash"),
+            _dumps(document),
+        )
+        await self._database.run(lambda connection: connection.execute(
+            "INSERT INTO questionnaires (id, title, description, type, question_count, content_hash, version, document) "
+            "VALUES (?, ?, ?, ?, ?, ?, 1, ?) "
+            "ON CONFLICT (id) DO UPDATE SET title = excluded.title, description = excluded.description, "
+            "type = excluded.type, question_count = excluded.question_count, "
+            "content_hash = excluded.content_hash, version = questionnaires.version + 1, document = excluded.document",
+            values,
+        ))
+
+    async def delete(self, questionnaire_id: str) -> bool:
+        deleted = await self._database.run(lambda connection: connection.execute(
+            "DELETE FROM questionnaires WHERE id = ?",
+            (questionnaire_id,),
+        ).rowcount)
+        return deleted > 0
+
+    async def generation(self) -> Optional[int]:
+        # Bumped by triggers on every questionnaire write, whichever process made it.
+        row = await self._database.run(lambda connection: connection.execute(
+            "SELECT value FROM questionnaire_generation WHERE id = 0"
+        ).fetchone())
+        return row[0] if row else None
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._database.close)
+
+
+class SqliteJobStore(JobStore):
+    """Upload jobs in SQLite, so any worker can report a job another worker runs.
+
+    Finished jobs are pruned after ``ttl_seconds``, oldest first once more than
+    ``max_jobs`` are stored, as in :class:`jobs.InMemoryJobStore`.
+    """
+
+    def __init__(self, database: SqliteDatabase, ttl_seconds: float = 3600.0, max_jobs: int = 1000):
+        self._database = database
+        self._ttl_seconds = ttl_seconds
+        self._max_jobs = max_jobs
+
+    async def create(self, job: UploadJobStatus) -> UploadJobStatus:
+        terminal = sorted(TERMINAL_STATUSES)
+        placeholders = ", ".join("?" for _ in terminal)
+
+        def create(connection: sqlite3.Connection) -> None:
+            with _transaction(connection):
+                connection.execute(
+                    f"DELETE FROM upload_jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                    (*terminal, time.time() - self._ttl_seconds),
+                )
+                (stored,) = connection.execute("SELECT COUNT(*) FROM upload_jobs").fetchone()
+                if stored >= self._max_jobs:
+                    connection.execute(
+                        f"DELETE FROM upload_jobs WHERE job_id IN (SELECT job_id FROM upload_jobs "
+                        f"WHERE status IN ({placeholders}) ORDER BY updated_at LIMIT ?)",
+                        (*terminal, stored - self._max_jobs + 1),
+                    )
+                connection.execute(
+                    "INSERT OR REPLACE INTO upload_jobs (job_id, status, updated_at, document) VALUES (?, ?, ?, ?)",
+                    (job.jobId, job.status, job.updatedAt, job.model_dump_json()),
+                )
+
+        await self._database.run(create)
+        return job
+
+    async def get(self, job_id: str) -> Optional[UploadJobStatus]:
+        row = await self._database.run(lambda connection: connection.execute(
+            "SELECT document FROM upload_jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone())
+        return UploadJobStatus.model_validate_json(row[0]) if row else None
+
+    async def update(self, job_id: str, **changes) -> Optional[UploadJobStatus]:
+        def update(connection: sqlite3.Connection) -> Optional[UploadJobStatus]:
+            with _transaction(connection):
+                row = connection.execute(
+                    "SELECT document FROM upload_jobs WHERE job_id = ?",
+                    (job_id,),
+                ).fetchone()
+                if row is None:
+                    return None
+                job = UploadJobStatus.model_validate_json(row[0])
+                updated = job.model_copy(update={**changes, "updatedAt": time.time()})
+                connection.execute(
+                    "UPDATE upload_jobs SET status = ?, updated_at = ?, document = ? WHERE job_id = ?",
+                    (updated.status, updated.updatedAt, updated.model_dump_json(), job_id),
+                )
+                return updated
+
+        return await self._database.run(update)
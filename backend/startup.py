@@ -0,0 +1,124 @@
+"""Startup phase timing, readiness and the optional background initialization.
+
+:class:`StartupReport` times each phase of application startup (module imports,
+storage initialization with its sub-steps, seeding) and backs ``/ready``. With
+``STARTUP_BACKGROUND_INIT`` enabled the lifespan hands initialization to a
+background task and accepts connections at once; :class:`ReadinessGateMiddleware`
+holds API requests until it has finished (up to ``STARTUP_READY_TIMEOUT_SECONDS``,
+then 503), so nothing is served from or written to the fallback store meanwhile.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+logger = logging.getLogger(__name__)
+
+STARTUP_BACKGROUND_INIT = os.getenv("STARTUP_BACKGROUND_INIT", "0") in {"1", "true", "True"}
+STARTUP_READY_TIMEOUT_SECONDS = float(os.getenv("STARTUP_READY_TIMEOUT_SECONDS", "10"))
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+class StartupReport:
+    """Milliseconds per startup phase plus the readiness status.
+
+    The status is ``idle`` until :meth:`begin`, ``starting`` until :meth:`finish`,
+    then ``ready`` or ``failed``.
+    """
+
+    def __init__(self):
+        self.status = "idle"
+        self.phases: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.total_ms: Optional[float] = None
+        self._started = time.perf_counter()
+        self._finished: Optional[asyncio.Event] = None
+
+    def begin(self) -> None:
+        self.status = "starting"
+        self.phases = {}
+        self.error = None
+        self.total_ms = None
+        self._started = time.perf_counter()
+        self._finished = asyncio.Event()
+
+    def record(self, name: str, milliseconds: float) -> None:
+        self.phases[name] = round(milliseconds, 1)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Dict[str, float]]:
+        """Time a block; steps the block records into the yielded dict become ``name.step``."""
+        steps: Dict[str, float] = {}
+        started = time.perf_counter()
+        try:
+            yield steps
+        finally:
+            self.phases[name] = _elapsed_ms(started)
+            for step, milliseconds in steps.items():
+                self.phases[f"{name}.{step}"] = milliseconds
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.total_ms = _elapsed_ms(self._started)
+        self.status = "failed" if error else "ready"
+        self.error = str(error) if error else None
+        if self._finished is not None:
+            self._finished.set()
+        logger.info("Startup %s in %.1f ms: %s", self.status, self.total_ms, self.phases)
+
+    async def wait(self, timeout_seconds: float) -> bool:
+        """Wait until startup has finished; False when ``timeout_seconds`` passed first."""
+        if self.status != "starting" or self._finished is None:
+            return True
+        try:
+            await asyncio.wait_for(self._finished.wait(), timeout_seconds)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "status": self.status,
+            "totalMs": self.total_ms,
+            "phases": dict(self.phases),
+            "error": self.error,
+        }
+
+
+class ReadinessGateMiddleware:
+    """Hold requests on ``path_prefix`` while startup is still running in the background."""
+
+    def __init__(self, app: ASGIApp, report: StartupReport, timeout_seconds: float, path_prefix: str = "/api"):
+        self.app = app
+        self.report = report
+        self.timeout_seconds = timeout_seconds
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] == "http"
+            and self.report.status == "starting"
+            and scope["path"].startswith(self.path_prefix)
+            and not await self.report.wait(self.timeout_seconds)
+        ):
+            body = json.dumps({"detail": "Service is starting; retry shortly"}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    (b"retry-after", b"1"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        await self.app(scope, receive, send)
@@ -1,26 +1,73 @@
+import asyncio
+import base64
+import binascii
+import json
+import os
+from collections import Counter
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Mapping, Optional, Tuple
 
 try:
-    from backend import cosmos
-    from backend.models import StoredAnswers, AnswerDetail
+    from backend import cosmos_aio as cosmos
+    from backend.answer_stats import answer_contributions, answer_delta, build_stats, question_types_of
+    from backend.models import QuestionnaireStats, StoredAnswers, AnswerDetail
+    from backend.questionnaire_store import clear_cache as clear_questionnaire_cache, get_questionnaire, list_questionnaires
+    from backend.storage_backend import answers_backend, close_local_backends
 except ImportError:  # Allow fallback execution without package context
     import sys
 
     sys.path.append(str(Path(__file__).resolve().parent))
-    import cosmos
-    from models import StoredAnswers, AnswerDetail
+    import cosmos_aio as cosmos
+    from answer_stats import answer_contributions, answer_delta, build_stats, question_types_of
+    from models import QuestionnaireStats, StoredAnswers, AnswerDetail
+    from questionnaire_store import clear_cache as clear_questionnaire_cache, get_questionnaire, list_questionnaires
+    from storage_backend import answers_backend, close_local_backends
 
-# In-memory fallback store keyed by "{questionnaire_id}:{user_id}"
-_answers_store: Dict[str, StoredAnswers] = {}
+# Partitions written concurrently by save_answers_bulk.
+_BULK_CONCURRENCY = int(os.getenv("BULK_ANSWERS_CONCURRENCY", "8"))
 
 
-def _answer_key(user_id: str, questionnaire_id: str) -> str:
-    return f"{questionnaire_id}:{user_id}"
+def _encode_cursor(state: Dict[str, object]) -> str:
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
 
 
-def init_storage():
-    cosmos.init_cosmos()
+def _decode_cursor(cursor: str) -> Dict[str, object]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, ValueError, UnicodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(state, dict):
+        raise ValueError("Invalid cursor")
+    return state
+
+
+async def init_storage(timings: Optional[Dict[str, float]] = None) -> bool:
+    connected = await cosmos.init_cosmos(timings)
+    if connected:
+        # Questionnaires cached from the local fallback must not outlive the switch to Cosmos.
+        clear_questionnaire_cache()
+    return connected
+
+
+async def close_storage() -> None:
+    await cosmos.close_cosmos()
+    await close_local_backends()
+
+
+def storage_available() -> bool:
+    return cosmos.cosmos_available()
+
+
+def storage_backend_name() -> str:
+    """Name of the backend currently serving answers: cosmos, sqlite or memory."""
+    return answers_backend().name
+
+
+def storage_resilience_stats() -> Dict[str, object]:
+    """Circuit breaker state and throttling counters of the Cosmos resilience layer."""
+    return cosmos.resilience_stats()
 
 
 def _serialize_answers(answers: Dict[str, AnswerDetail]) -> Dict[str, Dict[str, object]]:
@@ -35,68 +82,168 @@ def _serialize_answers(answers: Dict[str, AnswerDetail]) -> Dict[str, Dict[str,
     return serialized
 
 
-def save_answers(user_id: str, questionnaire_id: str, answers: Dict[str, AnswerDetail]) -> StoredAnswers:
-    # Try cosmos first
-    doc = cosmos.upsert_answers(user_id, questionnaire_id, _serialize_answers(answers))
-    if doc:
-        return StoredAnswers(
-            userId=user_id,
-            questionnaireId=questionnaire_id,
-            answers=doc["answers"],
-        )
-    # Fallback to memory
-    key = _answer_key(user_id, questionnaire_id)
-    stored = StoredAnswers(userId=user_id, questionnaireId=questionnaire_id, answers=answers)
-    _answers_store[key] = stored
+async def _record_stats(
+    questionnaire_id: str,
+    previous: Optional[Mapping[str, object]],
+    current: Optional[Mapping[str, object]],
+) -> None:
+    """Apply the statistics delta of replacing ``previous`` with ``current`` (None = absent).
+
+    Never rebuilds: a full recount is a scan and belongs to
+    ``POST /api/responses/stats/rebuild``, not the write path.
+    """
+    delta = answer_delta(previous, current, question_types_of(await get_questionnaire(questionnaire_id)))
+    if delta:
+        await answers_backend().adjust_stats(questionnaire_id, delta)
+
+
+async def save_answers(user_id: str, questionnaire_id: str, answers: Dict[str, AnswerDetail]) -> StoredAnswers:
+    stored, previous = await answers_backend().save(user_id, questionnaire_id, _serialize_answers(answers))
+    await _record_stats(questionnaire_id, previous, stored.answers)
     return stored
 
 
-def get_answers(user_id: str, questionnaire_id: str) -> Optional[StoredAnswers]:
-    doc = cosmos.read_answers(user_id, questionnaire_id)
-    if doc:
-        return StoredAnswers(
-            userId=user_id,
-            questionnaireId=questionnaire_id,
-            answers=doc["answers"],
-        )
-    key = _answer_key(user_id, questionnaire_id)
-    return _answers_store.get(key)
+async def patch_answers(user_id: str, questionnaire_id: str, answers: Dict[str, AnswerDetail]) -> StoredAnswers:
+    """Merge changed answer entries into the stored document and return the result."""
+    stored, previous = await answers_backend().patch(user_id, questionnaire_id, _serialize_answers(answers))
+    await _record_stats(questionnaire_id, previous, stored.answers)
+    return stored
+
 
+async def save_answers_bulk(
+    items: List[Tuple[str, str, Dict[str, AnswerDetail]]],
+) -> List[Optional[str]]:
+    """Store many (user_id, questionnaire_id, answers) entries.
 
-def list_all_answers(limit: int = 100, offset: int = 0) -> Tuple[List[StoredAnswers], int]:
+    Entries are grouped by user (the Cosmos partition key) and written with one
+    batch per group, with a bounded number of groups in flight. Later duplicates
+    of the same (user, questionnaire) win. Returns an error message per input
+    index, or None for stored entries.
+    """
+    backend = answers_backend()
+    # user_id -> questionnaire_id -> (answers, input indexes)
+    groups: Dict[str, Dict[str, Tuple[Dict[str, AnswerDetail], List[int]]]] = {}
+    for index, (user_id, questionnaire_id, answers) in enumerate(items):
+        per_user = groups.setdefault(user_id, {})
+        indexes = per_user[questionnaire_id][1] if questionnaire_id in per_user else []
+        indexes.append(index)
+        per_user[questionnaire_id] = (answers, indexes)
+
+    results: List[Optional[str]] = [None] * len(items)
+    semaphore = asyncio.Semaphore(_BULK_CONCURRENCY)
+
+    async def write_group(user_id: str, per_user: Dict[str, Tuple[Dict[str, AnswerDetail], List[int]]]) -> None:
+        entries = [
+            (questionnaire_id, _serialize_answers(answers))
+            for questionnaire_id, (answers, _) in per_user.items()
+        ]
+        async with semaphore:
+            outcomes = await backend.save_many(user_id, entries)
+        for (_, indexes), (error, _) in zip(per_user.values(), outcomes):
+            for index in indexes:
+                results[index] = error
+        for (questionnaire_id, answers), (error, previous) in zip(entries, outcomes):
+            if error is None:
+                await _record_stats(questionnaire_id, previous, answers)
+
+    await asyncio.gather(*(write_group(user_id, per_user) for user_id, per_user in groups.items()))
+    return results
+
+
+async def get_answers(user_id: str, questionnaire_id: str) -> Optional[StoredAnswers]:
+    return await answers_backend().get(user_id, questionnaire_id)
+
+
+async def list_all_answers(limit: int = 100, offset: int = 0) -> Tuple[List[StoredAnswers], int]:
     """List all answers with pagination support.
     
     Returns a tuple of (items, total_count).
     """
-    docs, total = cosmos.list_answers(limit=limit, offset=offset)
-    if docs is not None:
-        return [
-            StoredAnswers(
-                userId=doc.get("userId", ""),
-                questionnaireId=doc.get("questionnaireId", ""),
-                answers=doc.get("answers", {}),
-            )
-            for doc in docs
-        ], total
-    
-    # Fallback to in-memory store
-    all_items = list(_answers_store.values())
-    total = len(all_items)
-    return all_items[offset:offset + limit], total
+    return await answers_backend().list_offset(limit, offset)
 
 
-def delete_stored_answers(user_id: str, questionnaire_id: str) -> bool:
+async def list_answers_page(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[StoredAnswers], Optional[str], int]:
+    """List answers newest-first using an opaque cursor.
+
+    Returns a tuple of (items, next_cursor, total_count); ``next_cursor`` is None on
+    the last page. Raises ValueError for a malformed or foreign cursor.
+    """
+    state = _decode_cursor(cursor) if cursor else {}
+    items, next_state, total = await answers_backend().list_page(limit, state)
+    return items, _encode_cursor(next_state) if next_state else None, total
+
+
+async def iter_all_answers(questionnaire_id: Optional[str] = None) -> AsyncIterator[StoredAnswers]:
+    """Stream stored answers one by one, optionally for a single questionnaire."""
+    async for stored in answers_backend().iter(questionnaire_id):
+        yield stored
+
+
+async def get_answer_counts() -> Dict[str, object]:
+    """Return the total and per-questionnaire number of stored answers.
+
+    Served from maintained counters or indexes, never from a document scan.
+    """
+    return await answers_backend().counts()
+
+
+async def rebuild_answer_counts() -> Dict[str, object]:
+    """Recompute the counters exactly (recovery after drift)."""
+    return await answers_backend().rebuild_counts()
+
+
+async def delete_stored_answers(user_id: str, questionnaire_id: str) -> bool:
     """Delete an answers document.
     
     Returns True if deleted successfully, False otherwise.
     """
-    deleted = cosmos.delete_answers(user_id, questionnaire_id)
-    if deleted:
-        return True
-    
-    # Try in-memory fallback
-    key = _answer_key(user_id, questionnaire_id)
-    if key in _answers_store:
-        del _answers_store[key]
-        return True
-    return False
+    deleted = await answers_backend().delete(user_id, questionnaire_id)
+    if deleted is None:
+        return False
+    await _record_stats(questionnaire_id, deleted.answers, None)
+    return True
+
+
+async def get_answer_stats(questionnaire_id: str) -> Optional[QuestionnaireStats]:
+    """Return per-question statistics from the maintained counters, or None for an unknown questionnaire.
+
+    Counters that were never written read as zeros; answers stored before they
+    existed are only counted after ``POST /api/responses/stats/rebuild``.
+    """
+    questionnaire = await get_questionnaire(questionnaire_id)
+    if questionnaire is None:
+        return None
+    counters = await answers_backend().read_stats(questionnaire_id)
+    return build_stats(questionnaire, counters or {})
+
+
+async def rebuild_answer_stats(questionnaire_id: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    """Recompute statistics counters from the stored answers (recovery after drift).
+
+    Rebuilds one questionnaire, or every questionnaire in the catalog plus any
+    that still have answers when ``questionnaire_id`` is None. Returns the new
+    counters per questionnaire.
+    """
+    if questionnaire_id is not None:
+        targets = [questionnaire_id]
+    else:
+        targets = [questionnaire.id for questionnaire in await list_questionnaires()]
+    question_types = {target: question_types_of(await get_questionnaire(target)) for target in targets}
+    totals: Dict[str, Counter] = {target: Counter() for target in targets}
+    # Streams the answers once, holding only one counter set per questionnaire.
+    async for stored in iter_all_answers(questionnaire_id):
+        target = stored.questionnaireId
+        if target not in question_types:
+            question_types[target] = question_types_of(await get_questionnaire(target))
+        totals.setdefault(target, Counter()).update(answer_contributions(stored.answers, question_types[target]))
+
+    backend = answers_backend()
+    rebuilt: Dict[str, Dict[str, int]] = {}
+    for target, counters in totals.items():
+        counters = dict(counters)
+        await backend.write_stats(target, counters)
+        rebuilt[target] = counters
+    return rebuilt
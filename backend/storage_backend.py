@@ -0,0 +1,448 @@
+"""Pluggable persistence for answers and questionnaires.
+
+``storage`` and ``questionnaire_store`` program against :class:`AnswersBackend`
+and :class:`QuestionnaireBackend`. Cosmos DB is used whenever it is configured;
+otherwise ``STORAGE_BACKEND`` selects the local fallback: ``memory`` (the
+default, process-local) or ``sqlite``, a WAL-mode database file at
+``SQLITE_PATH`` that every worker process on the host can share; with
+``sqlite`` the upload job store lives in the same file. Backends deal
+in plain answer dicts; statistics deltas, cursor encoding and the questionnaire
+read cache stay in the modules above them.
+"""
+import asyncio
+import itertools
+import logging
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Mapping, Optional, Tuple
+
+try:
+    from backend import cosmos_aio as cosmos
+    from backend.answer_stats import AnswerStatsStore
+    from backend.answers_index import AnswersIndex
+    from backend.data import QUESTIONNAIRES
+    from backend.jobs import InMemoryJobStore, JobStore
+    from backend.models import StoredAnswers
+except ImportError:  # Allow fallback execution without package context
+    import sys
+
+    sys.path.append(str(Path(__file__).resolve().parent))
+    import cosmos_aio as cosmos
+    from answer_stats import AnswerStatsStore
+    from answers_index import AnswersIndex
+    from data import QUESTIONNAIRES
+    from jobs import InMemoryJobStore, JobStore
+    from models import StoredAnswers
+
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory").strip().lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", str(Path(__file__).resolve().parent / "storage.sqlite3"))
+
+# Serialized answers as stored: question id -> answer detail fields.
+Answers = Dict[str, Dict[str, object]]
+# Previous answers handed back for statistics; values may also be AnswerDetail models.
+PreviousAnswers = Optional[Mapping[str, object]]
+
+
+class AnswersBackend(ABC):
+    """Answers documents keyed by (user, questionnaire), with counts and statistics counters."""
+
+    name = ""
+
+    @abstractmethod
+    async def get(self, user_id: str, questionnaire_id: str) -> Optional[StoredAnswers]:
+        ...
+
+    @abstractmethod
+    async def save(self, user_id: str, questionnaire_id: str, answers: Answers) -> Tuple[StoredAnswers, PreviousAnswers]:
+        """Replace a document; returns it with the answers it replaced (None when new)."""
+
+    @abstractmethod
+    async def patch(self, user_id: str, questionnaire_id: str, answers: Answers) -> Tuple[StoredAnswers, PreviousAnswers]:
+        """Merge entries into a document, creating it when missing; returns like :meth:`save`."""
+
+    @abstractmethod
+    async def save_many(self, user_id: str, entries: List[Tuple[str, Answers]]) -> List[Tuple[Optional[str], PreviousAnswers]]:
+        """Store distinct (questionnaire_id, answers) pairs of one user.
+
+        Returns (error message or None, previous answers) per entry.
+        """
+
+    @abstractmethod
+    async def delete(self, user_id: str, questionnaire_id: str) -> Optional[StoredAnswers]:
+        """Delete a document and return it, or None if it did not exist."""
+
+    @abstractmethod
+    async def list_offset(self, limit: int, offset: int) -> Tuple[List[StoredAnswers], int]:
+        ...
+
+    @abstractmethod
+    async def list_page(
+        self,
+        limit: int,
+        state: Dict[str, object],
+    ) -> Tuple[List[StoredAnswers], Optional[Dict[str, object]], int]:
+        """Return a newest-first page after ``state`` ({} for the first page).
+
+        Returns (items, next state or None on the last page, total). Raises
+        ValueError for a state written by a different backend.
+        """
+
+    @abstractmethod
+    def iter(self, questionnaire_id: Optional[str] = None) -> AsyncIterator[StoredAnswers]:
+        """Stream every document, optionally of one questionnaire, without loading them all."""
+
+    @abstractmethod
+    async def counts(self) -> Dict[str, object]:
+        """Return {"total", "byQuestionnaire"} without scanning the documents when possible."""
+
+    @abstractmethod
+    async def rebuild_counts(self) -> Dict[str, object]:
+        ...
+
+    @abstractmethod
+    async def read_stats(self, questionnaire_id: str) -> Optional[Dict[str, int]]:
+        """Return the statistics counters, or None when they were never built."""
+
+    @abstractmethod
+    async def adjust_stats(self, questionnaire_id: str, delta: Mapping[str, int]) -> None:
+        """Add ``delta`` to the counters, starting from zero when they do not exist yet."""
+
+    @abstractmethod
+    async def write_stats(self, questionnaire_id: str, counters: Mapping[str, int]) -> None:
+        ...
+
+    async def close(self) -> None:
+        return None
+
+
+class QuestionnaireBackend(ABC):
+    """Questionnaire documents keyed by id, as produced by ``questionnaire_store``."""
+
+    name = ""
+
+    @abstractmethod
+    async def list(self) -> List[Dict[str, object]]:
+        ...
+
+    @abstractmethod
+    async def list_summaries(self) -> List[Dict[str, object]]:
+        """Catalog fields plus ``questionCount``, ``contentHash`` and a per-write ``_etag``."""
+
+    @abstractmethod
+    async def read(self, questionnaire_id: str) -> Optional[Dict[str, object]]:
+        ...
+
+    @abstractmethod
+    async def upsert(self, document: Dict[str, object]) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, questionnaire_id: str) -> bool:
+        ...
+
+    async def generation(self) -> Optional[int]:
+        """Counter that changes whenever another process writes questionnaires.
+
+        ``None`` means the backend cannot tell; the read cache then relies on its TTL.
+        """
+        return None
+
+    async def close(self) -> None:
+        return None
+
+
+def _stored_from_document(document: Mapping[str, object]) -> StoredAnswers:
+    return StoredAnswers(
+        userId=document.get("userId", ""),
+        questionnaireId=document.get("questionnaireId", ""),
+        answers=document.get("answers") or {},
+    )
+
+
+def _empty_counts() -> Dict[str, object]:
+    return {"total": 0, "byQuestionnaire": {}}
+
+
+class MemoryAnswersBackend(AnswersBackend):
+    """Process-local answers on an :class:`AnswersIndex`; nothing survives a restart."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._index = AnswersIndex()
+        self._stats = AnswerStatsStore()
+
+    async def get(self, user_id: str, questionnaire_id: str) -> Optional[StoredAnswers]:
+        return self._index.get(user_id, questionnaire_id)
+
+    async def save(self, user_id: str, questionnaire_id: str, answers: Answers) -> Tuple[StoredAnswers, PreviousAnswers]:
+        existing = self._index.get(user_id, questionnaire_id)
+        stored = StoredAnswers(userId=user_id, questionnaireId=questionnaire_id, answers=answers)
+        self._index.put(stored)
+        return stored, existing.answers if existing else None
+
+    async def patch(self, user_id: str, questionnaire_id: str, answers: Answers) -> Tuple[StoredAnswers, PreviousAnswers]:
+        existing = self._index.get(user_id, questionnaire_id)
+        if existing is None:
+            return await self.save(user_id, questionnaire_id, answers)
+        # A new object rather than an in-place update, so running iterations keep a consistent view.
+        stored = StoredAnswers(
+            userId=user_id,
+            questionnaireId=questionnaire_id,
+            answers={**existing.answers, **answers},
+        )
+        self._index.put(stored)
+        return stored, existing.answers
+
+    async def save_many(self, user_id: str, entries: List[Tuple[str, Answers]]) -> List[Tuple[Optional[str], PreviousAnswers]]:
+        results: List[Tuple[Optional[str], PreviousAnswers]] = []
+        for questionnaire_id, answers in entries:
+            _, previous = await self.save(user_id, questionnaire_id, answers)
+            results.append((None, previous))
+        return results
+
+    async def delete(self, user_id: str, questionnaire_id: str) -> Optional[StoredAnswers]:
+        return self._index.remove(user_id, questionnaire_id)
+
+    async def list_offset(self, limit: int, offset: int) -> Tuple[List[StoredAnswers], int]:
+        page = itertools.islice(self._index.newest_first(), offset, offset + limit)
+        return [stored for _, stored in page], len(self._index)
+
+    async def list_page(
+        self,
+        limit: int,
+        state: Dict[str, object],
+    ) -> Tuple[List[StoredAnswers], Optional[Dict[str, object]], int]:
+        # Cursors carry the write sequence of the last item returned, so inserts and
+        # deletes elsewhere in the list never shift the next page.
+        if state and not isinstance(state.get("m"), int):
+            raise ValueError("Invalid cursor")
+        page, has_more = self._index.page(limit, before=state.get("m"))
+        next_state = {"m": page[-1][0]} if has_more else None
+        return [stored for _, stored in page], next_state, len(self._index)
+
+    async def iter(self, questionnaire_id: Optional[str] = None) -> AsyncIterator[StoredAnswers]:
+        # Walks the ordered index lazily; entries rewritten or deleted mid-stream are skipped.
+        for _, stored in self._index.newest_first(questionnaire_id=questionnaire_id):
+            yield stored
+
+    async def counts(self) -> Dict[str, object]:
+        return {"total": len(self._index), "byQuestionnaire": self._index.counts_by_questionnaire()}
+
+    async def rebuild_counts(self) -> Dict[str, object]:
+        # Derived from the indexes, so they cannot drift.
+        return await self.counts()
+
+    async def read_stats(self, questionnaire_id: str) -> Optional[Dict[str, int]]:
+        # Counters start with the (empty) store and are updated on every write.
+        return self._stats.get(questionnaire_id)
+
+    async def adjust_stats(self, questionnaire_id: str, delta: Mapping[str, int]) -> None:
+        self._stats.apply(questionnaire_id, delta)
+
+    async def write_stats(self, questionnaire_id: str, counters: Mapping[str, int]) -> None:
+        self._stats.replace(questionnaire_id, counters)
+
+
+class MemoryQuestionnaireBackend(QuestionnaireBackend):
+    """Process-local questionnaire documents, pre-loaded with ``documents``."""
+
+    name = "memory"
+
+    def __init__(self, documents: Iterable[Dict[str, object]] = ()):
+        self._documents: Dict[str, Dict[str, object]] = {}
+        self._versions: Dict[str, int] = {}
+        self._version = itertools.count(1)
+        for document in documents:
+            self._put(document)
+
+    def _put(self, document: Dict[str, object]) -> None:
+        self._documents[str(document["id"])] = dict(document)
+        self._versions[str(document["id"])] = next(self._version)
+
+    async def list(self) -> List[Dict[str, object]]:
+        return list(self._documents.values())
+
+    async def list_summaries(self) -> List[Dict[str, object]]:
+        return [
+            {
+                "id": questionnaire_id,
+                "title": document.get("title"),
+                "description": document.get("description"),
+                "type": document.get("type") or document.get("questionnaireType") or "question",
+                "questionCount": len(document.get("questions") or []),
+                "contentHash": document.get("contentHash"),
+                "_etag": str(self._versions[questionnaire_id]),
+            }
+            for questionnaire_id, document in self._documents.items()
+        ]
+
+    async def read(self, questionnaire_id: str) -> Optional[Dict[str, object]]:
+        return self._documents.get(questionnaire_id)
+
+    async def upsert(self, document: Dict[str, object]) -> None:
+        self._put(document)
+
+    async def delete(self, questionnaire_id: str) -> bool:
+        self._versions.pop(questionnaire_id, None)
+        return self._documents.pop(questionnaire_id, None) is not None
+
+
+class CosmosAnswersBackend(AnswersBackend):
+    """Answers in the Cosmos answers container, partitioned by user (see ``cosmos_aio``)."""
+
+    name = "cosmos"
+
+    async def get(self, user_id: str, questionnaire_id: str) -> Optional[StoredAnswers]:
+        document = await cosmos.read_answers(user_id, questionnaire_id)
+        return _stored_from_document(document) if document else None
+
+    async def save(self, user_id: str, questionnaire_id: str, answers: Answers) -> Tuple[StoredAnswers, PreviousAnswers]:
+        written = await cosmos.upsert_answers(user_id, questionnaire_id, answers)
+        if written is None:
+            raise RuntimeError("Cosmos answers container not available")
+        document, previous = written
+        return _stored_from_document(document), previous
+
+    async def patch(self, user_id: str, questionnaire_id: str, answers: Answers) -> Tuple[StoredAnswers, PreviousAnswers]:
+        written = await cosmos.patch_answers(user_id, questionnaire_id, answers)
+        if written is None:
+            raise RuntimeError("Cosmos answers container not available")
+        document, previous = written
+        return _stored_from_document(document), previous
+
+    async def save_many(self, user_id: str, entries: List[Tuple[str, Answers]]) -> List[Tuple[Optional[str], PreviousAnswers]]:
+        # Previous answers come from a read just before the batch; a concurrent
+        # writer in between can skew the statistics until they are rebuilt.
+        previous = await cosmos.read_answers_many(user_id, [questionnaire_id for questionnaire_id, _ in entries])
+        errors = await cosmos.upsert_answers_batch(user_id, entries)
+        return [(error, previous.get(questionnaire_id)) for (questionnaire_id, _), error in zip(entries, errors)]
+
+    async def delete(self, user_id: str, questionnaire_id: str) -> Optional[StoredAnswers]:
+        document = await cosmos.delete_answers(user_id, questionnaire_id)
+        return _stored_from_document(document) if document else None
+
+    async def list_offset(self, limit: int, offset: int) -> Tuple[List[StoredAnswers], int]:
+        documents, total = await cosmos.list_answers(limit=limit, offset=offset)
+        return [_stored_from_document(document) for document in documents or []], total
+
+    async def list_page(
+        self,
+        limit: int,
+        state: Dict[str, object],
+    ) -> Tuple[List[StoredAnswers], Optional[Dict[str, object]], int]:
+        # Cursors carry the (_ts, id) of the last item returned, like the other backends' keys.
+        if state and not (isinstance(state.get("t"), int) and isinstance(state.get("i"), str)):
+            raise ValueError("Invalid cursor")
+        before = (state["t"], state["i"]) if state else None
+        documents, next_key = await cosmos.list_answers_page(limit=limit, before=before)
+        total = (await self.counts())["total"]
+        items = [_stored_from_document(document) for document in documents or []]
+        return items, {"t": next_key[0], "i": next_key[1]} if next_key else None, total
+
+    async def iter(self, questionnaire_id: Optional[str] = None) -> AsyncIterator[StoredAnswers]:
+        async for document in cosmos.iter_answers(questionnaire_id):
+            yield _stored_from_document(document)
+
+    async def counts(self) -> Dict[str, object]:
+        return await cosmos.read_answer_counts() or _empty_counts()
+
+    async def rebuild_counts(self) -> Dict[str, object]:
+        return await cosmos.rebuild_answer_counts() or _empty_counts()
+
+    async def read_stats(self, questionnaire_id: str) -> Optional[Dict[str, int]]:
+        return await cosmos.read_answer_stats(questionnaire_id)
+
+    async def adjust_stats(self, questionnaire_id: str, delta: Mapping[str, int]) -> None:
+        await cosmos.adjust_answer_stats(questionnaire_id, dict(delta))
+
+    async def write_stats(self, questionnaire_id: str, counters: Mapping[str, int]) -> None:
+        await cosmos.write_answer_stats(questionnaire_id, dict(counters))
+
+
+class CosmosQuestionnaireBackend(QuestionnaireBackend):
+    """Questionnaires in the Cosmos questionnaire container, partitioned by id."""
+
+    name = "cosmos"
+
+    async def list(self) -> List[Dict[str, object]]:
+        return await cosmos.list_questionnaires() or []
+
+    async def list_summaries(self) -> List[Dict[str, object]]:
+        return await cosmos.list_questionnaire_summaries() or []
+
+    async def read(self, questionnaire_id: str) -> Optional[Dict[str, object]]:
+        return await cosmos.read_questionnaire(questionnaire_id)
+
+    async def upsert(self, document: Dict[str, object]) -> None:
+        await cosmos.upsert_questionnaire(document)
+
+    async def delete(self, questionnaire_id: str) -> bool:
+        return await cosmos.delete_questionnaire(questionnaire_id)
+
+
+_cosmos_answers = CosmosAnswersBackend()
+_cosmos_questionnaires = CosmosQuestionnaireBackend()
+_local: Optional[Tuple[AnswersBackend, QuestionnaireBackend]] = None
+_sqlite_database = None
+
+
+def _sqlite():
+    """The ``sqlite_backend`` module and the one database every SQLite store shares."""
+    global _sqlite_database
+    try:
+        from backend import sqlite_backend
+    except ImportError:
+        import sqlite_backend
+
+    if _sqlite_database is None:
+        _sqlite_database = sqlite_backend.SqliteDatabase(SQLITE_PATH)
+    return sqlite_backend, _sqlite_database
+
+
+def _local_backends() -> Tuple[AnswersBackend, QuestionnaireBackend]:
+    """Build the configured non-Cosmos backends on first use."""
+    global _local
+    if _local is None:
+        if STORAGE_BACKEND == "sqlite":
+            sqlite_backend, database = _sqlite()
+            _local = (sqlite_backend.SqliteAnswersBackend(database), sqlite_backend.SqliteQuestionnaireBackend(database))
+            logger.info("Using SQLite storage at %s when Cosmos is unavailable", SQLITE_PATH)
+        else:
+            if STORAGE_BACKEND != "memory":
+                logger.warning("Unknown STORAGE_BACKEND %r; using in-memory storage", STORAGE_BACKEND)
+            _local = (
+                MemoryAnswersBackend(),
+                MemoryQuestionnaireBackend(questionnaire.model_dump() for questionnaire in QUESTIONNAIRES),
+            )
+    return _local
+
+
+def answers_backend() -> AnswersBackend:
+    return _cosmos_answers if cosmos.cosmos_available() else _local_backends()[0]
+
+
+def questionnaire_backend() -> QuestionnaireBackend:
+    return _cosmos_questionnaires if cosmos.questionnaire_available() else _local_backends()[1]
+
+
+def job_store(ttl_seconds: float) -> JobStore:
+    """Upload job store: shared through SQLite when ``STORAGE_BACKEND=sqlite``, else per process."""
+    if STORAGE_BACKEND == "sqlite":
+        sqlite_backend, database = _sqlite()
+        return sqlite_backend.SqliteJobStore(database, ttl_seconds=ttl_seconds)
+    return InMemoryJobStore(ttl_seconds=ttl_seconds)
+
+
+async def close_local_backends() -> None:
+    # Backends stay registered; a closed SQLite database reopens on its next use.
+    if _local is not None:
+        for backend in _local:
+            await backend.close()
+    if _sqlite_database is not None:
+        # The job store may have opened it even while Cosmos serves the data.
+        await asyncio.to_thread(_sqlite_database.close)
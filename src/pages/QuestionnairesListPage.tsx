@@ -22,18 +22,18 @@ import {
 import { Badge } from '@/components/ui/badge';
 import { Trash2, Loader2, FileText, BookOpen, ClipboardList } from 'lucide-react';
 import {
-  fetchQuestionnaires,
+  fetchQuestionnaireSummaries,
   deleteQuestionnaire,
-  QuestionnaireResponse,
+  QuestionnaireSummaryResponse,
 } from '@/services/api';
 
 const QuestionnairesListPage: React.FC = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
-  const [questionnaires, setQuestionnaires] = useState<QuestionnaireResponse[]>([]);
+  const [questionnaires, setQuestionnaires] = useState<QuestionnaireSummaryResponse[]>([]);
 
   // Delete dialog state
-  const [deleteTarget, setDeleteTarget] = useState<QuestionnaireResponse | null>(null);
+  const [deleteTarget, setDeleteTarget] = useState<QuestionnaireSummaryResponse | null>(null);
   const [deleteOpen, setDeleteOpen] = useState(false);
   const [deleting, setDeleting] = useState(false);
 
@@ -41,7 +41,7 @@ const QuestionnairesListPage: React.FC = () => {
     setLoading(true);
     setError(null);
     try {
-      const result = await fetchQuestionnaires();
+      const result = await fetchQuestionnaireSummaries();
       setQuestionnaires(result);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to load questionnaires');
@@ -54,7 +54,7 @@ const QuestionnairesListPage: React.FC = () => {
     loadData();
   }, []);
 
-  const handleDeleteClick = (questionnaire: QuestionnaireResponse) => {
+  const handleDeleteClick = (questionnaire: QuestionnaireSummaryResponse) => {
     setDeleteTarget(questionnaire);
     setDeleteOpen(true);
   };
@@ -85,7 +85,7 @@ const QuestionnairesListPage: React.FC = () => {
     }
   };
 
-  const getTypeBadge = (questionnaire: QuestionnaireResponse) => {
+  const getTypeBadge = (questionnaire: QuestionnaireSummaryResponse) => {
     const type = questionnaire.questionnaireType || questionnaire.type || 'question';
     const variant = type === 'flashcard' ? 'secondary' : type === 'test' ? 'default' : 'outline';
     return (
@@ -156,7 +156,7 @@ const QuestionnairesListPage: React.FC = () => {
                       </div>
                     </TableCell>
                     <TableCell>{getTypeBadge(questionnaire)}</TableCell>
-                    <TableCell>{questionnaire.questions?.length ?? 0}</TableCell>
+                    <TableCell>{questionnaire.questionCount ?? 0}</TableCell>
                     <TableCell className="text-right">
                       <Button
                         variant="outline"
@@ -18,6 +18,15 @@ export interface QuestionnaireResponse {
   }>;
 }
 
+export interface QuestionnaireSummaryResponse {
+  id: string;
+  title: string;
+  description: string;
+  type?: QuestionnaireType;
+  questionnaireType?: QuestionnaireType;
+  questionCount: number;
+}
+
 const KEY_PREFIX = 'student-questionnaire-answers-v1';
 const API_BASE =
   import.meta.env.VITE_BACKEND_URL ||
@@ -125,6 +134,20 @@ export async function fetchQuestionnaires(): Promise<QuestionnaireResponse[]> {
   }
 }
 
+export async function fetchQuestionnaireSummaries(): Promise<QuestionnaireSummaryResponse[]> {
+  const endpoint = `${API_BASE}/api/questionnaires?view=summary`;
+  try {
+    console.debug('[ApiService] fetching questionnaire summaries from', endpoint);
+    const res = await fetch(endpoint);
+    if (!res.ok) throw new Error(`Bad response (${res.status})`);
+    const payload = await res.json();
+    return payload as QuestionnaireSummaryResponse[];
+  } catch (err) {
+    console.warn('[ApiService] failed to fetch questionnaire summaries', err);
+    return [];
+  }
+}
+
 export async function fetchQuestionnaire(questionnaireId?: string): Promise<QuestionnaireResponse | null> {
   const path = questionnaireId ? `/api/questionnaires/${questionnaireId}` : '/api/questionnaire';
   const endpoint = `${API_BASE}${path}`;